@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Pick the tests worth running first after a fix iteration.
+
+Usage: affected_tests.py [--changed changed_files.txt] [--failed test_output.txt ...] [--explain]
+
+Prints test files, one per line: first the ones that failed in the given
+logs, then the ones the changed files can affect. Prints nothing when only
+the full suite will do: nothing could be mapped, every test is selected,
+or a change touches something every test loads (Gemfile, config/, db/,
+fixtures, test_helper).
+
+A test is affected by a changed file when
+- it is named after it (app/models/user.rb -> test/**/user_test.rb,
+  links_controller.rb -> links_controller_test.rb and links_test.rb), or
+- it references a constant the file defines, or a constant of a file that
+  (transitively) depends on it, or requires it. References include Rails
+  associations (`has_many :views` -> View) and route helpers
+  (`links_path` -> LinksController).
+
+The per-file constant/require index of app/, lib/ and test/ is cached
+under .git/ and only rebuilt for files whose size or mtime changed.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+DEFAULT_INDEX = os.path.join('.git', 'auto_fix_test_index.json')
+SOURCE_ROOTS = ('app', 'lib', 'test', 'spec')
+TEST_FILE_RE = re.compile(r'(?:^|/)((?:test|spec)/(?:[\w.-]+/)*[\w.-]+_(?:test|spec)\.rb)\b')
+# Changes every test depends on: run the full suite
+GLOBAL_PATHS = ('Gemfile', 'Gemfile.lock', '.ruby-version', 'config/', 'db/', 'test/fixtures/',
+                'spec/fixtures/', 'test/support/', 'spec/support/', 'test/test_helper.rb',
+                'test/application_system_test_case.rb', 'spec/spec_helper.rb', 'spec/rails_helper.rb')
+
+DEFINITION_RE = re.compile(r'^\s*(?:class|module)\s+((?:[A-Z]\w*::)*[A-Z]\w*)')
+CONSTANT_RE = re.compile(r'\b[A-Z][A-Za-z0-9_]*\b')
+REQUIRE_RE = re.compile(r'''^\s*require(_relative)?\s*\(?\s*['"]([^'"]+)['"]''')
+ASSOCIATION_RE = re.compile(r'\b(?:has_many|has_one|belongs_to|has_and_belongs_to_many)\s+:(\w+)')
+ROUTE_HELPER_RE = re.compile(r'\b(?:new_|edit_)?([a-z][a-z0-9_]*?)_(?:path|url)\b')
+
+
+def camelize(name):
+    return ''.join(part[:1].upper() + part[1:] for part in name.split('_') if part)
+
+
+def singular(name):
+    if name.endswith('ies'):
+        return name[:-3] + 'y'
+    if name.endswith('s') and not name.endswith('ss'):
+        return name[:-1]
+    return name
+
+
+def plural(name):
+    return name if name.endswith('s') else name + 's'
+
+
+def is_test_file(path):
+    return path.endswith(('_test.rb', '_spec.rb')) and path.startswith(('test/', 'spec/'))
+
+
+def scan_source(text):
+    """(defined constants, referenced constants, required paths) of a Ruby file."""
+    defines = set()
+    references = set()
+    requires = set()
+    for line in text.splitlines():
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        definition = DEFINITION_RE.match(line)
+        if definition:
+            defines.add(definition.group(1).split('::')[-1])
+        required = REQUIRE_RE.match(line)
+        if required:
+            requires.add(('relative:' if required.group(1) else '') + required.group(2))
+        references.update(CONSTANT_RE.findall(line))
+        for name in ASSOCIATION_RE.findall(line):
+            references.add(camelize(singular(name)))
+        for resource in ROUTE_HELPER_RE.findall(line):
+            references.add(camelize(plural(resource)) + 'Controller')
+    return defines, references - defines, requires
+
+
+class SourceIndex:
+    """scan_source() results per file, cached by size and mtime."""
+
+    def __init__(self, path=None, roots=SOURCE_ROOTS):
+        self.path = path
+        self.roots = roots
+        self.files = {}
+        self.rescanned = 0
+        cached = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    cached = json.load(f).get('files', {})
+            except (OSError, ValueError):
+                cached = {}
+        self.refresh(cached)
+
+    def refresh(self, cached=None):
+        """Rescan the files whose size or mtime differ from `cached` (default: the current entries)."""
+        cached = self.files if cached is None else cached
+        self.files = {}
+        self.rescanned = 0
+        for root in self.roots:
+            for directory, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in filenames:
+                    if name.endswith('.rb'):
+                        self._load(os.path.join(directory, name), cached)
+
+    def _load(self, path, cached):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        entry = cached.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.files[path] = entry
+            return
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            defines, references, requires = scan_source(f.read())
+        self.files[path] = [stat.st_mtime_ns, stat.st_size, sorted(defines), sorted(references), sorted(requires)]
+        self.rescanned += 1
+
+    def save(self):
+        if not self.path:
+            return
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({'files': self.files}, f, separators=(',', ':'))
+        os.replace(temp, self.path)
+
+    def defines(self, path):
+        entry = self.files.get(path)
+        if entry is not None:
+            return set(entry[2])
+        # Deleted or not indexed: Rails' file name convention
+        return {camelize(os.path.splitext(os.path.basename(path))[0])}
+
+    def requires_file(self, source, target):
+        """Whether `source` requires the file `target`."""
+        stem = os.path.splitext(target)[0]
+        for required in self.files[source][4]:
+            if required.startswith('relative:'):
+                resolved = os.path.normpath(os.path.join(os.path.dirname(source), required[len('relative:'):]))
+                if os.path.splitext(resolved)[0] == stem:
+                    return True
+            elif stem.endswith('/' + required) or stem == required:
+                return True
+        return False
+
+    def test_files(self):
+        return sorted(path for path in self.files if is_test_file(path))
+
+
+def failed_tests(log_paths):
+    """Test files named in test logs (rerun lines, failure locations, backtraces)."""
+    found = []
+    for log_path in log_paths:
+        try:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    for match in TEST_FILE_RE.finditer(line):
+                        found.append(match.group(1))
+        except OSError:
+            continue
+    return [path for path in dict.fromkeys(found) if os.path.isfile(path)]
+
+
+def named_tests(path, tests):
+    """Tests named after a source file by Rails conventions."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    names = {stem}
+    if stem.endswith('_controller'):
+        names.add(stem[:-len('_controller')])
+    wanted = {f"{name}_{kind}.rb" for name in names for kind in ('test', 'spec')}
+    return {test for test in tests if os.path.basename(test) in wanted}
+
+
+def select_tests(changed, failing, index, explain=None):
+    """Failing tests, then tests affected by `changed`; None means the full suite."""
+    explain = explain or (lambda message: None)
+    tests = index.test_files()
+    for path in changed:
+        if path.startswith(GLOBAL_PATHS) or path in GLOBAL_PATHS:
+            explain(f"{path} affects every test")
+            return None
+
+    selected = {}
+    for test in failing:
+        selected.setdefault(test, 'failed before')
+
+    sources = [path for path in changed if path.endswith('.rb')]
+    dirty = set(sources)
+    constants = set()
+    for path in sources:
+        constants |= index.defines(path)
+    # Files that depend on an affected constant or file are affected too
+    pending = list(sources)
+    known = set(constants)
+    while pending:
+        pending = []
+        for path, entry in index.files.items():
+            if path in dirty or is_test_file(path):
+                continue
+            if known.intersection(entry[3]) or any(index.requires_file(path, target) for target in dirty):
+                dirty.add(path)
+                pending.append(path)
+                new = set(entry[2]) - known
+                known |= new
+        if pending:
+            explain(f"also affected: {', '.join(sorted(pending))}")
+
+    for path in sorted(dirty):
+        for test in named_tests(path, tests):
+            selected.setdefault(test, f"named after {path}")
+        if is_test_file(path):
+            selected.setdefault(path, 'changed')
+    for test in tests:
+        if test in selected:
+            continue
+        referenced = known.intersection(index.files[test][3])
+        if referenced:
+            selected[test] = f"references {', '.join(sorted(referenced)[:3])}"
+        elif any(index.requires_file(test, target) for target in dirty):
+            selected[test] = 'requires a changed file'
+
+    for test, reason in selected.items():
+        explain(f"{test}: {reason}")
+    if not selected or (tests and set(tests) <= set(selected)):
+        explain("no narrower selection than the full suite")
+        return None
+    ordered = [test for test in failing if test in selected]
+    ordered += sorted(test for test in selected if test not in failing)
+    return ordered
+
+
+def read_changed(path):
+    stream = sys.stdin if path == '-' else open(path, 'r')
+    with stream:
+        paths = [line.strip() for line in stream if line.strip()]
+    return [path[2:] if path.startswith('./') else path for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Select the failing and affected tests to run first.")
+    parser.add_argument('--changed', default=None,
+                        help="file listing the changed paths, one per line ('-' for stdin)")
+    parser.add_argument('--failed', nargs='*', default=[], help="test logs of earlier runs")
+    parser.add_argument('--index', default=DEFAULT_INDEX if os.path.isdir('.git') else '',
+                        help="cache file for the source index ('' to disable; default: %(default)s)")
+    parser.add_argument('--explain', action='store_true', help="print why each test was picked to stderr")
+    args = parser.parse_args()
+
+    try:
+        changed = read_changed(args.changed) if args.changed else []
+    except OSError as e:
+        print(f"Error: could not read {args.changed}: {e}", file=sys.stderr)
+        sys.exit(1)
+    index = SourceIndex(args.index or None)
+    index.save()
+    explain = (lambda message: print(message, file=sys.stderr)) if args.explain else None
+    selected = select_tests(changed, failed_tests(args.failed), index, explain)
+    if args.explain:
+        print(f"{len(index.files)} files indexed, {index.rescanned} rescanned", file=sys.stderr)
+    if selected:
+        print('\n'.join(selected))
+
+
+if __name__ == '__main__':
+    main()
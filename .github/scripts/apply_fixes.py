@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """Parse AI fix suggestions and apply them to files.
 
-Usage: python3 apply_fixes.py <fixes_file>
+Usage: python3 apply_fixes.py <fixes_file> [--workers N]
 
 The script looks for FIX_FILE blocks in various formats:
   FIX_FILE: path/to/file
@@ -9,12 +9,27 @@ The script looks for FIX_FILE blocks in various formats:
   content
   ```
 
-It also tries alternative patterns the AI might use.
+It also tries alternative patterns the AI might use. A block whose body is
+a unified diff or SEARCH/REPLACE edit is applied as a patch to the existing
+file instead of replacing it (see patch_engine.py).
+
+StreamingApplier applies blocks from a response that is still being
+generated (see call_github_models.py --stream --apply).
 """
-import re
+import argparse
 import os
 import sys
 
+from atomic_writer import WriteError, WriteTransaction
+from fix_parsing import FixScanner, FixStream, patterns_for, scan_fixes
+from github_outputs import write_github_outputs
+from hash_manifest import HashManifest, content_digest, default_manifest_path
+from mmap_io import map_file, preview
+from patch_engine import PatchError, apply_patch, has_diff_markers, is_patch
+from syntax_check import SyntaxChecker
+from tracing import span
+
+
 def parse_fixes(content):
     """Parse AI output for explicit FIX blocks only.
 
@@ -29,65 +44,250 @@ def parse_fixes(content):
       ```ruby
       # full file content
       ```
+
+    Blocks are returned in the order they appear in the response.
     """
-    matches = []
+    return [(fix.path, fix.body(content)) for fix in scan_fixes(content)]
+
 
-    # Format 1: ### FIX: path/to/file
-    pattern_fix = r'###\s*FIX:\s*([^\n]+)\n\s*```[\w-]*\n(.*?)```'
-    for filepath, file_content in re.findall(pattern_fix, content, re.DOTALL):
-        matches.append((filepath.strip(), file_content.rstrip()))
+def resolve_content(buffer, filepath, fixes):
+    """Work out what `filepath` should contain after its FIX blocks.
 
-    # Format 2: FIX_FILE: path/to/file
-    pattern_fix_file = r'FIX_FILE:\s*([^\n]+)\n\s*```[\w-]*\n(.*?)```'
-    for filepath, file_content in re.findall(pattern_fix_file, content, re.DOTALL):
-        matches.append((filepath.strip(), file_content.rstrip()))
+    Returns (buffer, start, end, trailer). The common case, a single
+    whole-file block, is just a span of the response buffer; patch blocks
+    are applied with patch_engine to the preceding content (or the file on
+    disk) and return the patched text instead. Raises PatchError, also
+    for a whole-file block that still carries diff markers.
+    """
+    patterns = patterns_for(buffer)
+    base = len(fixes)
+    while base and is_patch(buffer, fixes[base - 1].start, fixes[base - 1].end):
+        base -= 1
+    if base and has_diff_markers(buffer, fixes[base - 1].start, fixes[base - 1].end):
+        raise PatchError("whole-file block contains diff markers")
+    if base == len(fixes):
+        fix = fixes[-1]
+        return buffer, fix.start, fix.end, b'\n'
 
-    return matches
+    if base:
+        content = patterns.decode(fixes[base - 1].body(buffer)) + '\n'
+    elif os.path.exists(filepath):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+    else:
+        content = ''
 
+    for fix in fixes[base:]:
+        result = apply_patch(content, patterns.decode(fix.body(buffer)))
+        content = result.content
+        note = f", {result.offset} offset, {result.fuzzy} whitespace-fuzzy" if result.offset or result.fuzzy else ''
+        print(f"Patched: {filepath} ({result.hunks} hunks{note})")
+    return content, 0, len(content), b''
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: apply_fixes.py <fixes_file>")
-        sys.exit(1)
 
-    fixes_file = sys.argv[1]
+def apply_response(buffer, workers=None, manifest=None, scanner=None):
+    """Apply every FIX block in a str, bytes or mmap response buffer.
 
-    try:
-        with open(fixes_file, 'r') as f:
-            content = f.read()
-    except FileNotFoundError:
-        print(f"File not found: {fixes_file}")
-        sys.exit(0)
+    All files are written in one WriteTransaction: either every fix lands
+    or, on any failure, none of them do and WriteError is raised. Files
+    whose content would not change are skipped (see hash_manifest).
+    Returns the paths of the files written; pass a FixScanner to read the
+    commit message from it afterwards.
+    """
+    manifest = manifest or HashManifest()
+    scanner = scanner or FixScanner(patterns_for(buffer))
+    with span('apply.parse', size=len(buffer)) as parsing:
+        fixes = list(scan_fixes(buffer, scanner))
+        parsing.set(blocks=len(fixes))
 
     # Check for NO_FIX_NEEDED
-    if 'NO_FIX_NEEDED' in content:
+    if scanner.no_fix_needed:
         print("AI says no fix needed.")
-        sys.exit(0)
+        return []
 
     print(f"--- AI Response Preview (first 500 chars) ---")
-    print(content[:500])
+    print(buffer[:500] if isinstance(buffer, str) else preview(buffer))
     print(f"--- End Preview ---")
-    print(f"Total response length: {len(content)} chars")
-
-    matches = parse_fixes(content)
+    print(f"Total response length: {len(buffer)} {'chars' if isinstance(buffer, str) else 'bytes'}")
 
-    if not matches:
+    if not fixes:
         print("WARNING: Could not parse any FIX_FILE blocks from AI response.")
         print("The AI may not have followed the expected format.")
-        sys.exit(0)
+        return []
 
-    for filepath, file_content in matches:
+    # Blocks for the same file are applied in order: a whole-file block
+    # replaces the content, a patch block edits whatever came before it.
+    by_path = {}
+    for fix in fixes:
+        by_path.setdefault(fix.path, []).append(fix)
+
+    transaction = WriteTransaction(workers=workers)
+    digests = {}
+    unchanged = 0
+    for filepath, path_fixes in by_path.items():
         # Safety: don't allow writing outside the project
         if filepath.startswith('/') or '..' in filepath:
             print(f"SKIPPED (unsafe path): {filepath}")
             continue
 
-        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
-        with open(filepath, 'w') as f:
-            f.write(file_content + '\n')
-        print(f"Applied fix: {filepath}")
+        try:
+            with span('apply.resolve', path=filepath, blocks=len(path_fixes)):
+                source, start, end, trailer = resolve_content(buffer, filepath, path_fixes)
+        except PatchError as e:
+            print(f"FAILED (patch does not apply): {filepath}: {e}")
+            continue
+
+        digest = content_digest(source, start, end, trailer)
+        size = None if isinstance(source, str) else end - start + len(trailer)
+        if manifest.unchanged(filepath, digest, size):
+            unchanged += 1
+            print(f"Unchanged: {filepath}")
+            continue
+
+        # Bodies of an mmap'd response go straight from the mapping to disk
+        transaction.add(filepath, source, start, end, trailer)
+        digests[filepath] = digest
+
+    with span('apply.write', files=len(digests)):
+        written = transaction.commit()
+    for filepath, seconds, size in written:
+        manifest.record(filepath, digests[filepath])
+        print(f"Applied fix: {filepath} ({size} bytes, {seconds * 1000:.1f} ms)")
+    with span('apply.manifest'):
+        manifest.save()
+
+    print(f"Total fixes applied: {len(written)}")
+    print(f"{len(written)} written / {unchanged} unchanged")
+    write_github_outputs(files_written=len(written), files_unchanged=unchanged)
+    return [filepath for filepath, _, _ in written]
+
+
+class StreamingApplier:
+    """Apply FIX blocks while a streamed response is still arriving.
+
+    Each block is written, and its syntax check started, as soon as its
+    closing fence is read. Unlike apply_response the files are not written
+    in one transaction: each write is atomic, but if the stream breaks off
+    the blocks completed so far stay applied.
+    """
+
+    def __init__(self, manifest=None, checker=None, out=None):
+        self.manifest = manifest or HashManifest()
+        self.checker = checker or SyntaxChecker()
+        self.out = out or sys.stdout
+        self.stream = FixStream()
+        self.contents = {}  # latest content per path, base for patch blocks
+        self.written = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    def log(self, message):
+        print(message, file=self.out, flush=True)
+
+    def feed(self, chunk):
+        for fix, body in self.stream.feed(chunk):
+            with span('apply.stream_block', path=fix.path):
+                self.apply(fix.path, body)
+
+    def apply(self, filepath, body):
+        # Safety: don't allow writing outside the project
+        if filepath.startswith('/') or '..' in filepath:
+            self.log(f"SKIPPED (unsafe path): {filepath}")
+            return
+
+        if is_patch(body):
+            content = self.contents.get(filepath)
+            if content is None:
+                content = ''
+                if os.path.exists(filepath):
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        content = f.read()
+            try:
+                result = apply_patch(content, body)
+            except PatchError as e:
+                self.failed += 1
+                self.log(f"FAILED (patch does not apply): {filepath}: {e}")
+                return
+            content = result.content
+            self.log(f"Patched: {filepath} ({result.hunks} hunks)")
+        elif has_diff_markers(body):
+            self.failed += 1
+            self.log(f"FAILED (whole-file block contains diff markers): {filepath}")
+            return
+        else:
+            content = body + '\n'
+        self.contents[filepath] = content
+
+        digest = content_digest(content)
+        if self.manifest.unchanged(filepath, digest):
+            self.unchanged += 1
+            self.log(f"Unchanged: {filepath}")
+            return
+
+        transaction = WriteTransaction(workers=1)
+        transaction.add(filepath, content)
+        try:
+            (_, seconds, size), = transaction.commit()
+        except WriteError as e:
+            self.failed += 1
+            self.log(f"FAILED (write error): {filepath}: {e}")
+            return
+        self.manifest.record(filepath, digest)
+        self.written += 1
+        self.log(f"Applied fix: {filepath} ({size} bytes, {seconds * 1000:.1f} ms)")
+        self.checker.submit(filepath)
+
+    def close(self):
+        """Flush the stream, wait for syntax checks and report; returns files written."""
+        for fix, body in self.stream.close():
+            self.apply(fix.path, body)
+        if self.stream.no_fix_needed and not self.written:
+            self.log("AI says no fix needed.")
+
+        syntax_errors = 0
+        with span('apply.syntax_wait'):
+            checked = self.checker.results()
+        for filepath, ok, error in checked:
+            if ok:
+                self.log(f"Syntax OK: {filepath}")
+            else:
+                syntax_errors += 1
+                self.log(f"SYNTAX ERROR: {filepath}\n{error}")
+        self.manifest.save()
+
+        self.log(f"Total fixes applied: {self.written}")
+        self.log(f"{self.written} written / {self.unchanged} unchanged")
+        write_github_outputs(files_written=self.written, files_unchanged=self.unchanged,
+                             syntax_errors=syntax_errors)
+        return self.written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply FIX blocks from an AI response.")
+    parser.add_argument('fixes_file')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="threads used to write files (default: Python's pool default)")
+    parser.add_argument('--manifest', default=default_manifest_path(),
+                        help="content-hash manifest path ('' to disable; default: %(default)s)")
+    args = parser.parse_args()
+
+    fixes_file = args.fixes_file
+
+    if not os.path.isfile(fixes_file):
+        print(f"File not found: {fixes_file}")
+        sys.exit(0)
 
-    print(f"Total fixes applied: {len(matches)}")
+    # The response is mapped once and scanned as bytes; bodies are written
+    # from slices of the mapping, so large full-file rewrites are never
+    # decoded or copied.
+    with map_file(fixes_file) as buffer:
+        try:
+            with span('apply_fixes', fixes_file=fixes_file):
+                apply_response(buffer, workers=args.workers,
+                               manifest=HashManifest(args.manifest or None))
+        except WriteError as e:
+            print(f"ERROR: could not apply fixes, no files were changed: {e}")
+            sys.exit(1)
 
 
 if __name__ == '__main__':
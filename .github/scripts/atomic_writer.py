@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+All-or-nothing, parallel writer for applying fixes.
+
+Every target is first written to a temp file next to it by a thread pool
+and fsynced. Only when all of them are on disk are they renamed over their
+targets, one `os.replace` each; if anything fails on the way, the temp
+files are removed and targets already replaced are restored from hard-link
+backups, so the repository is never left half-patched.
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WriteError(Exception):
+    """Raised when a transaction fails; nothing has been changed on disk."""
+
+
+def _current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Entry:
+    __slots__ = ('path', 'buffer', 'start', 'end', 'trailer', 'temp', 'backup',
+                 'existed', 'seconds', 'size')
+
+    def __init__(self, path, buffer, start, end, trailer):
+        self.path = path
+        self.buffer = buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+        self.trailer = trailer
+        self.temp = None
+        self.backup = None
+        self.existed = False
+        self.seconds = 0.0
+        self.size = 0
+
+
+class WriteTransaction:
+    """Collect file writes, then commit them concurrently and atomically.
+
+    `add()` takes a buffer plus an optional (start, end) span so bodies can
+    be written straight out of an mmap'd response; str buffers are encoded
+    as UTF-8.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.entries = []
+
+    def add(self, path, buffer, start=0, end=None, trailer=b''):
+        self.entries.append(_Entry(path, buffer, start, end, trailer))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def commit(self):
+        """Write every entry; returns [(path, seconds, bytes)] in add order.
+
+        Raises WriteError (after undoing everything) if any write fails.
+        """
+        if not self.entries:
+            return []
+
+        umask = _current_umask()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._stage, entry, umask) for entry in self.entries]
+            errors = [f.exception() for f in futures]
+        failed = [(e, err) for e, err in zip(self.entries, errors) if err is not None]
+        if failed:
+            self._discard()
+            entry, err = failed[0]
+            raise WriteError(f"{entry.path}: {err}") from err
+
+        replaced = []
+        try:
+            for entry in self.entries:
+                self._swap(entry)
+                replaced.append(entry)
+        except BaseException as err:
+            self._rollback(replaced)
+            self._discard()
+            if not isinstance(err, Exception):
+                raise
+            raise WriteError(f"{entry.path}: {err}") from err
+
+        for directory in {os.path.dirname(e.path) or '.' for e in self.entries}:
+            _fsync_dir(directory)
+        for entry in self.entries:
+            if entry.backup:
+                os.unlink(entry.backup)
+        return [(e.path, e.seconds, e.size) for e in self.entries]
+
+    def _stage(self, entry, umask):
+        """Write one entry into a synced temp file beside its target."""
+        started = time.perf_counter()
+        directory = os.path.dirname(entry.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        fd, entry.temp = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(entry.path)}.", suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(entry.buffer, str):
+                f.write(entry.buffer[entry.start:entry.end].encode('utf-8'))
+            else:
+                with memoryview(entry.buffer) as view, view[entry.start:entry.end] as span:
+                    f.write(span)
+            if entry.trailer:
+                f.write(entry.trailer)
+            f.flush()
+            os.fsync(f.fileno())
+            entry.size = f.tell()
+
+        # mkstemp creates 0600 files; keep the target's mode or the default
+        try:
+            mode = stat.S_IMODE(os.stat(entry.path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~umask
+        os.chmod(entry.temp, mode)
+        entry.seconds = time.perf_counter() - started
+
+    def _swap(self, entry):
+        """Move the temp file over the target, keeping a backup link."""
+        entry.existed = os.path.exists(entry.path)
+        if entry.existed:
+            entry.backup = f"{entry.temp}.bak"
+            try:
+                os.link(entry.path, entry.backup)
+            except OSError:
+                # Filesystems without hard links get a real copy instead
+                shutil.copy2(entry.path, entry.backup)
+        os.replace(entry.temp, entry.path)
+        entry.temp = None
+
+    def _rollback(self, replaced):
+        for entry in reversed(replaced):
+            if entry.existed:
+                os.replace(entry.backup, entry.path)
+                entry.backup = None
+            else:
+                os.unlink(entry.path)
+
+    def _discard(self):
+        for entry in self.entries:
+            for leftover in (entry.temp, entry.backup):
+                if leftover and os.path.exists(leftover):
+                    os.unlink(leftover)
+            entry.temp = entry.backup = None
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Split a test log into error blocks and compact their backtraces.
+
+Ruby logs spend most of their lines on backtrace frames that say nothing
+about the failure: the same `kernel_require.rb` / bootsnap / zeitwerk
+frames repeat for every `require` in the chain, and a boot failure is
+printed once per test file. `split_log` cuts a log into segments (error
+headline plus frames, or plain text) and `compact_segments` collapses runs
+of library frames, drops duplicate backtraces and repeated lines.
+
+One failure often spans several error segments: its causes ("Caused by:"
+blocks, or Ruby's own "file:line:in `m': message (Class)" lines right
+after a backtrace) and a second report of the same exception, e.g. rake's
+"rails aborted!" summary followed by Ruby's uncaught-exception dump from a
+bundler frame. `split_log` points each such segment at the first one
+(`parent`), so a failure can be treated as one unit.
+"""
+
+import re
+
+# "from /path/file.rb:12:in `meth'", "<internal:/path/kernel_require.rb>:38:in"
+# and the relative "app/models/user.rb:5:in" frames minitest prints
+FRAME_RE = re.compile(r"^\s*(?:from\s+)?(?P<path>(?:<internal:)?[^\s:<>]+)>?:(?P<line>\d+):in\b")
+# Text after the frame location on an uncaught exception's first line
+FRAME_MESSAGE_RE = re.compile(r"^:in [`'][^']*': \S")
+ERROR_START_RE = re.compile(
+    r"^(?:rails aborted!|Caused by:|\s*\d+\) (?:Failure|Error):|Error:$"
+    r"|[A-Z]\w*(?:::\w+)*(?:Error|Exception)\b"
+    r"|.*\((?:[A-Z]\w*::)*[A-Z]\w*(?:Error|Exception)\)\s*$)"
+)
+CAUSED_BY_RE = re.compile(r"^Caused by:")
+# Lines that open an error block without saying what the error is
+MARKER_RE = re.compile(r"^(?:rails aborted!|Caused by:|Error:|\d+\) (?:Failure|Error):)$")
+# "LoadError: message (LoadError)" -> "message"
+EXCEPTION_CLASS_RE = re.compile(r"^(?:[A-Z]\w*(?:::\w+)*: )?(?P<message>.*?)(?: \((?:[A-Z]\w*::)*[A-Z]\w*\))?$")
+GEM_RE = re.compile(r"/gems/([A-Za-z0-9_.-]+?)-\d[\w.]*(?:-[\w-]+)?/")
+STDLIB_RE = re.compile(r"/lib/ruby/\d+\.\d+\.\d+/")
+
+ERROR = 'error'
+TEXT = 'text'
+
+
+class Segment:
+    """Consecutive lines of a log: an error block or plain text."""
+
+    __slots__ = ('kind', 'first', 'end', 'headline', 'frames', 'lines', 'cause', 'repeats', 'parent')
+
+    def __init__(self, kind, first):
+        self.kind = kind
+        self.first = first  # index of the segment's first line in the log
+        self.end = first  # index after its last line
+        self.headline = []  # error message lines
+        self.frames = []  # backtrace lines
+        self.lines = []  # text lines / the compacted rendering
+        self.cause = False  # a cause of the error before it
+        self.repeats = 0  # identical segments dropped after this one
+        self.parent = None  # first segment of the failure, when not this one
+
+
+def is_library_frame(path):
+    """True for frames in installed gems, Ruby's stdlib and <internal:...>."""
+    return '/gems/' in path or STDLIB_RE.search(path) is not None or path.startswith('<internal:')
+
+
+def _frame(line):
+    """(path, is uncaught-exception headline) for a frame line, else None."""
+    match = FRAME_RE.match(line)
+    if match is None:
+        return None
+    rest = line[match.end('line'):]
+    return match.group('path'), FRAME_MESSAGE_RE.match(rest) is not None
+
+
+def error_message(segment):
+    """Message of an error segment without markers, locations and class names."""
+    for line in segment.headline:
+        text = line.strip()
+        if MARKER_RE.match(text):
+            continue
+        frame = FRAME_RE.match(text)
+        if frame is not None:
+            text = text[frame.end('line'):].split("': ", 1)[-1]
+        return EXCEPTION_CLASS_RE.match(text).group('message')
+    return ''
+
+
+def group_failures(segments):
+    """Set `parent` of causes and of repeated reports of an earlier error."""
+    leader = None
+    leaders = {}
+    for segment in segments:
+        if segment.kind != ERROR:
+            continue
+        if segment.cause and leader is not None:
+            segment.parent = leader
+            continue
+        message = error_message(segment)
+        if message and message in leaders:
+            segment.parent = leader = leaders[message]
+        else:
+            leaders.setdefault(message, segment)
+            leader = segment
+
+
+def split_log(lines):
+    """Cut log lines into a list of Segments, grouped by failure."""
+    segments = []
+    current = None
+    for number, line in enumerate(lines):
+        frame = _frame(line)
+        is_headline = (frame is not None and frame[1]) or (
+            frame is None and ERROR_START_RE.match(line) is not None)
+
+        if is_headline:
+            # Message lines directly after a headline ("rails aborted!"
+            # then "LoadError: ...") belong to the same error
+            if not (current and current.kind == ERROR and not current.frames):
+                # A message frame straight after a backtrace is its cause
+                cause = CAUSED_BY_RE.match(line) is not None or (
+                    frame is not None and current is not None and current.kind == ERROR)
+                current = Segment(ERROR, number)
+                current.cause = cause
+                segments.append(current)
+            current.headline.append(line)
+        elif frame is not None and current and current.kind == ERROR:
+            current.frames.append(line)
+        elif line.strip() and current and current.kind == ERROR and not current.frames:
+            current.headline.append(line)
+        else:
+            if current is None or current.kind != TEXT:
+                current = Segment(TEXT, number)
+                segments.append(current)
+            current.lines.append(line)
+        current.end = number + 1
+    group_failures(segments)
+    return segments
+
+
+def _library_name(line):
+    match = GEM_RE.search(line)
+    if match:
+        return match.group(1)
+    return 'ruby'
+
+
+def collapse_frames(frames):
+    """Keep the first frame and app frames; fold runs of library frames."""
+    out = []
+    run = []
+    indent = '\t'
+
+    def flush():
+        if len(run) == 1:
+            out.append(run[0])
+        elif run:
+            names = []
+            for frame in run:
+                name = _library_name(frame)
+                if name not in names:
+                    names.append(name)
+            out.append(f"{indent}... {len(run)} library frames ({', '.join(names)}) ...")
+        run.clear()
+
+    for i, line in enumerate(frames):
+        match = FRAME_RE.match(line)
+        indent = line[:len(line) - len(line.lstrip())] or indent
+        if i and match and is_library_frame(match.group('path')):
+            run.append(line)
+        else:
+            flush()
+            out.append(line)
+    flush()
+    return out
+
+
+def _collapse_repeats(lines):
+    out = []
+    previous = None
+    count = 0
+    for line in lines:
+        if line == previous and line.strip():
+            count += 1
+            continue
+        if count:
+            out.append(f"[previous line repeated {count} more times]")
+        out.append(line)
+        previous = line
+        count = 0
+    if count:
+        out.append(f"[previous line repeated {count} more times]")
+    return out
+
+
+def compact_segments(segments):
+    """Compact segments in place; returns the ones that are still needed.
+
+    Sets each kept segment's `lines` to its compacted rendering.
+    """
+    kept = []
+    seen_errors = {}
+    seen_traces = set()
+    for segment in segments:
+        if segment.kind == TEXT:
+            segment.lines = _collapse_repeats(segment.lines)
+            kept.append(segment)
+            continue
+
+        key = (tuple(segment.headline), tuple(segment.frames))
+        if key in seen_errors:
+            seen_errors[key].repeats += 1
+            continue
+        seen_errors[key] = segment
+
+        frames = collapse_frames(segment.frames)
+        trace = tuple(frames[1:])
+        if len(trace) > 1 and trace in seen_traces:
+            frames = frames[:1] + ["\t... (rest of backtrace same as above)"]
+        else:
+            seen_traces.add(trace)
+        segment.lines = segment.headline + frames
+        kept.append(segment)
+
+    for segment in kept:
+        if segment.repeats:
+            segment.lines.append(f"[same error repeated {segment.repeats} more times]")
+    return kept
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Run several independent prompts against GitHub Models concurrently.
+
+Usage:
+  python3 batch_models.py prompt_a.txt prompt_b.txt [--output-dir DIR]
+  python3 batch_models.py prompts.jsonl [--concurrency N] [--no-cache]
+
+Each argument is a prompt file, or a JSONL file with one prompt per line:
+
+  {"id": "rails", "prompt": "..."}
+  {"id": "sqlite3", "prompt_file": "prompt_sqlite3.txt", "model": "openai/gpt-4o-mini"}
+
+The response for each prompt is written to DIR/<id>.txt (the file name
+without extension for prompt files); ids may only use letters, digits,
+'.', '_' and '-'. A line's "model" wins over MODEL_NAME, which is the
+default for the others. At most --concurrency calls are in flight at once
+(MODEL_CONCURRENCY, default 4); throttled calls are retried by
+call_github_models as usual. Exits 1 if any call failed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+from call_github_models import call_github_models
+from response_cache import ResponseCache
+
+# Ids name the output files, so they must not reach outside --output-dir
+PROMPT_ID_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9._-]*$')
+
+
+def load_prompts(paths):
+    """[(id, prompt text, model or None)] from prompt and JSONL files."""
+    prompts = []
+    for path in paths:
+        if not path.endswith('.jsonl'):
+            with open(path, 'r', encoding='utf-8') as f:
+                name = os.path.splitext(os.path.basename(path))[0]
+                prompts.append((name, f.read(), None))
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                text = entry.get('prompt')
+                if text is None:
+                    with open(entry['prompt_file'], 'r', encoding='utf-8') as pf:
+                        text = pf.read()
+                name = str(entry.get('id') or f"{os.path.splitext(os.path.basename(path))[0]}_{number}")
+                if not PROMPT_ID_RE.match(name):
+                    raise ValueError(f"invalid prompt id on line {number} of {path}: {name!r}")
+                prompts.append((name, text, entry.get('model')))
+
+    seen = set()
+    for name, _, _ in prompts:
+        if name in seen:
+            raise ValueError(f"duplicate prompt id: {name}")
+        seen.add(name)
+    return prompts
+
+
+async def run_one(semaphore, name, text, model, output_dir, cache):
+    async with semaphore:
+        started = time.perf_counter()
+        # The HTTP client is blocking; each call gets a worker thread and
+        # shares the process-wide keep-alive pool
+        response = await asyncio.to_thread(call_github_models, text, model=model, cache=cache)
+        elapsed = time.perf_counter() - started
+
+    output = os.path.join(output_dir, f"{name}.txt")
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(response)
+        f.write('\n')
+    ok = not response.strip().startswith("Error:")
+    return name, ok, elapsed, output
+
+
+async def run_batch(prompts, output_dir, concurrency, cache=None):
+    """Run every prompt, at most `concurrency` at a time; returns results in input order."""
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(
+        run_one(semaphore, name, text, model, output_dir, cache)
+        for name, text, model in prompts
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Call GitHub Models for many prompts concurrently.")
+    parser.add_argument('inputs', nargs='+', help="prompt files and/or JSONL files of prompts")
+    parser.add_argument('--output-dir', default='batch_output',
+                        help="directory for <id>.txt responses (default: %(default)s)")
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.environ.get("MODEL_CONCURRENCY", "4")),
+                        help="maximum calls in flight (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the response cache")
+    args = parser.parse_args()
+
+    try:
+        prompts = load_prompts(args.inputs)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: could not load prompts: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not prompts:
+        print("Error: no prompts given", file=sys.stderr)
+        sys.exit(1)
+
+    cache = None if args.no_cache else ResponseCache()
+    started = time.perf_counter()
+    results = asyncio.run(run_batch(prompts, args.output_dir, max(args.concurrency, 1), cache))
+    elapsed = time.perf_counter() - started
+
+    failed = 0
+    for name, ok, seconds, output in results:
+        failed += not ok
+        print(f"{'OK    ' if ok else 'FAILED'} {name:<30} {seconds:>7.2f} s  -> {output}")
+    print(f"{len(results) - failed}/{len(results)} prompts succeeded in {elapsed:.2f} s "
+          f"(concurrency {args.concurrency})")
+    if cache is not None:
+        print(f"Response cache: {cache.summary()}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the auto-fix helper scripts.
+
+Run from .github/scripts, e.g.: python3 -m benchmarks.parse_fixes
+
+benchmarks.suite times the hot paths together on synthetic inputs and
+compares the results against a saved JSON baseline. benchmarks.pipeline
+runs the whole fix loop on a scratch copy of the project against
+benchmarks.mock_model, a local server replaying recorded model responses;
+benchmarks.fix_loop compares fix_loop.py with a process per step.
+"""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Measure what running the fix loop in one process saves per iteration.
+
+Usage: python3 -m benchmarks.fix_loop [iterations] [blocks]
+
+Runs the same iterations twice on fresh scratch copies of the project,
+against a local mock model (benchmarks.mock_model):
+  - scripts:  a python3 process per step, as the workflow used to run
+    them (build_ai_prompt.py, call_github_models.py, apply_fixes.py,
+    syntax_check.py, affected_tests.py, failure_fingerprint.py record)
+  - fix_loop: one `fix_loop.py` process for all iterations
+and reports wall time per iteration and the connections the model server
+accepted. The test command is `false`, so no test time is counted and
+every iteration runs; each one gets a new synthetic response of `blocks`
+FIX blocks.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_model import Recordings
+from benchmarks.pipeline import GIT_IDENTITY, ROOT, SyntheticModel, scratch_copy
+
+SCRIPTS = os.path.join(ROOT, ".github", "scripts")
+
+
+def script(name):
+    return [sys.executable, os.path.join(SCRIPTS, name)]
+
+
+def run_scripts(iterations, env):
+    """The fix loop as separate script processes, one step at a time."""
+    log = "test_output.txt"
+    for iteration in range(1, iterations + 1):
+        prompt, fixes = f"prompt_{iteration}.txt", f"fixes_iteration_{iteration}.txt"
+        changed = f"changed_files_{iteration}.txt"
+        with open(prompt, "w") as out:
+            subprocess.call(script("build_ai_prompt.py") + [str(iteration), log], stdout=out, env=env)
+        with open(prompt) as stdin, open(fixes, "w") as out:
+            subprocess.call(script("call_github_models.py") + ["--no-cache"], stdin=stdin, stdout=out, env=env)
+        subprocess.call(script("apply_fixes.py") + [fixes], stdout=subprocess.DEVNULL, env=env)
+        subprocess.call(f"{{ git diff --name-only HEAD; git ls-files --others --exclude-standard; }} > {changed}",
+                        shell=True, env=env)
+        if subprocess.call(script("syntax_check.py") + ["--fail-fast"], stdout=subprocess.DEVNULL, env=env) == 0:
+            subprocess.call(["git", "add", "-A"], env=env)
+            subprocess.call(["git", "commit", "-q", "-m", f"fix: iteration {iteration}"], env=env)
+        subprocess.call(script("affected_tests.py") + ["--changed", changed, "--failed", log],
+                        stdout=subprocess.DEVNULL, env=env)
+        log = f"test_output_{iteration}.txt"
+        subprocess.call(f"false > {log} 2>&1", shell=True, env=env)
+        subprocess.call(script("failure_fingerprint.py") + ["record", str(iteration), log],
+                        stdout=subprocess.DEVNULL, env=env)
+
+
+def run_fix_loop(iterations, env):
+    subprocess.call(script("fix_loop.py") + ["--iterations", str(iterations), "--test-command", "false",
+                                             "--prepare-command", "", "--no-cache", "--no-memo"],
+                    stdout=subprocess.DEVNULL, env=env)
+
+
+def measure(mode, iterations, blocks):
+    """(seconds, connections accepted by the model server) of one run."""
+    scratch = tempfile.mkdtemp(prefix="auto-fix-loop-")
+    cwd = os.getcwd()
+    try:
+        scratch_copy(ROOT, scratch)
+        shutil.copy(os.path.join(ROOT, "test_output.txt"), scratch)
+        with SyntheticModel(Recordings(), blocks) as server:
+            env = {**os.environ, **GIT_IDENTITY, "MODEL_ENDPOINT": server.url, "GITHUB_TOKEN": "mock",
+                   "MODEL_METRICS_PATH": os.path.join(scratch, ".git", "model-metrics.jsonl")}
+            env.pop("GITHUB_OUTPUT", None)
+            env.pop("AUTO_FIX_TRACE", None)
+            os.chdir(scratch)
+            start = time.perf_counter()
+            mode(iterations, env)
+            return time.perf_counter() - start, server.connections
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    if not os.path.isfile(os.path.join(ROOT, "test_output.txt")):
+        print(f"Error: needs {os.path.join(ROOT, 'test_output.txt')} as the initial test log", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{iterations} iterations, {blocks} FIX blocks per response")
+    print(f"{'mode':<10} {'total s':>8} {'per iter s':>11} {'connections':>12}")
+    results = {}
+    for name, mode in (("scripts", run_scripts), ("fix_loop", run_fix_loop)):
+        seconds, connections = measure(mode, iterations, blocks)
+        results[name] = seconds
+        print(f"{name:<10} {seconds:>8.2f} {seconds / iterations:>11.2f} {connections:>12}", flush=True)
+    saved = (results["scripts"] - results["fix_loop"]) / iterations
+    print(f"\nfix_loop saves {saved * 1000:.0f} ms per iteration "
+          f"({results['scripts'] / results['fix_loop']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
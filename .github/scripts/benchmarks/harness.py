@@ -0,0 +1,63 @@
+"""
+Repeatable timing for the benchmark suite.
+
+measure() runs a function a few times untimed to warm caches, then times
+`repeat` runs with the garbage collector off (as timeit does) and reports
+min/median/mean/stdev. Peak memory comes from one extra run under
+tracemalloc, kept apart because tracing allocations slows the code down.
+"""
+
+import contextlib
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+
+def _call(func, setup):
+    args = setup() if setup else ()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+
+def measure(func, setup=None, warmup=1, repeat=5):
+    """Timing statistics (seconds) and tracemalloc peak (bytes) of func(*setup()).
+
+    `setup` runs before every call, outside the timed region, and returns
+    the arguments; the function's stdout is discarded.
+    """
+    for _ in range(warmup):
+        _call(func, setup)
+
+    times = []
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            times.append(_call(func, setup))
+    finally:
+        if enabled:
+            gc.enable()
+
+    args = setup() if setup else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'runs': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'peak_bytes': peak,
+    }
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Measure what connection reuse in http_client saves over urllib.
+
+Usage: python3 -m benchmarks.keepalive [calls] [handshake_ms]
+
+Runs the same sequence of chat-completion calls against a local stub
+server, once with a fresh urllib request per call (what the scripts used
+to do) and once through a shared HttpClient, and reports wall time and the
+number of connections the server had to accept.
+"""
+
+import json
+import sys
+import time
+import urllib.request
+
+from benchmarks.stub_server import StubServer
+from http_client import HttpClient
+
+PAYLOAD = {"model": "openai/gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def with_urllib(url, calls):
+    for _ in range(calls):
+        request = urllib.request.Request(
+            url, data=json.dumps(PAYLOAD).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=30) as response:
+            json.loads(response.read().decode("utf-8"))
+
+
+def with_client(url, calls):
+    client = HttpClient()
+    for _ in range(calls):
+        client.post_json(url, PAYLOAD).json()
+    client.close()
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    handshake = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+
+    print(f"{calls} calls, {handshake * 1000:.0f} ms simulated handshake per connection")
+    for name, run in (("urllib", with_urllib), ("http_client", with_client)):
+        with StubServer(handshake_delay=handshake) as server:
+            start = time.perf_counter()
+            run(server.url, calls)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<12} {elapsed:>8.3f} s  {server.connections:>4} connections  "
+                  f"{server.requests:>4} requests")
+
+
+if __name__ == '__main__':
+    main()
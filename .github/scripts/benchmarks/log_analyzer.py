@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark log_analyzer against per-pattern matching.
+
+Usage: python3 -m benchmarks.log_analyzer [max_mb]
+
+Runs on each sample test_output*.txt in the repository root, then on logs
+built by repeating them up to `max_mb` MB. The combined alternation does
+one search per line; the baseline searches every ERROR_PATTERNS regex in
+turn, which is what compiling the patterns individually would give.
+"""
+
+import glob
+import os
+import re
+import sys
+import tempfile
+import time
+
+from language_config import ERROR_PATTERNS
+from log_analyzer import analyze_file
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def per_pattern(path):
+    patterns = [(kind, re.compile(p)) for language in ERROR_PATTERNS
+                for kind, p in ERROR_PATTERNS[language].items()]
+    counts = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for kind, pattern in patterns:
+                if pattern.search(line):
+                    counts[kind] = counts.get(kind, 0) + 1
+                    break
+    return counts
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def report(name, path):
+    size = os.path.getsize(path)
+    combined_time, summary = timed(analyze_file, path)
+    baseline_time, _ = timed(per_pattern, path)
+    mb = size / (1024 * 1024)
+    print(f"{name:<20} {size:>11} {combined_time:>10.4f} {baseline_time:>11.4f} "
+          f"{mb / combined_time:>8.1f} {sum(e['count'] for e in summary['errors']):>7}")
+
+
+def main():
+    max_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 32
+    samples = sorted(glob.glob(os.path.join(ROOT, 'test_output*.txt')))
+    if not samples:
+        print("No test_output*.txt samples found in the repository root")
+        sys.exit(1)
+
+    print(f"{'log':<20} {'bytes':>11} {'combined':>10} {'per-pattern':>11} {'MB/s':>8} {'errors':>7}")
+    for path in samples:
+        report(os.path.basename(path), path)
+
+    text = ''
+    for path in samples:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text += f.read()
+    with tempfile.TemporaryDirectory() as scratch:
+        mb = 1
+        while mb <= max_mb:
+            path = os.path.join(scratch, f'log_{mb}mb.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                for _ in range(max(1, int(mb * 1024 * 1024 / len(text)))):
+                    f.write(text)
+            report(f"synthetic {mb} MB", path)
+            mb *= 4
+
+
+if __name__ == '__main__':
+    main()
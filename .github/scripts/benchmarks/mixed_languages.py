@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark universal_apply_fixes on a mixed-language fix batch.
+
+Usage: python3 -m benchmarks.mixed_languages [max_files]
+
+A scratch project is generated with Ruby (including a Gemfile),
+JavaScript, TypeScript, Python, YAML and JSON files, and a response that
+sends each code file an import, a new definition and a SEARCH/REPLACE
+edit, and each data file an edit. The files are interleaved in the
+response the way a model tends to send them. The applier groups the fixes
+by language and applies each batch with that language's applier.
+
+Reported per size: parse and apply time, the language batches, and how
+many inserted imports landed right after the file's first import line
+(which needs the language's own anchor keywords).
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from hash_manifest import HashManifest
+from universal_apply_fixes import UniversalFixApplier
+
+# extension: (fence, first import line, import to insert, definition line, definition to insert)
+SOURCES = {
+    'rb': ('ruby', "require 'json'", "require 'sqlite3'", 'class Model{n}', 'def helper_{n}; end'),
+    'js': ('javascript', "import fs from 'fs'", "import path from 'path'", 'function main{n}() {}',
+           'function helper{n}() {}'),
+    'ts': ('typescript', "import fs from 'fs'", "import path from 'path'", 'interface Shape{n} {}',
+           'function helper{n}(): void {}'),
+    'py': ('python', 'import os', 'import json', 'def main_{n}():', 'def helper_{n}():\n    pass'),
+}
+DATA = {
+    'yml': ('yaml', 'adapter: sqlite3', 'adapter: sqlite3\npool: 5'),
+    'json': ('json', '"version": "1.0.0"', '"version": "1.0.1"'),
+}
+BODY_LINES = 60
+
+
+def build_project(root, files):
+    """Write `files` source files across the languages; returns the response text."""
+    blocks = []
+    kinds = list(SOURCES) + list(DATA)
+    for i in range(files):
+        ext = kinds[i % len(kinds)]
+        path = f"src/{ext}/file_{i}.{ext}"
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        if ext in SOURCES:
+            fence, first_import, new_import, definition, new_definition = SOURCES[ext]
+            lines = [first_import, '']
+            lines += [definition.replace('{n}', str(i))]
+            lines += [f"  # body line {j}" if ext != 'py' else f"    x_{j} = {j}" for j in range(BODY_LINES)]
+            with open(os.path.join(root, path), 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            blocks.append((path, fence, new_import))
+            blocks.append((path, fence, new_definition.replace('{n}', str(i))))
+            old = lines[10]
+            blocks.append((path, fence, f"<<<<<<< SEARCH\n{old}\n=======\n{old} # edited\n>>>>>>> REPLACE"))
+        else:
+            fence, old, new = DATA[ext]
+            content = f"{{\n  {old}\n}}\n" if ext == 'json' else f"default:\n  {old}\n"
+            with open(os.path.join(root, path), 'w') as f:
+                f.write(content)
+            blocks.append((path, fence, f"<<<<<<< SEARCH\n  {old}\n=======\n  {new}\n>>>>>>> REPLACE"))
+    if files:
+        with open(os.path.join(root, 'Gemfile'), 'w') as f:
+            f.write("source 'https://rubygems.org'\n\nrequire 'bundler'\n\ngem 'rails'\n")
+        blocks.append(('Gemfile', 'ruby', "require 'sqlite3'"))
+
+    # Interleave: every file's first fix, then every file's second, ...
+    ordered = sorted(enumerate(blocks), key=lambda item: (_round(blocks, item[0]), item[0]))
+    parts = [f"FIX_FILE: {path}\n```{fence}\n{body}\n```\n" for _, (path, fence, body) in ordered]
+    parts.append("COMMIT_MESSAGE: mixed-language benchmark fixes\n")
+    return '\n'.join(parts)
+
+
+def _round(blocks, index):
+    path = blocks[index][0]
+    return sum(1 for other, _, _ in blocks[:index] if other == path)
+
+
+def imports_in_place(root):
+    """(files whose second line is the inserted import, source files)."""
+    placed = total = 0
+    for directory, _, names in os.walk(os.path.join(root, 'src')):
+        for name in names:
+            ext = name.rsplit('.', 1)[1]
+            if ext not in SOURCES:
+                continue
+            total += 1
+            with open(os.path.join(directory, name)) as f:
+                lines = f.read().split('\n')
+            placed += len(lines) > 2 and lines[2] == SOURCES[ext][2]
+    return placed, total
+
+
+def run(files):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        response = build_project(root, files)
+        with open(os.path.join(root, 'fixes.txt'), 'w') as f:
+            f.write(response)
+        os.chdir(root)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                applier = UniversalFixApplier('fixes.txt', manifest=HashManifest(None))
+                parsed = time.perf_counter()
+                batches = {language: len(batch) for language, batch in applier.group_by_language().items()}
+                ok = applier.apply_fixes()
+                done = time.perf_counter()
+            placed, total = imports_in_place(root)
+        finally:
+            os.chdir(cwd)
+    return {
+        'fixes': len(applier.fixes),
+        'parse': parsed - start,
+        'apply': done - parsed,
+        'batches': batches,
+        'ok': ok,
+        'placed': placed,
+        'sources': total,
+    }
+
+
+def main():
+    max_files = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    print(f"{'files':>6} {'fixes':>6} {'parse s':>8} {'apply s':>8} {'us/fix':>7} {'imports':>9}  batches")
+    files = 6
+    while files <= max_files:
+        result = run(files)
+        per_fix = 1e6 * (result['parse'] + result['apply']) / max(result['fixes'], 1)
+        batches = ', '.join(f"{name}={count}" for name, count in result['batches'].items())
+        print(f"{files:>6} {result['fixes']:>6} {result['parse']:>8.4f} {result['apply']:>8.4f} "
+              f"{per_fix:>7.0f} {result['placed']:>4}/{result['sources']:<4}  {batches}"
+              + ('' if result['ok'] else '  (some fixes failed)'))
+        files *= 4
+
+
+if __name__ == '__main__':
+    main()
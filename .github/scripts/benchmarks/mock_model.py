@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Mock chat-completions server that replays recorded model responses.
+
+Usage:
+  python3 -m benchmarks.mock_model record <prompt file> <response file> [--recordings FILE]
+  python3 -m benchmarks.mock_model serve [--recordings FILE] [--reply FILE] [--upstream URL]
+                                         [--port N] [--latency S] [--token-delay S]
+                                         [--throttle-every N] [--throttle-rate P] [--retry-after S]
+
+Recordings are JSON lines, {"key", "model", "prompt", "response"}, keyed
+by a digest of the prompt (the last user message, stripped), so
+`record prompt_1.txt fixes_iteration_1.txt` makes the server answer the
+prompt the workflow built with the fixes the model gave for it.
+
+`serve` prints the server's URL; point the scripts at it with
+MODEL_ENDPOINT (any GITHUB_TOKEN will do). A prompt without a recording
+gets the --reply file when one is given, is forwarded to --upstream and
+recorded when that is given, and otherwise gets a 404. Streaming,
+keep-alive and usage blocks behave as in stub_server.py; --latency is
+slept before the first byte of every response, and --throttle-every /
+--throttle-rate answer every Nth request, or a random share of them, with
+429 and a Retry-After of --retry-after seconds.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+
+from benchmarks.stub_server import StubServer
+from http_client import HttpClient
+from retry import call_with_retry
+
+DEFAULT_RECORDINGS = "recordings.jsonl"
+
+
+def prompt_of(request):
+    """Text of the last user message of a chat-completions request."""
+    for message in reversed(request.get("messages") or []):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+class Recordings:
+    """Recorded responses keyed by prompt digest, appended to a JSONL file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.responses = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry["response"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    @staticmethod
+    def key(prompt):
+        return hashlib.blake2b(prompt.strip().encode("utf-8"), digest_size=16).hexdigest()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def get(self, prompt):
+        return self.responses.get(self.key(prompt))
+
+    def add(self, prompt, response, model=None):
+        key = self.key(prompt)
+        with self.lock:
+            self.responses[key] = response
+            if not self.path:
+                return
+            entry = {"key": key, "model": model, "prompt": prompt[:200], "response": response}
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+class MockModelServer(StubServer):
+    """StubServer answering from Recordings, with optional 429 injection and record-through."""
+
+    def __init__(self, recordings, reply=None, upstream=None, throttle_every=0, throttle_rate=0.0,
+                 retry_after=1.0, seed=0, **options):
+        super().__init__(reply=reply, **options)
+        self.recordings = recordings
+        self.upstream = upstream
+        self.throttle_every = throttle_every
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.client = HttpClient() if upstream else None
+        self.counts = {"requests": 0, "replayed": 0, "recorded": 0, "default": 0, "missed": 0, "throttled": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+            return self.counts[name]
+
+    def next_failure(self, request):
+        failure = super().next_failure(request)
+        if failure is not None:
+            return failure
+        with self.lock:
+            self.counts["requests"] += 1
+            throttle = ((self.throttle_every and self.counts["requests"] % self.throttle_every == 0)
+                        or (self.throttle_rate and self.rng.random() < self.throttle_rate))
+            if throttle:
+                self.counts["throttled"] += 1
+                return 429, {"Retry-After": f"{self.retry_after:g}"}
+        return None
+
+    def reply_for(self, request):
+        prompt = prompt_of(request)
+        reply = self.recordings.get(prompt)
+        if reply is not None:
+            self.count("replayed")
+            return reply
+        if self.upstream:
+            reply = self.fetch(request)
+            if reply is not None:
+                self.recordings.add(prompt, reply, request.get("model"))
+                self.count("recorded")
+                return reply
+        reply = self.default_reply(request)
+        if reply is not None:
+            self.count("default")
+            return reply
+        self.count("missed")
+        return None
+
+    def default_reply(self, request):
+        """Reply to a prompt that has no recording; None answers 404."""
+        return self.reply
+
+    def fetch(self, request):
+        """The upstream's answer to `request` (asked without streaming), or None."""
+        payload = {k: v for k, v in request.items() if k not in ("stream", "stream_options")}
+        headers = {
+            "Authorization": f"Bearer {os.environ.get('GITHUB_TOKEN', '')}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        try:
+            response, _ = call_with_retry(lambda: self.client.post_json(self.upstream, payload, headers=headers))
+            if response.ok:
+                return response.json()["choices"][0]["message"]["content"]
+            print(f"Upstream answered {response.status}: {response.text()[:200]}", file=sys.stderr)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"Upstream call failed: {e}", file=sys.stderr)
+        return None
+
+    def summary(self):
+        counts = self.counts
+        return (f"{counts['requests']} requests: {counts['replayed']} replayed, {counts['recorded']} recorded, "
+                f"{counts['default']} default, {counts['missed']} missed, {counts['throttled']} throttled")
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded model responses over HTTP.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="store a prompt file and the response to it")
+    record.add_argument("prompt_file")
+    record.add_argument("response_file")
+    record.add_argument("--model", default=None)
+    serve = commands.add_parser("serve", help="answer chat-completion requests from the recordings")
+    serve.add_argument("--reply", default=None, help="file answering prompts that have no recording")
+    serve.add_argument("--upstream", default=None, help="endpoint to fetch and record unknown prompts from")
+    serve.add_argument("--port", type=int, default=0, help="port to listen on (default: any free one)")
+    serve.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    serve.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed events")
+    serve.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with 429")
+    serve.add_argument("--throttle-rate", type=float, default=0.0, help="answer this share of requests with 429")
+    serve.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429s, in seconds")
+    for command in (record, serve):
+        command.add_argument("--recordings", default=DEFAULT_RECORDINGS,
+                             help="recordings file (default: %(default)s)")
+    args = parser.parse_args()
+
+    recordings = Recordings(args.recordings)
+    if args.command == "record":
+        try:
+            prompt, response = read_text(args.prompt_file), read_text(args.response_file)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        recordings.add(prompt, response, args.model)
+        print(f"Recorded {args.response_file} for {args.prompt_file} ({len(recordings)} in {args.recordings})")
+        return
+
+    reply = read_text(args.reply) if args.reply else None
+    server = MockModelServer(recordings, reply=reply, upstream=args.upstream, port=args.port,
+                             first_byte_delay=args.latency, token_delay=args.token_delay,
+                             throttle_every=args.throttle_every, throttle_rate=args.throttle_rate,
+                             retry_after=args.retry_after)
+    print(f"Serving {len(recordings)} recorded responses at {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark apply_fixes.parse_fixes against the old two-pass regex parser.
+
+Usage: python3 -m benchmarks.parse_fixes [max_blocks]
+
+Two inputs are generated at doubling sizes:
+  - well formed: N complete FIX_FILE / ### FIX blocks
+  - adversarial: N headers whose fences are never closed
+
+Each is parsed as one string, as a stream of chunks and as bytes (the
+path apply_fixes.py takes over an mmap of the response).
+
+The streaming parser should stay at a flat cost per KB on both. On the
+adversarial input the legacy regexes swallow each following header into the
+unclosed body, so the "found" columns are reported alongside the timings.
+"""
+
+import re
+import sys
+import time
+
+from apply_fixes import parse_fixes
+from fix_parsing import iter_fixes, scan_fixes
+
+
+def legacy_parse_fixes(content):
+    """The original DOTALL findall implementation, kept for comparison."""
+    matches = []
+    pattern_fix = r'###\s*FIX:\s*([^\n]+)\n\s*```[\w-]*\n(.*?)```'
+    for filepath, file_content in re.findall(pattern_fix, content, re.DOTALL):
+        matches.append((filepath.strip(), file_content.rstrip()))
+    pattern_fix_file = r'FIX_FILE:\s*([^\n]+)\n\s*```[\w-]*\n(.*?)```'
+    for filepath, file_content in re.findall(pattern_fix_file, content, re.DOTALL):
+        matches.append((filepath.strip(), file_content.rstrip()))
+    return matches
+
+
+def well_formed(blocks, body_lines=40):
+    body = '\n'.join(f"  puts 'line {i}'" for i in range(body_lines))
+    parts = []
+    for i in range(blocks):
+        header = 'FIX_FILE:' if i % 2 else '### FIX:'
+        parts.append(f"{header} app/models/model_{i}.rb\n```ruby\n{body}\n```\n")
+    return '\n'.join(parts)
+
+
+def unclosed(blocks, body_lines=40):
+    body = '\n'.join(f"  puts 'line {i}'" for i in range(body_lines))
+    return '\n'.join(
+        f"### FIX: app/models/model_{i}.rb\n```ruby\n{body}\n" for i in range(blocks)
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def chunked(content, size=4096):
+    for i in range(0, len(content), size):
+        yield content[i:i + size]
+
+
+def main():
+    max_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+
+    print(f"{'input':<12} {'blocks':>7} {'bytes':>10} {'stream (s)':>11} "
+          f"{'chunked (s)':>12} {'bytes (s)':>10} {'legacy (s)':>11} {'us/KB':>7} {'found':>13}")
+    for name, build in (('well formed', well_formed), ('unclosed', unclosed)):
+        blocks = 250
+        while blocks <= max_blocks:
+            content = build(blocks)
+            stream_time, fixes = timed(parse_fixes, content)
+            chunk_time, chunk_fixes = timed(lambda: list(iter_fixes(chunked(content))))
+            encoded = content.encode()
+            bytes_time, _ = timed(lambda: list(scan_fixes(encoded)))
+            legacy_time, legacy = timed(legacy_parse_fixes, content)
+            if chunk_fixes != fixes:
+                print("MISMATCH between whole-string and chunked parsing")
+                sys.exit(1)
+            if name == 'well formed' and sorted(legacy) != sorted(fixes):
+                print("MISMATCH between legacy and streaming parser")
+                sys.exit(1)
+            per_kb = stream_time * 1e6 / (len(content) / 1024)
+            found = f"{len(fixes)}/{len(legacy)}"
+            print(f"{name:<12} {blocks:>7} {len(content):>10} {stream_time:>11.4f} "
+                  f"{chunk_time:>12.4f} {bytes_time:>10.4f} {legacy_time:>11.4f} {per_kb:>7.1f} {found:>13}")
+            blocks *= 2
+
+
+if __name__ == '__main__':
+    main()
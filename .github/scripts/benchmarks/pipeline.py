@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Time the whole fix loop offline: prompt build, model call, apply, validate.
+
+Usage:
+  python3 -m benchmarks.pipeline [--iterations N] [--recordings FILE] [--reply FILE] [--blocks N]
+                                 [--upstream URL] [--latency S] [--token-delay S] [--stream]
+                                 [--throttle-every N] [--retry-after S] [--logs DIR]
+                                 [--test-command CMD] [--trace FILE] [--keep]
+
+Copies the project's tracked and untracked, non-ignored files into a
+scratch git repository and runs fix_loop.FixLoop there, with the model
+served by benchmarks.mock_model. Each iteration times:
+
+  prompt    build_ai_prompt.build_prompt on the previous test log
+  model     call_github_models through MODEL_ENDPOINT
+  apply     apply_fixes.apply_response
+  validate  syntax_check.SyntaxGate on the files the apply step wrote
+  commit    a git commit of those files, as the workflow makes between iterations
+  tests     --test-command in the scratch copy, or without one the recorded
+            test_output_<N>.txt of --logs (the log of the iteration before
+            is reused when there is none)
+
+With replayed logs every iteration runs: the loop's no-progress stop is
+off, and unrecorded prompts get a different synthetic response each time.
+Prompts without a recording are answered with --reply, or else with a
+synthetic response of --blocks FIX blocks (benchmarks/synthetic.py), so
+the run needs no network; record real answers with
+`benchmarks.mock_model record` or with --upstream. Tracing is enabled in
+memory, so next to the stage table the report breaks each stage into its
+spans (model.request, apply.write, ...) and lists the model-call metrics
+of the run. The loop's own output goes to .git/pipeline.log of the
+scratch copy (see --keep).
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import tracing
+from build_ai_prompt import DEFAULT_BUDGET
+from fix_loop import FixLoop
+from model_metrics import aggregate, format_report, read_metrics
+
+from benchmarks.mock_model import MockModelServer, Recordings
+from benchmarks.synthetic import fix_response
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+STAGES = ("prompt", "model", "apply", "validate", "commit", "tests")
+GIT_IDENTITY = {"GIT_AUTHOR_NAME": "pipeline", "GIT_AUTHOR_EMAIL": "pipeline@localhost",
+                "GIT_COMMITTER_NAME": "pipeline", "GIT_COMMITTER_EMAIL": "pipeline@localhost"}
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True,
+                          env={**os.environ, **GIT_IDENTITY}).stdout
+
+
+def scratch_copy(source, dest):
+    """Copy the project into a fresh repository at `dest`; returns the number of files."""
+    copied = 0
+    for name in git("ls-files", "-co", "--exclude-standard", "-z", cwd=source).split("\0"):
+        path = os.path.join(source, name)
+        if not name or not os.path.isfile(path):
+            continue
+        target = os.path.join(dest, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(path, target)
+        copied += 1
+    git("init", "-q", cwd=dest)
+    git("add", "-A", cwd=dest)
+    git("commit", "-q", "-m", "baseline", cwd=dest)
+    return copied
+
+
+class SyntheticModel(MockModelServer):
+    """MockModelServer answering unrecorded prompts with a new synthetic response each time."""
+
+    def __init__(self, recordings, blocks, **options):
+        super().__init__(recordings, **options)
+        self.blocks = blocks
+
+    def default_reply(self, request):
+        if self.reply is not None:
+            return self.reply
+        return fix_response(self.blocks, seed=self.counts["default"])
+
+
+class ReplayLoop(FixLoop):
+    """FixLoop whose test stage replays the recorded logs unless it has a test command."""
+
+    def __init__(self, logs, **options):
+        super().__init__(**options)
+        self.logs = logs
+
+    def run_tests(self, iteration, changed, previous_log, final):
+        if self.test_command:
+            return super().run_tests(iteration, changed, previous_log, final)
+        log = os.path.join(self.logs, f"test_output_{iteration}.txt")
+        return (log if os.path.isfile(log) else previous_log), 1, True
+
+    def no_progress(self, iteration, log):
+        # Still records the fingerprints the next prompt is built with
+        stalled = super().no_progress(iteration, log)
+        return stalled and bool(self.test_command)
+
+
+def stage_table(results):
+    lines = [f"{'iteration':<10}" + "".join(f"{stage:>10}" for stage in STAGES) + f"{'total ms':>10}"]
+    for result in results:
+        row = [result["times"].get(stage, 0.0) * 1000 for stage in STAGES]
+        lines.append(f"{result['iteration']:<10}" + "".join(f"{ms:>10.1f}" for ms in row)
+                     + f"{sum(row):>10.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fix loop end to end against a mock model.")
+    parser.add_argument("--iterations", type=int, default=3, help="fix iterations (default: %(default)s)")
+    parser.add_argument("--recordings", default=None, help="recorded responses (see benchmarks.mock_model)")
+    parser.add_argument("--reply", default=None, help="file answering prompts that have no recording")
+    parser.add_argument("--blocks", type=int, default=20,
+                        help="FIX blocks of the synthetic default reply (default: %(default)s)")
+    parser.add_argument("--upstream", default=None, help="fetch and record prompts without a recording here")
+    parser.add_argument("--latency", type=float, default=0.0, help="model seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed events")
+    parser.add_argument("--stream", action="store_true", help="stream the model's responses")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2,
+                        help="Retry-After of the 429s, in seconds (default: %(default)s)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="prompt token budget")
+    parser.add_argument("--logs", default=ROOT, help="directory of the recorded test_output*.txt logs")
+    parser.add_argument("--test-command", default=None, help="run this as the test stage instead")
+    parser.add_argument("--trace", default=None, help="also write the Chrome trace to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch repository")
+    args = parser.parse_args()
+    args.logs = os.path.abspath(args.logs)
+
+    reply = None
+    if args.reply:
+        with open(args.reply, "r", encoding="utf-8") as f:
+            reply = f.read()
+    recordings = Recordings(os.path.abspath(args.recordings) if args.recordings else None)
+    scratch = tempfile.mkdtemp(prefix="auto-fix-pipeline-")
+    server = SyntheticModel(recordings, args.blocks, reply=reply, upstream=args.upstream,
+                            first_byte_delay=args.latency, token_delay=args.token_delay,
+                            throttle_every=args.throttle_every, retry_after=args.retry_after)
+    cwd = os.getcwd()
+    try:
+        start = time.perf_counter()
+        files = scratch_copy(ROOT, scratch)
+        copy_seconds = time.perf_counter() - start
+        print(f"Scratch copy: {files} files in {copy_seconds:.2f}s at {scratch}")
+
+        metrics = os.path.join(scratch, ".git", "model-metrics.jsonl")
+        os.environ.update({"MODEL_ENDPOINT": server.url, "MODEL_METRICS_PATH": metrics, **GIT_IDENTITY})
+        os.environ.setdefault("GITHUB_TOKEN", "mock")
+        os.environ.pop("GITHUB_OUTPUT", None)
+        tracer = tracing.enable(os.path.abspath(args.trace) if args.trace else None, "pipeline")
+        os.chdir(scratch)
+        loop = ReplayLoop(args.logs, iterations=args.iterations, test_command=args.test_command,
+                          prepare_command=None, budget=args.budget, stream=args.stream)
+        with server, open(os.path.join(scratch, ".git", "pipeline.log"), "w") as out:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(out):
+                loop.run(os.path.join(args.logs, "test_output.txt"))
+                print(loop.report())
+            wall = time.perf_counter() - start
+
+        events = list(tracer.events)
+        print(f"\n{stage_table(loop.results)}")
+        print(f"\nTotal wall time: {wall:.2f}s for {len(loop.results)} iteration(s); "
+              f"stopped: {loop.stop_reason}")
+        print(f"\n{tracing.format_summary(tracing.summarize(events))}")
+        if os.path.exists(metrics):
+            print(f"\n{format_report(aggregate(read_metrics(metrics)))}")
+        print(f"\nMock model: {server.summary()}")
+        tracer.flush()
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Kept {scratch} (loop output in .git/pipeline.log)")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
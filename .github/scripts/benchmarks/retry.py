@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Exercise retry.call_with_retry against scripted 429/503 sequences.
+
+Usage: python3 -m benchmarks.retry
+
+Each scenario serves its failures from the local stub server before a
+normal reply and prints the attempts, waits and final status, so the
+backoff and header handling can be checked without the real endpoint.
+"""
+
+import time
+
+from benchmarks.stub_server import StubServer
+from http_client import HttpClient
+from retry import RetryPolicy, call_with_retry
+
+PAYLOAD = {"model": "openai/gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+
+SCENARIOS = [
+    ("429 with Retry-After", [(429, {"Retry-After": "0.3"})], {}),
+    ("503 x2, backoff", [(503, {}), (503, {})], {}),
+    ("rate limit reset", [(429, {"x-ratelimit-remaining-requests": "0",
+                                 "x-ratelimit-reset-requests": "250ms"})], {}),
+    ("attempts exhausted", [(503, {})] * 5, {"max_attempts": 3}),
+    ("deadline exceeded", [(429, {"Retry-After": "5"})], {"deadline": 1.0}),
+    ("not retryable", [(401, {})], {}),
+]
+
+
+def main():
+    print(f"{'scenario':<22} {'final':>5} {'attempts':>8} {'waited (s)':>10} {'wall (s)':>8}  history")
+    for name, failures, overrides in SCENARIOS:
+        policy = RetryPolicy(base_delay=0.1, **overrides)
+        with StubServer(failures=failures) as server:
+            client = HttpClient()
+            start = time.perf_counter()
+            response, stats = call_with_retry(lambda: client.post_json(server.url, PAYLOAD), policy)
+            wall = time.perf_counter() - start
+            client.close()
+        history = ", ".join(str(s) for s in stats.statuses)
+        print(f"{name:<22} {response.status:>5} {stats.attempts:>8} {stats.waited:>10.2f} {wall:>8.2f}  {history}")
+
+
+if __name__ == '__main__':
+    main()
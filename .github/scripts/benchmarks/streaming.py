@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure what streaming saves between the model call and applied fixes.
+
+Usage: python3 -m benchmarks.streaming [files] [token_ms]
+
+A stub server generates a response of `files` FIX blocks a few characters
+at a time. The blocking path waits for the whole completion and then runs
+apply_response; the streaming path applies each block as soon as it is
+closed. Reported are the time to the first file on disk and to the end.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from apply_fixes import StreamingApplier, apply_response
+from benchmarks.stub_server import StubServer
+from hash_manifest import HashManifest
+from http_client import HttpClient
+from model_stream import CompletionStream
+
+PAYLOAD = {"model": "openai/gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def make_reply(files, lines=40):
+    blocks = []
+    for n in range(files):
+        body = "\n".join(f"  value_{i} = {i}" for i in range(lines))
+        blocks.append(f"### FIX: app/models/model_{n}.rb\n```ruby\nclass Model{n}\n{body}\nend\n```\n")
+    return "\n".join(blocks)
+
+
+def first_write(directory):
+    times = [entry.stat().st_mtime for entry in os.scandir(directory)]
+    return min(times) if times else None
+
+
+def blocking(client, url):
+    response = client.post_json(url, PAYLOAD)
+    text = response.json()["choices"][0]["message"]["content"]
+    apply_response(text, manifest=HashManifest())
+
+
+def streaming(client, url):
+    response = client.post_json(url, dict(PAYLOAD, stream=True), stream=True)
+    applier = StreamingApplier(HashManifest(), checker=_NoChecks(), out=io.StringIO())
+    for delta in CompletionStream(response.iter_lines()):
+        applier.feed(delta)
+    applier.close()
+
+
+class _NoChecks:
+    # ruby may not be installed here; time only the apply path
+    def submit(self, path):
+        return False
+
+    def results(self):
+        return []
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    token_delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 1.0
+
+    reply = make_reply(files)
+    print(f"{files} FIX blocks, {len(reply)} chars, {token_delay * 1000:.1f} ms per 16-char event")
+    cwd = os.getcwd()
+    for name, run in (("blocking", blocking), ("streaming", streaming)):
+        with StubServer(reply=reply, token_delay=token_delay) as server, \
+                tempfile.TemporaryDirectory() as scratch:
+            os.chdir(scratch)
+            try:
+                client = HttpClient()
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run(client, server.url)
+                elapsed = time.time() - start
+                first = first_write(os.path.join(scratch, "app", "models")) - start
+            finally:
+                os.chdir(cwd)
+                client.close()
+            print(f"{name:<10} first file {first:>7.3f} s  all files {elapsed:>7.3f} s")
+
+
+if __name__ == '__main__':
+    main()
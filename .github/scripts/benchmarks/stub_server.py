@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the chat-completions endpoint, for benchmarks.
+
+Speaks HTTP/1.1 with keep-alive and counts the TCP connections it accepts.
+`handshake_delay` is slept once per new connection to stand in for the TLS
+handshake the real endpoint costs. `failures` scripts error responses, e.g.
+[(429, {"Retry-After": "1"}), (503, {})], which are served in order before
+the normal reply. Requests with `"stream": true` get the reply as
+server-sent events, a few characters per event, `token_delay` apart.
+Usage blocks count roughly four characters per token. `first_byte_delay`
+is slept before each response, standing in for the time the model takes
+to start answering. Subclasses choose the reply and failures per request
+by overriding reply_for() and next_failure().
+"""
+
+import gzip
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def usage(request, reply):
+    prompt = sum(len(m.get("content") or "") for m in request.get("messages", []))
+    prompt_tokens, completion_tokens = prompt // 4 + 1, len(reply) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle and
+        # delayed ACKs add 40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests += 1
+        failure = self.server.next_failure(request)
+        if failure is not None:
+            status, headers = failure
+            self.send_error_status(status, headers)
+            return
+        reply = self.server.reply_for(request)
+        if reply is None:
+            self.send_error_status(404, {}, "no recorded response for this prompt")
+            return
+        if self.server.first_byte_delay:
+            time.sleep(self.server.first_byte_delay)
+        if request.get("stream"):
+            self.send_stream(request, reply)
+            return
+        if self.server.token_delay:
+            # Same generation time as the streamed reply, all up front
+            events = -(-len(reply) // self.server.token_size)
+            time.sleep(self.server.token_delay * events)
+        body = json.dumps({
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": usage(request, reply),
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, request, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = self.server.token_size
+        pieces = [reply[i:i + size] for i in range(0, len(reply), size)]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            chunk = {
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": piece},
+                             "finish_reason": "stop" if last else None}],
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {"model": request.get("model", "stub"), "choices": [],
+                     "usage": usage(request, reply)}
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def send_error_status(self, status, headers, message="scripted failure"):
+        body = json.dumps({"error": {"code": str(status), "message": message}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, reply="NO_FIX_NEEDED", handshake_delay=0.0, failures=None,
+                 handler=StubHandler, token_delay=0.0, token_size=16, first_byte_delay=0.0, port=0):
+        super().__init__(("127.0.0.1", port), handler)
+        self.reply = reply
+        self.first_byte_delay = first_byte_delay
+        self.token_delay = token_delay
+        self.token_size = token_size
+        self.handshake_delay = handshake_delay
+        self.failures = list(failures or [])
+        self.connections = 0
+        self.requests = 0
+        self._thread = None
+
+    def next_failure(self, request):
+        """(status, headers) of an error to answer `request` with, or None."""
+        return self.failures.pop(0) if self.failures else None
+
+    def reply_for(self, request):
+        """Reply text for `request`; None answers 404."""
+        return self.reply
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the auto-fix hot paths, with a regression check.
+
+Usage:
+  python3 -m benchmarks.suite [--filter TEXT] [--full] [--repeat N]
+                              [--save baseline.json] [--compare baseline.json [--threshold 0.25]]
+
+Cases, on seeded synthetic inputs (see benchmarks/synthetic.py):
+  - apply_fixes.parse_fixes on responses with 1, 50 and 500 FIX blocks
+  - UniversalFixApplier parsing the same responses from a file
+  - fix_parsing.FixStream fed a one-block response of 120 KB and 480 KB
+    in 4-character deltas, as streamed model output arrives
+  - UniversalFixApplier.apply_block_fix inserting into 10k and 100k line files
+  - log_analyzer.analyze_file on 10 KB, 1 MB and 10 MB test logs (and
+    50 MB with --full)
+  - failure_fingerprint.log_failures on a 1 MB log
+
+Each case is warmed up once, timed --repeat times, and run once more
+under tracemalloc for its peak memory. --save writes the results to a
+JSON baseline; --compare checks the results against one and exits 1 when
+a case's fastest run or peak memory grew by more than --threshold (a
+fraction, default 0.25). The fastest run is compared rather than the
+median because it is the least disturbed by other load on the machine.
+Time differences under 0.5 ms and memory differences under 64 KB are
+ignored as noise. Baselines only compare on the machine they were
+recorded on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from apply_fixes import parse_fixes
+from failure_fingerprint import log_failures, read_lines
+from fix_parsing import FixStream
+from hash_manifest import HashManifest
+from log_analyzer import analyze_file
+from universal_apply_fixes import UniversalFixApplier, get_applier
+
+from benchmarks.harness import measure
+from benchmarks.synthetic import fix_response, source_file, test_log
+
+TIME_NOISE = 0.0005
+MEMORY_NOISE = 64 * 1024
+KB = 1024
+MB = 1024 * 1024
+
+
+def _write(scratch, name, text):
+    path = os.path.join(scratch, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def parse_case(blocks):
+    def build(scratch):
+        text = fix_response(blocks)
+        return parse_fixes, lambda: (text,)
+    return build
+
+
+def universal_parse_case(blocks):
+    def build(scratch):
+        path = _write(scratch, f'response_{blocks}.txt', fix_response(blocks))
+        return (lambda: UniversalFixApplier(path, manifest=HashManifest(None))), None
+    return build
+
+
+def block_fix_case(lines):
+    def build(scratch):
+        empty = _write(scratch, 'empty_response.txt', '')
+        path = _write(scratch, f'source_{lines}.rb', source_file(lines))
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        code = "def added_helper(value)\n  value.to_s\nend"
+
+        def run(applier):
+            applier.apply_block_fix(path, content, code)
+            applier.apply_block_fix(path, content, "require 'yaml'")
+
+        # A fresh applier per run: no cached index, no manifest entry
+        return run, lambda: (get_applier('ruby')(empty, manifest=HashManifest(None)),)
+    return build
+
+
+def stream_case(size, delta=4):
+    def build(scratch):
+        body = source_file(size // 14)[:size]
+        text = f"### FIX: app/models/big.rb\n```ruby\n{body}\n```\n"
+        chunks = [text[i:i + delta] for i in range(0, len(text), delta)]
+
+        def run():
+            stream = FixStream()
+            for chunk in chunks:
+                stream.feed(chunk)
+            stream.close()
+        return run, None
+    return build
+
+
+def analyze_case(size):
+    def build(scratch):
+        path = _write(scratch, f'log_{size}.txt', test_log(size))
+        return analyze_file, lambda: (path,)
+    return build
+
+
+def fingerprint_case(size):
+    def build(scratch):
+        path = _write(scratch, f'log_{size}.txt', test_log(size))
+        return (lambda: log_failures(read_lines(path))), None
+    return build
+
+
+def _size(size):
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+# (name, builder, only with --full)
+CASES = (
+    [(f"parse_fixes[{n} blocks]", parse_case(n), False) for n in (1, 50, 500)]
+    + [(f"universal.parse_fixes[{n} blocks]", universal_parse_case(n), False) for n in (1, 50, 500)]
+    + [(f"fix_stream[{_size(n)}]", stream_case(n), False) for n in (120 * KB, 480 * KB)]
+    + [(f"universal.apply_block_fix[{n // 1000}k lines]", block_fix_case(n), False) for n in (10_000, 100_000)]
+    + [(f"log_analyzer[{_size(n)}]", analyze_case(n), n > 10 * MB) for n in (10 * KB, MB, 10 * MB, 50 * MB)]
+    + [(f"log_failures[{_size(MB)}]", fingerprint_case(MB), False)]
+)
+
+
+def run_cases(selected, repeat, on_result):
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name, build in selected:
+            func, setup = build(scratch)
+            results[name] = measure(func, setup, repeat=repeat)
+            on_result(name, results[name])
+    return results
+
+
+def compare(results, baseline, threshold):
+    """[(name, time ratio, memory ratio, regressed)] for cases in both."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        time_ratio = current['min'] / base['min'] if base['min'] else 1.0
+        memory_ratio = current['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        slower = time_ratio > 1 + threshold and current['min'] - base['min'] > TIME_NOISE
+        bigger = (memory_ratio > 1 + threshold
+                  and current['peak_bytes'] - base['peak_bytes'] > MEMORY_NOISE)
+        rows.append((name, time_ratio, memory_ratio, slower or bigger))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the auto-fix hot paths.")
+    parser.add_argument('--filter', default='', help="only cases whose name contains TEXT")
+    parser.add_argument('--full', action='store_true', help="include the 50 MB log")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (default: %(default)s)")
+    parser.add_argument('--save', default=None, help="write the results to this JSON baseline")
+    parser.add_argument('--compare', default=None, help="compare against this JSON baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed growth as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)['cases']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: could not read baseline {args.compare}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    selected = [(name, build) for name, build, full in CASES
+                if args.filter in name and (args.full or not full)]
+    width = max(len(name) for name, _ in selected) if selected else 4
+    print(f"{'case':<{width}} {'median ms':>10} {'min ms':>9} {'stdev %':>8} {'peak KB':>10}")
+
+    def show(name, result):
+        stdev = 100 * result['stdev'] / result['mean'] if result['mean'] else 0.0
+        print(f"{name:<{width}} {result['median'] * 1000:>10.2f} {result['min'] * 1000:>9.2f} "
+              f"{stdev:>8.1f} {result['peak_bytes'] / 1024:>10.0f}", flush=True)
+
+    results = run_cases(selected, args.repeat, show)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'repeat': args.repeat, 'cases': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.save}")
+
+    if baseline is None:
+        return
+    rows = compare(results, baseline, args.threshold)
+    print(f"\n{'case':<{width}} {'time':>8} {'memory':>8}")
+    for name, time_ratio, memory_ratio, regressed in rows:
+        print(f"{name:<{width}} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x" + ('  REGRESSION' if regressed else ''))
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"Not in the baseline: {', '.join(missing)}")
+    regressions = [name for name, *_, regressed in rows if regressed]
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
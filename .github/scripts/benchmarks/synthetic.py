@@ -0,0 +1,115 @@
+"""
+Synthetic inputs for the benchmark suite, seeded so runs compare.
+
+- fix_response(): a model response with N FIX blocks in both header styles,
+  full-file and SEARCH/REPLACE bodies, with analysis text around them
+- test_log(): a Rails test log of a given size shaped like the
+  test_output*.txt samples: progress lines, minitest failures and errors
+  with backtraces, and gem LoadError traces with long `from` chains
+- source_file(): a Ruby source file of N lines with requires, classes and
+  methods, for the block applier's anchor search
+"""
+
+import random
+
+GEMS = ('activerecord-7.0.8.1', 'activesupport-7.0.8.1', 'railties-7.0.8.1',
+        'bootsnap-1.18.3', 'zeitwerk-2.6.13', 'bundler-2.4.14', 'sqlite3-2.9.0')
+MODELS = ('user', 'link', 'view', 'session', 'account', 'report')
+ERRORS = (
+    ("NoMethodError", "undefined method `{name}' for nil:NilClass"),
+    ("NameError", "uninitialized constant {Name}::Helper"),
+    ("ArgumentError", "wrong number of arguments (given 2, expected 1)"),
+    ("ActiveRecord::StatementInvalid", "SQLite3::SQLException: no such column: {name}s.token"),
+)
+
+
+def fix_response(blocks, body_lines=40, seed=0):
+    """Response text with `blocks` FIX blocks."""
+    rng = random.Random(seed)
+    parts = ["ANALYSIS: The sqlite3 upgrade changed the adapter API; the models and the\n"
+             "Gemfile need updating.\n"]
+    for i in range(blocks):
+        model = MODELS[i % len(MODELS)]
+        path = f"app/models/{model}_{i}.rb"
+        header = 'FIX_FILE:' if i % 2 else '### FIX:'
+        if i % 3 == 2:
+            body = (f"<<<<<<< SEARCH\n  def {model}_token\n    SecureRandom.hex(8)\n=======\n"
+                    f"  def {model}_token\n    SecureRandom.hex({rng.randint(8, 32)})\n>>>>>>> REPLACE")
+        else:
+            lines = [f"class {model.capitalize()}{i} < ApplicationRecord"]
+            lines += [f"  validates :field_{j}, presence: true" if j % 5 == 0
+                      else f"  def method_{j}; {rng.randint(0, 999)}; end" for j in range(body_lines)]
+            lines.append("end")
+            body = '\n'.join(lines)
+        parts.append(f"{header} {path}\n```ruby\n{body}\n```\n")
+        if i % 10 == 9:
+            parts.append("The next files follow the same pattern.\n")
+    parts.append("COMMIT_MESSAGE: Fix sqlite3 adapter compatibility\n")
+    return '\n'.join(parts)
+
+
+def _backtrace(rng, depth):
+    lines = []
+    for _ in range(depth):
+        gem = rng.choice(GEMS)
+        lines.append(f"\tfrom /opt/hostedtoolcache/Ruby/3.2.10/x64/lib/ruby/gems/3.2.0/gems/{gem}/lib/"
+                     f"{gem.split('-')[0]}/core_ext/kernel_require.rb:{rng.randint(10, 400)}:in `require'")
+    return lines
+
+
+def _log_unit(rng, n):
+    kind = rng.random()
+    model = rng.choice(MODELS)
+    if kind < 0.55:
+        return [f"{model.capitalize()}Test#test_{rng.randint(0, 99)} = 0.{rng.randint(0, 99):02d} s = ."]
+    if kind < 0.75:
+        line = rng.randint(5, 80)
+        return ["", "Failure:",
+                f"{model.capitalize()}Test#test_case_{n} [test/models/{model}_test.rb:{line}]:",
+                "Expected false to be truthy.", "",
+                f"bin/rails test test/models/{model}_test.rb:{line}", ""]
+    if kind < 0.95:
+        error, message = rng.choice(ERRORS)
+        message = message.format(name=model, Name=model.capitalize())
+        return (["", "Error:", f"{model.capitalize()}sControllerTest#test_should_get_index_{n}:",
+                 f"{error}: {message}",
+                 f"    app/controllers/{model}s_controller.rb:{rng.randint(3, 60)}:in `index'"]
+                + [f"    {line.strip()}" for line in _backtrace(rng, rng.randint(2, 8))]
+                + ["", f"bin/rails test test/controllers/{model}s_controller_test.rb:{rng.randint(5, 40)}", ""])
+    return ([f"LoadError: Error loading the 'sqlite3' Active Record adapter. Missing a gem it depends on? "
+             f"can't activate sqlite3 (~> 1.4), already activated sqlite3-2.9.0-x86_64-linux-gnu. (LoadError)",
+             f"/home/runner/work/app/app/models/{model}.rb:1:in `<main>'"]
+            + _backtrace(rng, rng.randint(10, 40)))
+
+
+def test_log(size, seed=0):
+    """Test log text of about `size` bytes."""
+    rng = random.Random(seed)
+    lines = ["Running via Spring preloader", f"Run options: --seed {rng.randint(1000, 99999)}", "",
+             "# Running:", ""]
+    total = sum(len(line) + 1 for line in lines)
+    n = 0
+    while total < size:
+        unit = _log_unit(rng, n)
+        lines.extend(unit)
+        total += sum(len(line) + 1 for line in unit)
+        n += 1
+    lines.append(f"Finished in {rng.randint(1, 300)}.{rng.randint(0, 999999):06d}s")
+    lines.append(f"{n} runs, {n * 2} assertions, {n // 5} failures, {n // 5} errors, 0 skips")
+    return '\n'.join(lines) + '\n'
+
+
+def source_file(lines, seed=0):
+    """Ruby source of `lines` lines: requires, then classes of short methods."""
+    rng = random.Random(seed)
+    out = ["require 'json'", "require 'set'", ""]
+    klass = 0
+    while len(out) < lines - 1:
+        out.append(f"class Generated{klass}")
+        for method in range(rng.randint(5, 40)):
+            out.append(f"  def method_{method}(value)")
+            out.append(f"    value * {rng.randint(1, 99)}")
+            out.append("  end")
+        out.append("end")
+        klass += 1
+    return '\n'.join(out[:lines]) + '\n'
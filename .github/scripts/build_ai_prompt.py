@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Build the AI prompt for a fix iteration within a token budget.
+
+Usage: build_ai_prompt.py <iteration> <test_output_file> [gem_diff_file] [--budget TOKENS] [--stats]
+
+Writes the prompt to stdout. Instead of a fixed `tail -300` of the test
+log, `head -200` of the gem diff and `head -80` of the file list, the
+sections share a token budget (PROMPT_TOKEN_BUDGET, default 6000):
+
+- the test log is compacted (backtrace.py): library frames folded,
+  duplicate backtraces and repeated errors dropped;
+- its segments are kept in priority order: the first error and its
+  `Caused by:` chain, then the other errors and the run summary, then
+  everything else, and printed in log order with omissions marked;
+- the gem diff keeps its changed lines before context lines;
+- from iteration 2 on, failures already recorded for an earlier test run
+  (failure_fingerprint.py) are cut to one line, as long as at least one
+  failure is new.
+
+Tokens are estimated at about four characters each.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from backtrace import ERROR, compact_segments, split_log
+from failure_fingerprint import FingerprintStore, default_store_path, fingerprint, mark_unchanged
+
+DEFAULT_BUDGET = 6000
+CHARS_PER_TOKEN = 4
+# Share of the budget each section gets when they all need more than it
+SECTION_WEIGHTS = {'log': 6, 'gems': 3, 'files': 1}
+SUMMARY_RE = re.compile(r"\d+ (?:runs|tests|examples), \d+ (?:assertions|failures)|^Tasks: |^Finished in ")
+
+FIX_FORMAT = """FIX_FILE: path/to/file.ext
+```language
+complete file content
+```
+
+or, to change only part of an existing file:
+FIX_FILE: path/to/file.ext
+```language
+<<<<<<< SEARCH
+existing lines to change
+=======
+replacement lines
+>>>>>>> REPLACE
+```
+
+COMMIT_MESSAGE: description"""
+
+FIRST_PROMPT = """You are an expert Ruby on Rails DevOps engineer. A Dependabot gem upgrade caused CI test failures.
+
+GEM CHANGES (Gemfile.lock diff vs main):
+{gems}
+
+TEST FAILURES:
+{log}
+
+PROJECT FILES (for context):
+{files}
+
+YOUR TASK:
+Analyze the test failures caused by the gem upgrade and provide code-level fixes.
+You may fix ANY files needed: app/, config/, lib/, Gemfile, test/, etc.
+
+Format your response EXACTLY as shown below (one block per file):
+
+FIX_FILE: path/to/file.ext
+```language
+complete file content here (not partial — write the full file)
+```
+
+To change only part of an existing file, send SEARCH/REPLACE edits instead
+of the full file. SEARCH must copy the existing lines exactly; use one
+SEARCH/REPLACE pair per change, in file order:
+
+FIX_FILE: path/to/file.ext
+```language
+<<<<<<< SEARCH
+existing lines to change
+=======
+replacement lines
+>>>>>>> REPLACE
+```
+
+COMMIT_MESSAGE: short description of the fix
+
+If no fixes are needed, respond with only: NO_FIX_NEEDED
+"""
+
+SECOND_PROMPT = """Fixes were applied in iteration 1 but tests are still failing. Provide additional fixes.
+
+REMAINING TEST FAILURES:
+{log}
+
+Format EXACTLY as:
+""" + FIX_FORMAT + """
+
+If no further fixes are needed, respond with only: NO_FIX_NEEDED
+"""
+
+FINAL_PROMPT = """This is the final fix attempt after 2 previous iterations. Tests are still failing.
+Carefully analyze what remains and provide all necessary fixes.
+
+REMAINING TEST FAILURES:
+{log}
+
+Format EXACTLY as:
+""" + FIX_FORMAT + """
+
+If no further fixes are needed, respond with only: NO_FIX_NEEDED
+"""
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _lines_tokens(lines):
+    # +1 for each line's newline
+    return sum(estimate_tokens(line) + 1 for line in lines) if lines else 0
+
+
+def allocate(budget, demands, weights):
+    """Split `budget` between sections by weight; a section never gets more
+    than it needs and what it leaves is shared among the others."""
+    grants = {name: 0 for name in demands}
+    open_sections = {name for name, need in demands.items() if need > 0}
+    left = budget
+    while open_sections and left > 0:
+        total_weight = sum(weights[name] for name in open_sections)
+        share = {name: left * weights[name] // total_weight for name in open_sections}
+        satisfied = {name for name in open_sections if demands[name] - grants[name] <= share[name]}
+        if not satisfied:
+            for name in open_sections:
+                grants[name] += share[name]
+            break
+        for name in satisfied:
+            left -= demands[name] - grants[name]
+            grants[name] = demands[name]
+        open_sections -= satisfied
+    return grants
+
+
+def _priority(index, segment, first_chain):
+    if index in first_chain:
+        return 0
+    if segment.kind == ERROR or any(SUMMARY_RE.search(line) for line in segment.lines):
+        return 1
+    return 2
+
+
+def fit_log(lines, budget, seen=None):
+    """Compacted log text that fits in `budget` tokens, errors first.
+
+    Errors whose fingerprint is in `seen` are cut to one line when there
+    is at least one other error.
+    """
+    segments = compact_segments(split_log(lines))
+    if seen and any(s.kind == ERROR and fingerprint(s) not in seen for s in segments):
+        mark_unchanged(segments, seen)
+
+    # The first error plus any "Caused by:" blocks that follow it
+    first_chain = set()
+    for index, segment in enumerate(segments):
+        if segment.kind != ERROR:
+            if first_chain and segment.lines and not any(line.strip() for line in segment.lines):
+                continue  # blank line inside the chain
+            if first_chain:
+                break
+            continue
+        if not first_chain or segment.cause:
+            first_chain.add(index)
+        else:
+            break
+
+    order = sorted(range(len(segments)), key=lambda i: (_priority(i, segments[i], first_chain), i))
+    chosen = {}
+    left = budget
+    for index in order:
+        rendered = segments[index].lines
+        cost = _lines_tokens(rendered)
+        if cost <= left:
+            chosen[index] = rendered
+            left -= cost
+        elif left > 20:
+            # Head of the segment: the headline and the frames nearest to it
+            kept = []
+            for line in rendered:
+                cost = estimate_tokens(line) + 1
+                if cost > left - 10:
+                    break
+                kept.append(line)
+                left -= cost
+            if kept:
+                kept.append(f"[... {len(rendered) - len(kept)} more lines of this error cut ...]")
+                chosen[index] = kept
+            left = 0
+
+    out = []
+    previous_end = 0
+    for index, segment in enumerate(segments):
+        if index not in chosen:
+            continue
+        _mark_omitted(out, lines, previous_end, segment.first)
+        out.extend(chosen[index])
+        previous_end = segment.end
+    _mark_omitted(out, lines, previous_end, len(lines))
+    return out
+
+
+def _mark_omitted(out, lines, start, end):
+    if any(line.strip() for line in lines[start:end]):
+        out.append(f"[... {end - start} log lines omitted ...]")
+
+
+def fit_diff(lines, budget):
+    """Diff lines within `budget`: headers and changes before context."""
+    if _lines_tokens(lines) <= budget:
+        return lines
+    important = [line for line in lines
+                 if line.startswith(('+', '-', '@@', 'diff ', '|', '#'))]
+    if _lines_tokens(important) <= budget:
+        return important + [f"[... {len(lines) - len(important)} context lines omitted ...]"]
+    return fit_head(important, budget)
+
+
+def fit_head(lines, budget):
+    """As many leading lines as fit, with a note of how many were cut."""
+    kept = []
+    left = budget - 10
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if cost > left:
+            break
+        kept.append(line)
+        left -= cost
+    if len(kept) < len(lines):
+        kept.append(f"[... {len(lines) - len(kept)} more lines ...]")
+    return kept
+
+
+def read_lines(path, fallback):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read().splitlines()
+    except OSError:
+        return [fallback]
+
+
+def gem_changes(gem_diff_file):
+    if gem_diff_file and os.path.isfile(gem_diff_file):
+        return read_lines(gem_diff_file, "No gem diff available")
+    try:
+        diff = subprocess.run(['git', 'diff', 'origin/main', '--', 'Gemfile.lock'],
+                              capture_output=True, text=True, timeout=60).stdout
+    except (OSError, subprocess.SubprocessError):
+        diff = ''
+    return diff.splitlines() or ["No gem diff available"]
+
+
+def project_files(roots=('app', 'config', 'lib')):
+    files = []
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            files.extend(os.path.join(directory, name) for name in sorted(filenames))
+    return files
+
+
+def build_prompt(iteration, test_output_file, gem_diff_file=None, budget=DEFAULT_BUDGET, store=None):
+    """Return (prompt text, {section: (tokens used, tokens available)}).
+
+    `store` is a FingerprintStore; the log of iteration N's prompt is the
+    test run recorded as N - 1.
+    """
+    log_lines = read_lines(test_output_file, "No test output found")
+    seen = store.seen_before(iteration - 1) if store is not None and iteration > 1 else None
+    if iteration == 1:
+        template = FIRST_PROMPT
+        sections = {'log': log_lines, 'gems': gem_changes(gem_diff_file), 'files': project_files()}
+    else:
+        template = SECOND_PROMPT if iteration == 2 else FINAL_PROMPT
+        sections = {'log': log_lines}
+
+    fixed = estimate_tokens(template.format(**{name: '' for name in sections}))
+    demands = {name: _lines_tokens(lines) for name, lines in sections.items()}
+    # The log is compacted before it is measured against its share
+    compact_log = fit_log(log_lines, float('inf'), seen)
+    demands['log'] = _lines_tokens(compact_log)
+    grants = allocate(max(budget - fixed, 0), demands,
+                      {name: SECTION_WEIGHTS[name] for name in sections})
+
+    rendered = {}
+    rendered['log'] = compact_log if demands['log'] <= grants['log'] else fit_log(log_lines, grants['log'], seen)
+    if 'gems' in sections:
+        rendered['gems'] = fit_diff(sections['gems'], grants['gems'])
+        rendered['files'] = fit_head(sections['files'], grants['files'])
+
+    prompt = template.format(**{name: '\n'.join(lines) for name, lines in rendered.items()})
+    stats = {name: (_lines_tokens(lines), grants[name]) for name, lines in rendered.items()}
+    return prompt, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the AI fix prompt within a token budget.")
+    parser.add_argument('iteration', type=int, nargs='?', default=1)
+    parser.add_argument('test_output_file', nargs='?', default='test_output.txt')
+    parser.add_argument('gem_diff_file', nargs='?', default='')
+    parser.add_argument('--budget', type=int,
+                        default=int(os.environ.get('PROMPT_TOKEN_BUDGET', DEFAULT_BUDGET)),
+                        help="approximate prompt size in tokens (default: %(default)s)")
+    parser.add_argument('--fingerprints', default=default_store_path(),
+                        help="failure fingerprint store ('' to disable; default: %(default)s)")
+    parser.add_argument('--stats', action='store_true',
+                        help="print per-section token use to stderr")
+    args = parser.parse_args()
+
+    prompt, stats = build_prompt(args.iteration, args.test_output_file,
+                                 args.gem_diff_file or None, args.budget,
+                                 FingerprintStore(args.fingerprints) if args.fingerprints else None)
+    sys.stdout.write(prompt)
+    if args.stats:
+        for name, (used, granted) in stats.items():
+            print(f"{name:<6} {used:>6} / {granted:>6} tokens", file=sys.stderr)
+        print(f"prompt ~{estimate_tokens(prompt)} tokens (budget {args.budget})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
-import json
-import urllib.request
 import os
 import sys
 
+from apply_fixes import StreamingApplier
+from hash_manifest import HashManifest, default_manifest_path
+from http_client import shared_client
+from model_metrics import CallMetrics
+from model_stream import CompletionStream
+from retry import call_with_retry
+from tracing import span
+
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 call_ai.py <prompt_file> <output_file>")
+    # --stream writes tokens to the output file as they arrive; --apply
+    # also applies FIX blocks as they complete (and implies --stream)
+    flags = {"--stream", "--apply"}
+    args = [a for a in sys.argv[1:] if a not in flags]
+    apply = "--apply" in sys.argv[1:]
+    stream = apply or "--stream" in sys.argv[1:]
+    if len(args) < 2:
+        print("Usage: python3 call_ai.py <prompt_file> <output_file> [--stream] [--apply]")
         sys.exit(1)
 
-    prompt_file = sys.argv[1]
-    output_file = sys.argv[2]
+    prompt_file = args[0]
+    output_file = args[1]
     
     token = os.environ.get("GH_TOKEN")
     if not token:
@@ -24,7 +36,7 @@ def main():
         print(f"Error reading prompt file: {e}")
         sys.exit(1)
 
-    url = "https://models.inference.ai.azure.com/chat/completions"
+    url = os.environ.get("MODEL_ENDPOINT", "https://models.inference.ai.azure.com/chat/completions")
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {token}"
@@ -37,28 +49,56 @@ def main():
         ],
         "temperature": 0.2
     }
+    if stream:
+        data["stream"] = True
+        data["stream_options"] = {"include_usage": True}
     
-    req = urllib.request.Request(
-        url, 
-        data=json.dumps(data).encode('utf-8'), 
-        headers=headers
-    )
-    
+    metrics = CallMetrics(data["model"], stream=stream)
     try:
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            output_text = result['choices'][0]['message']['content']
-            
+        client = shared_client()
+        with span("model.request", model=data["model"], stream=stream) as request:
+            response, stats = call_with_retry(
+                lambda: client.post_json(url, data, headers=headers, stream=stream))
+            request.set(status=response.status, attempts=stats.attempts)
+        metrics.response(response, stats)
+        print(f"Model call: {stats.summary()}")
+        if not response.ok:
+            metrics.fail(f"HTTP {response.status}")
+            metrics.record()
+            print(f"HTTP Error: {response.status} - {response.reason}")
+            print(f"Error details: {response.text()}")
+            sys.exit(1)
+
+        if stream:
+            applier = StreamingApplier(HashManifest(default_manifest_path())) if apply else None
+            with open(output_file, 'w', encoding='utf-8') as f, span("model.stream"):
+                try:
+                    completion = CompletionStream(response.iter_lines())
+                    for delta in completion:
+                        metrics.first_token()
+                        f.write(delta)
+                        f.flush()
+                        if applier is not None:
+                            applier.feed(delta)
+                finally:
+                    if applier is not None:
+                        applier.close()
+            metrics.finish(completion.usage, completion.finish_reason, completion.model)
+        else:
+            with span("model.read"):
+                result = response.json()
+            choice = result['choices'][0]
+            metrics.finish(result.get('usage'), choice.get('finish_reason'), result.get('model'))
+            output_text = choice['message']['content']
+
             with open(output_file, 'w', encoding='utf-8') as f:
                 f.write(output_text)
-                
-            print(f"Successfully called AI and saved response to {output_file}")
-    except urllib.error.HTTPError as e:
-        print(f"HTTP Error: {e.code} - {e.reason}")
-        error_body = e.read().decode('utf-8')
-        print(f"Error details: {error_body}")
-        sys.exit(1)
+            
+        metrics.record()
+        print(f"Successfully called AI and saved response to {output_file}")
     except Exception as e:
+        metrics.fail(f"{type(e).__name__}: {e}")
+        metrics.record()
         print(f"Unexpected error: {e}")
         sys.exit(1)
 
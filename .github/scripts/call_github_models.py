@@ -2,34 +2,53 @@
 """
 GitHub Models API client for calling AI models
 Authenticates using GITHUB_TOKEN (from GitHub Actions) and calls GitHub Models
+
+With --stream the response is written to stdout token by token; --apply
+also applies each FIX block as soon as it is complete (progress on stderr).
+The retry and response cache summaries go to the job's step summary in
+Actions, and to stderr otherwise unless stderr is redirected into the
+same file as the response (`> fixes.txt 2>&1`); --verbose always prints
+them on stderr.
+`--forget < prompt.txt` drops the cached response to a prompt whose fixes
+did not make the tests pass, so the next run asks the model again.
+Token usage and timings of every call are appended to the metrics file of
+model_metrics.py.
 """
 
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
+import http.client
 
-def call_github_models(prompt_text, model="openai/gpt-4o"):
-    """
-    Call GitHub Models API using the correct endpoint and authentication.
-
-    Args:
-        prompt_text: The prompt to send to the model
-        model: Default model name (can be overridden via MODEL_NAME env)
+from apply_fixes import StreamingApplier
+from github_outputs import write_step_summary
+from hash_manifest import HashManifest, default_manifest_path
+from http_client import shared_client
+from model_metrics import CallMetrics
+from model_stream import CompletionStream
+from response_cache import ResponseCache, cache_key
+from retry import call_with_retry
+from tracing import span
 
-    Returns:
-        The model's response text, or an error message if failed.
-    """
+def _stderr_is_stdout():
+    """True when stderr is redirected into the same file as stdout."""
+    try:
+        if sys.stdout.isatty():
+            return False
+        out, err = os.fstat(sys.stdout.fileno()), os.fstat(sys.stderr.fileno())
+    except (OSError, ValueError):
+        return False
+    return (out.st_dev, out.st_ino) == (err.st_dev, err.st_ino)
 
-    github_token = os.environ.get("GITHUB_TOKEN")
-    if not github_token:
-        return "Error: GITHUB_TOKEN environment variable not set"
+def report(text, verbose=False):
+    """Show a summary line where it is seen but kept out of the response."""
+    if verbose or not (write_step_summary(text) or _stderr_is_stdout()):
+        print(text, file=sys.stderr)
 
-    # Allow override from env (so your workflow can set MODEL_NAME)
-    env_model = os.environ.get("MODEL_NAME")
-    if env_model:
-        model = env_model
+def request_payload(prompt_text, model=None):
+    """Chat completions request for a prompt, for `model` or else MODEL_NAME."""
+    # The workflow picks the model with MODEL_NAME; an explicit one wins
+    model = model or os.environ.get("MODEL_NAME") or "openai/gpt-4o"
 
     # Optional: normalize a few short aliases
     model_map = {
@@ -40,9 +59,6 @@ def call_github_models(prompt_text, model="openai/gpt-4o"):
     }
     model = model_map.get(model, model)
 
-    # GitHub Models API endpoint (NOT the Azure endpoint)
-    api_endpoint = "https://models.github.ai/inference/chat/completions"
-
     payload = {
         "model": model,
         "messages": [
@@ -59,6 +75,43 @@ def call_github_models(prompt_text, model="openai/gpt-4o"):
         "top_p": 1,
         "max_tokens": 4096,
     }
+    return payload
+
+def forget_response(prompt_text, model=None, cache=None):
+    """Drop the cached response to a prompt; True if there was one."""
+    cache = cache or ResponseCache()
+    return cache.discard(cache_key(request_payload(prompt_text, model)))
+
+def call_github_models(prompt_text, model=None, cache=None, on_delta=None, verbose=False):
+    """
+    Call GitHub Models API using the correct endpoint and authentication.
+
+    Args:
+        prompt_text: The prompt to send to the model
+        model: Model name; defaults to MODEL_NAME, else openai/gpt-4o
+        cache: Optional ResponseCache; successful responses are stored in it
+        on_delta: Optional callback; when given the response is streamed and
+            each piece of text is passed to it as it arrives
+        verbose: Print the retry summary of the call on stderr (see report)
+
+    Returns:
+        The model's response text, or an error message if failed.
+    """
+
+    github_token = os.environ.get("GITHUB_TOKEN")
+    if not github_token:
+        return "Error: GITHUB_TOKEN environment variable not set"
+
+    payload = request_payload(prompt_text, model)
+    model = payload["model"]
+    # GitHub Models API endpoint (NOT the Azure endpoint); MODEL_ENDPOINT
+    # points the script at a local stub for benchmarks
+    api_endpoint = os.environ.get("MODEL_ENDPOINT", "https://models.github.ai/inference/chat/completions")
+
+    if on_delta is not None:
+        payload["stream"] = True
+        # Ask for the usage block in the last chunk
+        payload["stream_options"] = {"include_usage": True}
 
     headers = {
         "Authorization": f"Bearer {github_token}",
@@ -68,48 +121,102 @@ def call_github_models(prompt_text, model="openai/gpt-4o"):
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
+    key = cache_key(payload)
+    if cache is not None:
+        with span("model.cache_lookup") as lookup:
+            cached = cache.get(key)
+            lookup.set(hit=cached is not None)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return cached
+
+    client = shared_client()
+    stream = on_delta is not None
+    metrics = CallMetrics(model, stream=stream)
     try:
-        request = urllib.request.Request(
-            api_endpoint,
-            data=json.dumps(payload).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
+        with span("model.request", model=model, stream=stream) as request:
+            response, stats = call_with_retry(
+                lambda: client.post_json(api_endpoint, payload, headers=headers, stream=stream))
+            request.set(status=response.status, attempts=stats.attempts)
+        metrics.response(response, stats)
+        # stdout carries the model's answer, so retry details go elsewhere
+        if stats.attempts > 1:
+            report(f"Model call: {stats.summary()}", verbose)
+
+        if not response.ok:
+            error_body = response.text()
+            try:
+                error_json = json.loads(error_body)
+                error_msg = error_json.get("error", {}).get("message", str(error_json))
+            except Exception:
+                error_msg = error_body
+            metrics.fail(f"HTTP {response.status}")
+            return f"Error: HTTP {response.status} - {error_msg} (after {stats.summary()})"
+
+        if stream:
+            with span("model.stream") as streaming:
+                completion = CompletionStream(response.iter_lines())
+                for delta in completion:
+                    metrics.first_token()
+                    on_delta(delta)
+                message = completion.text
+                streaming.set(chars=len(message), finish_reason=completion.finish_reason)
+            metrics.finish(completion.usage, completion.finish_reason, completion.model)
+            if cache is not None and completion.finish_reason == "stop":
+                cache.put(key, message, model)
+            return message
 
-        with urllib.request.urlopen(request, timeout=30) as response:
-            response_data = json.loads(response.read().decode("utf-8"))
+        with span("model.read"):
+            response_data = response.json()
 
         if "choices" in response_data and response_data["choices"]:
-            message = response_data["choices"][0]["message"]["content"]
+            choice = response_data["choices"][0]
+            metrics.finish(response_data.get("usage"), choice.get("finish_reason"),
+                           response_data.get("model"))
+            message = choice["message"]["content"]
+            if cache is not None:
+                cache.put(key, message, model)
             return message
         else:
+            metrics.fail("unexpected response format")
             return f"Error: Unexpected API response format: {response_data}"
 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8", errors="replace")
-        try:
-            error_json = json.loads(error_body)
-            error_msg = error_json.get("error", {}).get("message", str(error_json))
-        except Exception:
-            error_msg = error_body
-        return f"Error: HTTP {e.code} - {error_msg}"
-    except urllib.error.URLError as e:
-        return f"Error: Network error - {e.reason}"
+    except (OSError, http.client.HTTPException) as e:
+        stats = getattr(e, "retry_stats", None)
+        metrics.fail(f"{type(e).__name__}: {e}", stats)
+        after = f" (after {stats.summary()})" if stats else ""
+        return f"Error: Network error - {e}{after}"
     except json.JSONDecodeError as e:
+        metrics.fail(f"JSONDecodeError: {e}")
         return f"Error: Invalid JSON response - {e}"
     except Exception as e:
+        metrics.fail(f"{type(e).__name__}: {e}")
         return f"Error: {type(e).__name__}: {e}"
+    finally:
+        metrics.record()
 
 def main():
     """Read prompt from stdin and call GitHub Models API"""
 
+    flags = {"--no-cache", "--stream", "--apply", "--verbose", "--forget"}
+    args = [a for a in sys.argv[1:] if a not in flags]
+    use_cache = "--no-cache" not in sys.argv[1:]
+    # The workflow captures stderr with the response (see report)
+    verbose = "--verbose" in sys.argv[1:]
+    # --apply writes FIX blocks as they complete and implies --stream
+    apply = "--apply" in sys.argv[1:]
+    stream = apply or "--stream" in sys.argv[1:]
+
     if not sys.stdin.isatty():
         prompt_text = sys.stdin.read()
     else:
-        if len(sys.argv) > 1:
-            prompt_text = " ".join(sys.argv[1:])
+        if args:
+            prompt_text = " ".join(args)
         else:
-            print("Usage: python call_github_models.py < prompt.txt", file=sys.stderr)
+            print("Usage: python call_github_models.py [--no-cache] [--stream] [--apply] [--verbose]"
+                  " < prompt.txt", file=sys.stderr)
+            print("Or: python call_github_models.py --forget < prompt.txt", file=sys.stderr)
             print("Or: echo 'prompt' | python call_github_models.py", file=sys.stderr)
             sys.exit(1)
 
@@ -117,8 +224,38 @@ def main():
         print("Error: Empty prompt", file=sys.stderr)
         sys.exit(1)
 
-    response = call_github_models(prompt_text)
-    print(response)
+    if "--forget" in sys.argv[1:]:
+        forgotten = forget_response(prompt_text)
+        print("Forgot the cached response" if forgotten else "No cached response to forget")
+        sys.exit(0)
+
+    cache = ResponseCache() if use_cache else None
+    on_delta = applier = None
+    streamed = []
+    if stream:
+        # Progress of the applier goes to stderr; stdout is the response
+        applier = StreamingApplier(HashManifest(default_manifest_path()),
+                                   out=sys.stderr) if apply else None
+
+        def on_delta(text):
+            streamed.append(text)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            if applier is not None:
+                applier.feed(text)
+
+    with span("model.call", prompt_chars=len(prompt_text), stream=stream):
+        response = call_github_models(prompt_text, cache=cache, on_delta=on_delta, verbose=verbose)
+    if streamed:
+        print()
+        if response.strip().startswith("Error:"):
+            print(response)
+    else:
+        print(response)
+    if applier is not None:
+        applier.close()
+    if cache is not None:
+        report(f"Response cache: {cache.summary()}", verbose)
 
     if response.strip().startswith("Error:"):
         sys.exit(1)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Fingerprint test failures so iterations can be compared.
+
+Usage:
+  failure_fingerprint.py record <iteration> <test_output_file>
+  failure_fingerprint.py changes <iteration> <test_output_file>
+
+Each failure of a log (an error block with its causes and repeated
+reports, see backtrace.py) is normalised — project and gem install paths,
+line numbers, versions and object addresses are replaced by placeholders —
+and hashed together with its first application frames. The same failure
+therefore gets the same fingerprint in every iteration and every run.
+
+`record` stores the fingerprints of an iteration (0 is the initial test
+run) and compares them with the previous one. When nothing was fixed and
+nothing new broke it reports no progress (`no_progress=true` in
+GITHUB_OUTPUT), so the workflow can stop instead of paying for another
+model call with the same input. `changes` prints the failures that were
+not seen in earlier iterations in full, and the rest as one line each.
+
+The store lives under .git/ by default, next to the hash manifest.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from backtrace import ERROR, FRAME_RE, compact_segments, is_library_frame, split_log
+from github_outputs import write_github_outputs
+
+DEFAULT_STORE = os.path.join('.git', 'auto_fix_fingerprints.json')
+# Application frames that take part in a fingerprint
+FINGERPRINT_FRAMES = 3
+
+_NORMALIZERS = [
+    # Installed gems and Ruby's stdlib: keep only the gem name
+    (re.compile(r"\S*/gems/([A-Za-z0-9_.-]+?)-\d[\w.]*(?:-[\w-]+)?/"), r"gems/\1/"),
+    (re.compile(r"\S*/lib/ruby/\d+\.\d+\.\d+/"), "ruby/"),
+    # Checkout location in front of the project's own directories
+    (re.compile(r"(?<![\w.])/(?:[^\s/:'\"`]+/)*?(?=(?:app|bin|config|db|lib|spec|test)/)"), ""),
+    (re.compile(r"(\.\w+):\d+"), r"\1:N"),
+    (re.compile(r"\b\d+(?:\.\d+)+\b"), "V"),
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r"^\s*\d+\) "), ""),
+]
+
+
+def default_store_path():
+    return DEFAULT_STORE if os.path.isdir('.git') else None
+
+
+def normalize(line):
+    for pattern, replacement in _NORMALIZERS:
+        line = pattern.sub(replacement, line)
+    return line.strip()
+
+
+def fingerprint(segment):
+    """Stable hash of the message and first app frames of a segment's failure."""
+    segment = segment.parent or segment
+    h = hashlib.blake2b(digest_size=8)
+    for line in segment.headline:
+        h.update(normalize(line).encode('utf-8', 'replace'))
+        h.update(b'\n')
+    frames = 0
+    for line in segment.frames:
+        match = FRAME_RE.match(line)
+        if match and not is_library_frame(match.group('path')):
+            h.update(normalize(line).encode('utf-8', 'replace'))
+            h.update(b'\n')
+            frames += 1
+            if frames == FINGERPRINT_FRAMES:
+                break
+    return h.hexdigest()
+
+
+def summary_line(segment):
+    """One-line description of an error segment."""
+    for line in segment.headline:
+        text = line.strip()
+        if text and text not in ('rails aborted!', 'Caused by:', 'Error:') and not text.endswith('Failure:'):
+            return text[:200]
+    return segment.headline[0].strip()[:200] if segment.headline else ''
+
+
+def log_failures(lines):
+    """{fingerprint: {'summary', 'count'}} for the failures of a log."""
+    failures = {}
+    for segment in split_log(lines):
+        if segment.kind != ERROR or segment.parent is not None:
+            continue
+        key = fingerprint(segment)
+        entry = failures.get(key)
+        if entry is None:
+            failures[key] = {'summary': summary_line(segment), 'count': 1}
+        else:
+            entry['count'] += 1
+    return failures
+
+
+def mark_unchanged(segments, seen):
+    """Shorten compacted error segments whose fingerprint is in `seen`.
+
+    Returns how many were shortened; the other segments of those failures
+    are emptied.
+    """
+    shortened = 0
+    for segment in segments:
+        if segment.kind != ERROR or fingerprint(segment) not in seen:
+            continue
+        if segment.parent is not None:
+            segment.lines = []
+            continue
+        segment.lines = [f"(unchanged from the previous iteration) {summary_line(segment)}"]
+        shortened += 1
+    return shortened
+
+
+class FingerprintStore:
+    """Fingerprints recorded per iteration, persisted as JSON."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.iterations = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.iterations = json.load(f).get('iterations', {})
+            except (OSError, ValueError):
+                self.iterations = {}
+
+    def record(self, iteration, failures):
+        self.iterations[str(iteration)] = failures
+
+    def previous(self, iteration):
+        """Failures of the latest iteration before `iteration`, or None."""
+        earlier = [int(k) for k in self.iterations if int(k) < int(iteration)]
+        return self.iterations[str(max(earlier))] if earlier else None
+
+    def seen_before(self, iteration):
+        seen = set()
+        for key, failures in self.iterations.items():
+            if int(key) < int(iteration):
+                seen.update(failures)
+        return seen
+
+    def save(self):
+        if not self.path:
+            return
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({'iterations': self.iterations}, f, indent=1, sort_keys=True)
+        os.replace(temp, self.path)
+
+
+def compare(previous, current):
+    """(new, resolved, unchanged) fingerprint sets between two iterations."""
+    previous = set(previous or ())
+    current = set(current)
+    return current - previous, previous - current, current & previous
+
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read().splitlines()
+
+
+def record_command(args, store):
+    failures = log_failures(read_lines(args.test_output_file))
+    previous = store.previous(args.iteration)
+    store.record(args.iteration, failures)
+    store.save()
+
+    new, resolved, unchanged = compare(previous, failures)
+    no_progress = previous is not None and bool(failures) and not new and not resolved
+    print(f"Iteration {args.iteration}: {len(failures)} distinct failure(s)"
+          + (f" ({len(new)} new, {len(resolved)} resolved, {len(unchanged)} unchanged)"
+             if previous is not None else ""))
+    if previous is not None:
+        for key in sorted(new):
+            print(f"  new: {failures[key]['summary']}")
+    if no_progress:
+        print("No progress: the same failures as the previous iteration.")
+
+    write_github_outputs(failures=len(failures), new_failures=len(new),
+                         resolved_failures=len(resolved),
+                         no_progress='true' if no_progress else 'false')
+
+
+def changes_command(args, store):
+    lines = read_lines(args.test_output_file)
+    segments = compact_segments(split_log(lines))
+    seen = store.seen_before(args.iteration)
+    fresh = []
+    known = []
+    for segment in segments:
+        if segment.kind != ERROR:
+            continue
+        if fingerprint(segment) not in seen:
+            fresh.append(segment)
+        elif segment.parent is None:
+            known.append(segment)
+
+    if fresh:
+        print("New or changed failures:")
+        for segment in fresh:
+            print('\n'.join(segment.lines))
+            print()
+    if known:
+        print("Still failing from earlier iterations (details were sent before):")
+        for segment in known:
+            print(f"- {summary_line(segment)}")
+    if not fresh and not known:
+        # Nothing recognisable as an error: fall back to the end of the log
+        print('\n'.join(lines[-150:]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint test failures across iterations.")
+    parser.add_argument('--store', default=default_store_path(),
+                        help="fingerprint store ('' to disable; default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('record', "store an iteration's failures and report progress"),
+                            ('changes', "print failures not seen in earlier iterations")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('iteration', type=int)
+        command.add_argument('test_output_file')
+    args = parser.parse_args()
+
+    store = FingerprintStore(args.store or None)
+    try:
+        if args.command == 'record':
+            record_command(args, store)
+        else:
+            changes_command(args, store)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
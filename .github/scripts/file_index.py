@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Structural index of a source file, used to place inserted code blocks.
+
+Instead of rescanning every line for every fix, each file is scanned once
+for import and definition lines (keywords come from
+language_config.LANGUAGE_CONFIG for the file's language) and the line
+numbers are kept. Finding where a block goes is then a lookup, and the
+index is shifted in place when a block is inserted, so applying many
+fixes to one large file stays linear.
+"""
+
+import re
+from bisect import bisect_left
+
+from language_config import REGISTRY, get_anchor_keywords
+
+_KEYWORD_PATTERNS = {}
+
+
+def language_for_path(path):
+    """Language of a file according to LANGUAGE_CONFIG extensions, or None."""
+    return REGISTRY.language_for_path(path)
+
+
+def keyword_patterns(language):
+    """Compiled (import, definition) keyword alternations for a language."""
+    patterns = _KEYWORD_PATTERNS.get(language)
+    if patterns is None:
+        patterns = tuple(
+            re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+            for keywords in get_anchor_keywords(language)
+        )
+        _KEYWORD_PATTERNS[language] = patterns
+    return patterns
+
+
+class FileIndex:
+    """Line numbers of the import and definition lines of one file."""
+
+    __slots__ = ('content', 'line_count', 'import_lines', 'definition_lines',
+                 'import_re', 'definition_re')
+
+    def __init__(self, content, language=None):
+        self.content = content
+        self.import_re, self.definition_re = keyword_patterns(language)
+        self.import_lines = []
+        self.definition_lines = []
+        self.line_count = self._scan(content.split('\n'), 0)
+
+    def _scan(self, lines, first):
+        imports = []
+        definitions = []
+        import_search = self.import_re.search
+        definition_search = self.definition_re.search
+        for i, line in enumerate(lines, first):
+            if import_search(line):
+                imports.append(i)
+            if definition_search(line):
+                definitions.append(i)
+        self._merge(self.import_lines, imports)
+        self._merge(self.definition_lines, definitions)
+        return len(lines)
+
+    @staticmethod
+    def _merge(offsets, new):
+        if new:
+            at = bisect_left(offsets, new[0])
+            offsets[at:at] = new
+
+    @property
+    def import_region(self):
+        """(first, last) import line, or None when the file has none."""
+        if not self.import_lines:
+            return None
+        return self.import_lines[0], self.import_lines[-1]
+
+    def is_import(self, code):
+        return self.import_re.search(code) is not None
+
+    def insertion_point(self, code):
+        """Line before which `code` should be inserted.
+
+        Imports go right after the first import line, anything else before
+        the first definition; both fall back to the end of the file.
+        """
+        if self.is_import(code):
+            return self.import_lines[0] + 1 if self.import_lines else self.line_count
+        return self.definition_lines[0] if self.definition_lines else self.line_count
+
+    def insert(self, at, text, content):
+        """Record that `text` was inserted as new lines before line `at`.
+
+        `content` is the full file content after the insertion.
+        """
+        new_lines = text.split('\n')
+        added = len(new_lines)
+        for offsets in (self.import_lines, self.definition_lines):
+            for i in range(bisect_left(offsets, at), len(offsets)):
+                offsets[i] += added
+        self._scan(new_lines, at)
+        self.line_count += added
+        self.content = content
+
+
+class FileIndexCache:
+    """FileIndex per path, reused for as long as the file content matches."""
+
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, path, content, language=None):
+        """Index of `path`; `language` overrides the one its extension implies."""
+        index = self.indexes.get(path)
+        if index is None or index.content != content:
+            index = FileIndex(content, language or language_for_path(path))
+            self.indexes[path] = index
+        return index
+
+    def discard(self, path):
+        self.indexes.pop(path, None)
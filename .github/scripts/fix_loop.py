@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Run the whole auto-fix loop in one process.
+
+Usage:
+  fix_loop.py [--iterations N] [--initial-log test_output.txt] [--gem-diff FILE]
+              [--gems gem_summary.txt] [--model NAME ...] [--test-command CMD]
+              [--prepare-command CMD] [--budget N] [--stream] [--no-cache]
+              [--no-memo] [--push]
+
+Each iteration builds the prompt from the previous test log, asks the
+model, applies the FIX blocks, syntax-checks and commits the files it
+wrote, and runs the tests: the failing and affected ones first, the full
+suite once they pass, and only the full suite in the last iteration. Files
+that do not parse are reverted instead of committed, and the tests are
+skipped: the next prompt gets the syntax errors instead of a test log.
+When only the selected tests ran, the failures of the last full run that
+were not re-run are appended to the log, so the next prompt still sees
+them. The loop stops when the tests pass, the model gives nothing usable,
+nothing changes, or a full run fails the same way as the one before it.
+
+Before asking the model, an iteration looks up the known-fix store
+(fix_memo.py) by the failures of its log and the gem bump in --gems, and
+replays a hit instead. A fix is stored there when the tests pass with it,
+and a replayed fix is evicted when they still fail.
+
+Doing this in one interpreter instead of a python3 process per step keeps
+the model connection open between iterations (http_client's shared
+client), and keeps the failure fingerprints, the hash manifest and the
+test source index in memory instead of reloading them each time; they are
+still saved under .git/ for the other scripts. Tests and bundle install
+run as subprocesses.
+
+The per-iteration files the workflow reports on are still written:
+prompt_N.txt, fixes_iteration_N.txt, changed_files_N.txt, test_output_N.txt
+and, when a file does not parse, syntax_errors_N.txt. Step outputs are
+fixes_generated_N, fixes_applied_N and test_exit_code_N per iteration, and
+iterations, test_exit_code and stop_reason for the whole loop. Exits 0
+when the tests pass.
+
+The first prompt also gets upgrade_detection.txt, the head of
+changelogs.txt, ai_context.txt and the app/ files named in the log, when
+they exist. --model may be given several times to fall back to other
+models; without it the model is MODEL_NAME, or else openai/gpt-4o-mini.
+"""
+
+import argparse
+import contextlib
+import os
+import re
+import shlex
+import sqlite3
+import subprocess
+import sys
+import time
+
+from affected_tests import DEFAULT_INDEX, TEST_FILE_RE, SourceIndex, failed_tests, select_tests
+from apply_fixes import apply_response
+from atomic_writer import WriteError
+from backtrace import ERROR, split_log
+from build_ai_prompt import DEFAULT_BUDGET, build_prompt
+from call_github_models import call_github_models, forget_response
+from failure_fingerprint import FingerprintStore, compare, default_store_path, fingerprint, log_failures
+from fix_memo import FixMemo, memo_keys, parse_blocks, render_blocks
+from fix_parsing import FixScanner
+from github_outputs import write_github_outputs
+from hash_manifest import HashManifest, default_manifest_path
+from response_cache import ResponseCache
+from syntax_check import SyntaxGate, can_check
+from tracing import span
+
+DEFAULT_MODELS = ('openai/gpt-4o-mini',)
+SOURCE_FILE_RE = re.compile(r'in `(app/[^:`]+):')
+CONTEXT_FILES = (
+    ('upgrade_detection.txt', 'Dependency Upgrades', None),
+    ('changelogs.txt', 'Upgrade Guides & Breaking Changes', 200),
+    ('ai_context.txt', 'Additional Context', None),
+)
+
+
+def read_text(path, max_lines=None):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            if max_lines is None:
+                return f.read()
+            return ''.join(line for _, line in zip(range(max_lines), f))
+    except OSError:
+        return None
+
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def first_prompt_context(log_lines):
+    """Extra sections of the first prompt: upgrade notes, context and failing app/ files."""
+    parts = []
+    for path, title, max_lines in CONTEXT_FILES:
+        text = read_text(path, max_lines)
+        if text:
+            parts.append(f"\n## {title}:\n{text.rstrip()}\n")
+    sources = sorted({match.group(1) for line in log_lines for match in SOURCE_FILE_RE.finditer(line)})
+    sources = [path for path in sources if os.path.isfile(path)][:5]
+    if sources:
+        parts.append("\n## Source Files (relevant to failures):\n")
+        for path in sources:
+            parts.append(f"### File: {path}\n```ruby\n{(read_text(path) or '').rstrip()}\n```\n")
+    return ''.join(parts)
+
+
+def carried_failures(full_log, current, tests):
+    """Error blocks of `full_log` for failures not re-run since.
+
+    A failure is left out when it is among `current` (it failed again) or
+    its lines name one of the re-run `tests` (it was fixed).
+    """
+    lines = (read_text(full_log) or '').splitlines()
+    failures = {}
+    for segment in split_log(lines):
+        if segment.kind == ERROR:
+            failures.setdefault(fingerprint(segment), []).extend(lines[segment.first:segment.end])
+    tests = set(tests)
+    carried = []
+    for key, block in failures.items():
+        named = {match.group(1) for line in block for word in line.split()
+                 for match in TEST_FILE_RE.finditer(word)}
+        if key not in current and not named & tests:
+            carried.extend(block + [''])
+    return carried
+
+
+def run_shell(command, out):
+    """Exit status of a shell command, its output appended to `out`."""
+    out.flush()
+    return subprocess.call(command, shell=True, stdout=out, stderr=subprocess.STDOUT)
+
+
+class FixLoop:
+    """The fix iterations, with their state kept in memory between them."""
+
+    def __init__(self, iterations=3, models=DEFAULT_MODELS, test_command='bin/rails test',
+                 prepare_command='bin/rails test:prepare', budget=DEFAULT_BUDGET, gem_diff_file=None,
+                 stream=False, cache=None, push=False, memo=None, gems_file='gem_summary.txt'):
+        self.iterations = iterations
+        self.models = models
+        self.test_command = test_command
+        self.prepare_command = prepare_command
+        self.budget = budget
+        self.gem_diff_file = gem_diff_file
+        self.stream = stream
+        self.cache = cache
+        self.push = push
+        self.memo = memo
+        self.gems_file = gems_file
+        self.store = FingerprintStore(default_store_path())
+        self.manifest = HashManifest(default_manifest_path())
+        self.index = None
+        self.full_log = None  # log of the last full test run
+        self.results = []
+        self.stop_reason = None
+
+    @contextlib.contextmanager
+    def stage(self, result, name):
+        """Trace a stage of an iteration and add its seconds to result['times']."""
+        start = time.perf_counter()
+        try:
+            with span(f'loop.{name}', iteration=result['iteration']):
+                yield
+        finally:
+            result['times'][name] = result['times'].get(name, 0.0) + time.perf_counter() - start
+
+    def run(self, initial_log='test_output.txt'):
+        """Iterate until a stop condition; returns the last test exit status (None if no tests ran)."""
+        log = self.full_log = initial_log
+        self.store.record(0, log_failures((read_text(log) or '').splitlines()))
+        status = None
+        for iteration in range(1, self.iterations + 1):
+            result = {'iteration': iteration, 'times': {}, 'model': None, 'known_fix': False, 'written': 0,
+                      'changed': 0, 'broken': 0, 'exit_code': None}
+            self.results.append(result)
+            print(f"=== Iteration {iteration}/{self.iterations} ===", flush=True)
+            log, tested = self.iterate(result, log)
+            if tested is not None:
+                status = tested
+            if self.stop_reason:
+                break
+        else:
+            self.stop_reason = 'iterations exhausted'
+        self.store.save()
+        if self.index is not None:
+            self.index.save()
+        return status
+
+    def iterate(self, result, log):
+        """One iteration; returns (latest test log, exit status or None when no tests ran)."""
+        iteration = result['iteration']
+        final = iteration == self.iterations
+        with self.stage(result, 'prompt'):
+            prompt = self.prompt(iteration, log)
+
+        keys = memo_keys(log, self.gems_file) if self.memo is not None else None
+        with self.stage(result, 'model'):
+            response = self.recall(result, keys) or self.ask(result, prompt)
+        write_github_outputs(**{f'fixes_generated_{iteration}': 'true' if response else 'false'})
+        if not response:
+            self.stop_reason = 'no response from the model'
+            return log, None
+
+        with self.stage(result, 'apply'):
+            changed = self.apply(result, response)
+        write_github_outputs(**{f'fixes_applied_{iteration}': 'true' if changed else 'false'})
+        if not changed:
+            self.stop_reason = 'no changes to apply'
+            return log, None
+
+        with self.stage(result, 'validate'):
+            broken = self.validate(result, changed)
+        with self.stage(result, 'commit'):
+            if broken:
+                print("Reverting the files with syntax errors")
+                self.revert(broken)
+                changed = [path for path in changed if path not in broken]
+            if changed:
+                self.commit(result['commit_message'], changed)
+
+        if broken:
+            # Like the workflow: the syntax errors are the next prompt's log
+            new_log, status = f'syntax_errors_{iteration}.txt', 1
+        else:
+            with self.stage(result, 'tests'):
+                new_log, status, full = self.run_tests(iteration, changed, log, final)
+        result['exit_code'] = status
+        write_github_outputs(**{f'test_exit_code_{iteration}': status})
+        if status == 0:
+            self.stop_reason = 'tests pass'
+            if keys:
+                blocks, message = parse_blocks(response)
+                if blocks:
+                    self.memo.store(*keys, blocks, message)
+                    print(f"Stored known fix: {len(blocks)} file(s) for {len(keys[2])} failure(s)")
+            return new_log, status
+        # Don't replay a fix or a response that did not work
+        if result['known_fix']:
+            if self.memo.evict(*keys[:2]):
+                print("Evicted known fix: the tests still failed with it")
+        elif self.cache is not None:
+            forget_response(prompt, result['model'], self.cache)
+        if not broken and full:
+            self.full_log = new_log
+            if self.no_progress(iteration, new_log):
+                self.stop_reason = 'no progress: the same failures as the previous iteration'
+        return new_log, status
+
+    def prompt(self, iteration, log):
+        prompt, _ = build_prompt(iteration, log, self.gem_diff_file, self.budget, self.store)
+        if iteration == 1:
+            prompt += first_prompt_context((read_text(log) or '').splitlines())
+        write_text(f'prompt_{iteration}.txt', prompt)
+        return prompt
+
+    def recall(self, result, keys):
+        """The known fix for the log's failures as a response, or None."""
+        found = self.memo.lookup(*keys[:2]) if keys else None
+        if found is None:
+            return None
+        blocks, message = found
+        print(f"Known fix: hit, {len(blocks)} file(s)")
+        result['known_fix'] = True
+        response = render_blocks(blocks, message)
+        write_text(f"fixes_iteration_{result['iteration']}.txt", response)
+        return response
+
+    def ask(self, result, prompt):
+        """The first usable model response (also written to fixes_iteration_N.txt), or None."""
+        on_delta = (lambda text: print(text, end='', flush=True)) if self.stream else None
+        path = f"fixes_iteration_{result['iteration']}.txt"
+        response = ''
+        for model in self.models:
+            response = call_github_models(prompt, model=model, cache=self.cache, on_delta=on_delta,
+                                          verbose=True)
+            if self.stream:
+                print()
+            if not response.strip().startswith('Error:'):
+                result['model'] = model
+                write_text(path, response)
+                return response
+            print(f"{model}: {response.strip().splitlines()[0]}")
+        write_text(path, response or 'Error: no model available\n')
+        return None
+
+    def apply(self, result, response):
+        """Apply the response's FIX blocks; returns the files written (and Gemfile.lock)."""
+        written = []
+        scanner = FixScanner()
+        try:
+            written = apply_response(response, manifest=self.manifest, scanner=scanner)
+        except WriteError as e:
+            print(f"Error: {e}")
+        result['written'] = len(written)
+        result['commit_message'] = scanner.commit_message or f"fix: auto-fix iteration {result['iteration']}"
+        changed = list(dict.fromkeys(os.path.normpath(path) for path in written))
+        if any(os.path.basename(path).startswith('Gemfile') for path in changed):
+            print("Gemfile was modified, re-running bundle install...", flush=True)
+            if subprocess.call(['bundle', 'install', '--jobs', '4']) != 0:
+                print("Warning: bundle install failed")
+            lock = subprocess.run(['git', 'status', '--porcelain', '--', 'Gemfile.lock'],
+                                  capture_output=True, text=True).stdout
+            if lock.strip() and 'Gemfile.lock' not in changed:
+                changed.append('Gemfile.lock')
+        result['changed'] = len(changed)
+        write_text(f"changed_files_{result['iteration']}.txt", ''.join(f"{path}\n" for path in changed))
+        return changed
+
+    def validate(self, result, changed):
+        """Syntax-check the changed files; returns the broken ones (listed in syntax_errors_N.txt)."""
+        results = SyntaxGate().run([path for path in changed if can_check(path)])
+        broken = {path: error for path, ok, error, _ in results if ok is False}
+        result['broken'] = len(broken)
+        if broken:
+            write_text(f"syntax_errors_{result['iteration']}.txt",
+                       ''.join(f"{path}:\n{error}\n\n" for path, error in broken.items()))
+            for path in broken:
+                print(f"Syntax error: {path}")
+        return broken
+
+    def revert(self, paths):
+        """Put files back as they are in HEAD; files new since HEAD are removed."""
+        for path in paths:
+            restored = subprocess.call(['git', 'checkout', '-q', 'HEAD', '--', path],
+                                       stderr=subprocess.DEVNULL) == 0
+            if not restored and os.path.exists(path):
+                os.remove(path)
+
+    def commit(self, message, paths):
+        """Commit `paths` (only those) with `message`."""
+        subprocess.call(['git', 'add', '--', *paths])
+        if subprocess.call(['git', 'commit', '-q', '-m', message, '--', *paths]) != 0:
+            print("Nothing to commit")
+            return
+        if self.push and subprocess.call(['git', 'push', 'origin', 'HEAD']) != 0:
+            print("Warning: push failed")
+
+    def selected_tests(self, changed, previous_log):
+        if self.index is None:
+            self.index = SourceIndex(DEFAULT_INDEX if os.path.isdir('.git') else None)
+        else:
+            self.index.refresh()
+        return select_tests(changed, failed_tests([previous_log]), self.index)
+
+    def run_tests(self, iteration, changed, previous_log, final):
+        """(test log, exit status, whether the full suite ran) after the iteration's fixes."""
+        log = f'test_output_{iteration}.txt'
+        with open(log, 'w') as out:
+            if self.prepare_command:
+                run_shell(self.prepare_command, out)
+            status = 0
+            tests = None if final else self.selected_tests(changed, previous_log)
+            if tests:
+                print(f"Running {len(tests)} selected test file(s) first", flush=True)
+                status = run_shell(f"{self.test_command} {' '.join(shlex.quote(t) for t in tests)}", out)
+            full = status == 0
+            if full:
+                status = run_shell(self.test_command, out)
+        if not full:
+            current = log_failures((read_text(log) or '').splitlines())
+            carried = carried_failures(self.full_log, current, tests)
+            if carried:
+                with open(log, 'a') as out:
+                    out.write("\nStill failing in the last full test run (not re-run):\n")
+                    out.write('\n'.join(carried) + '\n')
+        tail = (read_text(log) or '').splitlines()[-50:]
+        if tail:
+            print('\n'.join(tail))
+        print(f"Tests after iteration {iteration}: exit code {status}", flush=True)
+        return log, status, full
+
+    def no_progress(self, iteration, log):
+        """Record the log's failures; True when they are the same as the previous iteration's."""
+        failures = log_failures((read_text(log) or '').splitlines())
+        previous = self.store.previous(iteration)
+        self.store.record(iteration, failures)
+        new, resolved, _ = compare(previous, failures)
+        return previous is not None and bool(failures) and not new and not resolved
+
+    def report(self):
+        lines = []
+        for result in self.results:
+            times = ', '.join(f"{name} {seconds:.1f}s" for name, seconds in result['times'].items())
+            exit_code = '-' if result['exit_code'] is None else result['exit_code']
+            model = 'known fix' if result['known_fix'] else result['model'] or '-'
+            lines.append(f"Iteration {result['iteration']}: model {model}, "
+                         f"{result['written']} written, {result['changed']} changed, "
+                         f"{result['broken']} with syntax errors, tests exit {exit_code} "
+                         f"({sum(result['times'].values()):.1f}s: {times})")
+        lines.append(f"Stopped: {self.stop_reason}")
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the auto-fix iterations in one process.")
+    parser.add_argument('--iterations', type=int, default=3, help="maximum iterations (default: %(default)s)")
+    parser.add_argument('--initial-log', default='test_output.txt', help="log of the failing test run")
+    parser.add_argument('--gem-diff', default=None, help="gem diff for the first prompt")
+    parser.add_argument('--gems', default='gem_summary.txt',
+                        help="gem_diff.rb output keying the known fixes (default: %(default)s)")
+    parser.add_argument('--model', action='append', default=None,
+                        help="model to ask, repeat to fall back "
+                             f"(default: MODEL_NAME or {', '.join(DEFAULT_MODELS)})")
+    parser.add_argument('--test-command', default='bin/rails test', help="test command (default: %(default)s)")
+    parser.add_argument('--prepare-command', default='bin/rails test:prepare',
+                        help="run before each test run ('' for none; default: %(default)s)")
+    parser.add_argument('--budget', type=int,
+                        default=int(os.environ.get('PROMPT_TOKEN_BUDGET', DEFAULT_BUDGET)),
+                        help="prompt size in tokens (default: %(default)s)")
+    parser.add_argument('--stream', action='store_true', help="print the model's responses as they arrive")
+    parser.add_argument('--no-cache', action='store_true', help="don't use the response cache")
+    parser.add_argument('--no-memo', action='store_true', help="don't replay or store known fixes")
+    parser.add_argument('--push', action='store_true', help="push each fix commit")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.initial_log):
+        print(f"Error: {args.initial_log} not found", file=sys.stderr)
+        sys.exit(1)
+    memo = None
+    if not args.no_memo:
+        try:
+            memo = FixMemo()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: could not open the known-fix store: {e}")
+    models = args.model or ([os.environ['MODEL_NAME']] if os.environ.get('MODEL_NAME') else DEFAULT_MODELS)
+    loop = FixLoop(args.iterations, tuple(models), args.test_command,
+                   args.prepare_command, args.budget, args.gem_diff, args.stream,
+                   None if args.no_cache else ResponseCache(), args.push, memo, args.gems)
+    status = loop.run(args.initial_log)
+    print(loop.report())
+    if loop.cache is not None:
+        print(f"Response cache: {loop.cache.summary()}")
+    if memo is not None:
+        print(f"Known fixes: {memo.summary()}")
+        memo.close()
+    write_github_outputs(iterations=len(loop.results), test_exit_code='' if status is None else status,
+                         stop_reason=loop.stop_reason)
+    sys.exit(0 if status == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Remember the fixes that made the tests pass, and replay them.
+
+Usage:
+  fix_memo.py lookup <test_output_file> [--gems gem_summary.txt]
+  fix_memo.py store <test_output_file> <fixes_file> [--gems gem_summary.txt]
+  fix_memo.py reject <test_output_file> [--gems gem_summary.txt]
+  fix_memo.py stats
+
+The same gem bump tends to break the same way in every Dependabot PR that
+carries it. A fix is stored under the failures it answered (the sorted
+fingerprints from failure_fingerprint.py) and the gem bump of the run (the
+changed rows of gem_diff.rb's summary table, versions cut to their release
+series), in a SQLite file kept outside the checkout.
+
+`lookup` runs before call_github_models.py: on a hit it prints the stored
+fix blocks in the model's response format and exits 0; on a miss it exits
+1. `store` records the FIX blocks of a response once the tests pass with
+it (a fix's `uses` counts the passing runs it was stored for), and
+`reject` evicts a replayed fix whose tests still failed. Every lookup is
+counted, so `stats` can report the hit rate.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from failure_fingerprint import log_failures, read_lines
+from fix_parsing import FixScanner, scan_fixes
+
+DEFAULT_MEMO_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'auto-fix', 'known-fixes.sqlite')
+# | `gem` | old | new | change | ... from gem_diff.rb
+GEM_ROW_RE = re.compile(r'^\|\s*`([^`]+)`\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    failure_key TEXT NOT NULL,
+    bump_key TEXT NOT NULL,
+    bump TEXT NOT NULL,
+    failures TEXT NOT NULL,
+    blocks TEXT NOT NULL,
+    commit_message TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (failure_key, bump_key)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def release_series(version):
+    """'2.9.0' -> '2', '0.21.3' -> '0.21': the part a breaking change bumps."""
+    parts = re.findall(r'\d+', version or '')
+    if not parts:
+        return version or 'none'
+    return '.'.join(parts[:2]) if parts[0] == '0' and len(parts) > 1 else parts[0]
+
+
+def gem_bump(lines):
+    """Sorted 'gem old->new' strings for the changed gems of a gem_diff.rb summary."""
+    bumps = set()
+    for line in lines:
+        match = GEM_ROW_RE.match(line)
+        if match is None:
+            continue
+        name, old, new, _change = match.groups()
+        old_series = release_series(old.strip('–- '))
+        new_series = release_series(new.strip('–- '))
+        if old_series != new_series:
+            bumps.add(f"{name} {old_series}->{new_series}")
+    return sorted(bumps)
+
+
+def _digest(items):
+    h = hashlib.blake2b(digest_size=16)
+    for item in items:
+        h.update(item.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def memo_keys(test_output_file, gems_file=None):
+    """(failure_key, bump_key, failures, bump) for a failing run, or None
+    when the log has no recognisable failures."""
+    failures = log_failures(read_lines(test_output_file))
+    if not failures:
+        return None
+    bump = gem_bump(read_lines(gems_file)) if gems_file and os.path.isfile(gems_file) else []
+    return _digest(sorted(failures)), _digest(bump), failures, bump
+
+
+def parse_blocks(text):
+    """([(path, language, body)], commit message) of a model response."""
+    scanner = FixScanner()
+    blocks = [(fix.path, fix.language, fix.body(text)) for fix in scan_fixes(text, scanner)]
+    return blocks, scanner.commit_message
+
+
+def render_blocks(blocks, commit_message):
+    """A response in the format apply_fixes.py parses."""
+    out = []
+    for path, language, body in blocks:
+        out.append(f"FIX_FILE: {path}\n```{language}\n{body}\n```\n")
+    out.append(f"COMMIT_MESSAGE: {commit_message or 'Apply known fix'}\n")
+    return '\n'.join(out)
+
+
+class FixMemo:
+    """Known fixes keyed by failure fingerprints and gem bump, in SQLite."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('FIX_MEMO_PATH') or DEFAULT_MEMO_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _count(self, name, amount=1):
+        self.db.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        (name, amount))
+
+    def counters(self):
+        return dict(self.db.execute("SELECT name, value FROM counters"))
+
+    def lookup(self, failure_key, bump_key):
+        """(blocks, commit message) of the known fix, or None. Counts the lookup."""
+        with self.db:
+            row = self.db.execute("SELECT blocks, commit_message FROM fixes "
+                                  "WHERE failure_key = ? AND bump_key = ?",
+                                  (failure_key, bump_key)).fetchone()
+            self._count('lookups')
+            if row is None:
+                return None
+            self._count('hits')
+            self.db.execute("UPDATE fixes SET last_used = ? WHERE failure_key = ? AND bump_key = ?",
+                            (time.time(), failure_key, bump_key))
+        return [tuple(block) for block in json.loads(row[0])], row[1]
+
+    def store(self, failure_key, bump_key, failures, bump, blocks, commit_message):
+        """Record a fix that made the tests pass; storing it again counts another use."""
+        now = time.time()
+        with self.db:
+            self.db.execute("INSERT INTO fixes (failure_key, bump_key, bump, failures, blocks, "
+                            "commit_message, created, last_used, uses) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1) "
+                            "ON CONFLICT(failure_key, bump_key) DO UPDATE SET bump = excluded.bump, "
+                            "failures = excluded.failures, blocks = excluded.blocks, "
+                            "commit_message = excluded.commit_message, last_used = excluded.last_used, "
+                            "uses = uses + 1",
+                            (failure_key, bump_key, json.dumps(bump), json.dumps(failures),
+                             json.dumps(blocks), commit_message or '', now, now))
+            self._count('stored')
+
+    def evict(self, failure_key, bump_key):
+        """Drop a fix that did not make the tests pass; returns whether one existed."""
+        with self.db:
+            removed = self.db.execute("DELETE FROM fixes WHERE failure_key = ? AND bump_key = ?",
+                                      (failure_key, bump_key)).rowcount
+            if removed:
+                self._count('evicted')
+        return bool(removed)
+
+    def summary(self):
+        counters = self.counters()
+        lookups = counters.get('lookups', 0)
+        hits = counters.get('hits', 0)
+        entries = self.db.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+        rate = f"{100.0 * hits / lookups:.0f}%" if lookups else "n/a"
+        return (f"{entries} known fixes, {hits}/{lookups} lookups hit ({rate}), "
+                f"{counters.get('stored', 0)} stored, {counters.get('evicted', 0)} evicted")
+
+
+def lookup_command(args, memo):
+    keys = memo_keys(args.test_output_file, args.gems)
+    found = memo.lookup(*keys[:2]) if keys else None
+    if found is None:
+        print(f"Known fix: miss ({memo.summary()})", file=sys.stderr)
+        return 1
+    blocks, commit_message = found
+    sys.stdout.write(render_blocks(blocks, commit_message))
+    print(f"Known fix: hit, {len(blocks)} file(s) ({memo.summary()})", file=sys.stderr)
+    return 0
+
+
+def store_command(args, memo):
+    keys = memo_keys(args.test_output_file, args.gems)
+    if keys is None:
+        print("No failures recognised in the test output; nothing stored", file=sys.stderr)
+        return 0
+    with open(args.fixes_file, 'r', encoding='utf-8', errors='replace') as f:
+        blocks, commit_message = parse_blocks(f.read())
+    if not blocks:
+        print("No FIX blocks in the response; nothing stored", file=sys.stderr)
+        return 0
+    memo.store(*keys, blocks, commit_message)
+    print(f"Stored known fix: {len(blocks)} file(s) for {len(keys[2])} failure(s)")
+    return 0
+
+
+def reject_command(args, memo):
+    keys = memo_keys(args.test_output_file, args.gems)
+    if keys and memo.evict(*keys[:2]):
+        print("Evicted known fix: the tests still failed with it")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store and replay fixes that made the tests pass.")
+    parser.add_argument('--memo', default=None,
+                        help=f"SQLite file (default: $FIX_MEMO_PATH or {DEFAULT_MEMO_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('lookup', "print the known fix for a failing run"),
+                            ('store', "remember the fix that made a failing run pass"),
+                            ('reject', "evict the known fix for a run that still fails")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('test_output_file', help="log of the failing run the fix answers")
+        if name == 'store':
+            command.add_argument('fixes_file')
+        command.add_argument('--gems', default='gem_summary.txt',
+                             help="gem_diff.rb output (default: %(default)s)")
+    commands.add_parser('stats', help="print hit rate and size")
+    args = parser.parse_args()
+
+    try:
+        memo = FixMemo(args.memo)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: could not open the known-fix store: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        if args.command == 'stats':
+            print(memo.summary())
+            status = 0
+        else:
+            status = {'lookup': lookup_command, 'store': store_command,
+                      'reject': reject_command}[args.command](args, memo)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        memo.close()
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Shared parser for FIX blocks in AI responses.
+
+Both apply_fixes.py and universal_apply_fixes.py parse responses through
+this module, so a response is read the same way whichever script the
+workflow calls. Accepted block formats:
+
+  ### FIX: path/to/file.rb
+  ```ruby
+  file content
+  ```
+
+  FIX_FILE: path/to/file.rb
+  ```ruby
+  file content
+  ```
+
+Parsing is a single line-oriented pass: every line is matched once against
+precompiled patterns, so the cost stays linear even when fences are never
+closed. Parsed blocks are `Fix` records holding offsets into the response
+buffer instead of copies of the file bodies.
+"""
+
+import re
+from dataclasses import dataclass
+
+# Header lines that open a FIX block; the path is the rest of the line.
+FIX_HEADER_RE = re.compile(r'[ \t]*(?:###[ \t]*FIX:|FIX_FILE:)[ \t]*(.*?)[ \t\r]*$')
+# Opening fence with an optional language tag (```ruby, ```c-sharp, ...).
+FENCE_OPEN_RE = re.compile(r'[ \t]*```([\w+#.-]*)[ \t\r]*$')
+# Any line starting with ``` closes the current block.
+FENCE_CLOSE_RE = re.compile(r'[ \t]*```')
+# "COMMIT_MESSAGE: text" or "### COMMIT_MESSAGE:" with the text on the next line.
+COMMIT_MESSAGE_RE = re.compile(r'[ \t]*(?:###[ \t]*)?COMMIT_MESSAGE:[ \t]*(.*?)[ \t\r]*$')
+# Matches a line up to its last non-blank character, i.e. an rstrip().
+TEXT_RE = re.compile(r'.*\S')
+ANALYSIS_RE = re.compile(r'### ANALYSIS:\s*(.+?)(?=###|$)', re.DOTALL)
+
+NO_FIX_NEEDED = 'NO_FIX_NEEDED'
+READ_CHUNK_SIZE = 64 * 1024
+
+# Parser states
+SEEK_HEADER = 0
+SEEK_FENCE = 1
+IN_BODY = 2
+SEEK_COMMIT_MESSAGE = 3
+
+
+class PatternSet:
+    """The patterns above compiled for one buffer type.
+
+    Responses are scanned either as `str` or, when memory-mapped, as bytes;
+    the bytes set lets the scanner run straight over an mmap without
+    decoding it.
+    """
+
+    def __init__(self, binary):
+        def compile_(regex):
+            pattern = regex.pattern.encode() if binary else regex.pattern
+            return re.compile(pattern, regex.flags & ~re.UNICODE if binary else regex.flags)
+
+        self.binary = binary
+        self.header = compile_(FIX_HEADER_RE)
+        self.fence_open = compile_(FENCE_OPEN_RE)
+        self.fence_close = compile_(FENCE_CLOSE_RE)
+        self.commit_message = compile_(COMMIT_MESSAGE_RE)
+        self.text = compile_(TEXT_RE)
+        self.analysis = compile_(ANALYSIS_RE)
+        self.newline = b'\n' if binary else '\n'
+        self.no_fix_needed = NO_FIX_NEEDED.encode() if binary else NO_FIX_NEEDED
+
+    def decode(self, value):
+        """Return a (short) captured value as str."""
+        return value.decode('utf-8', errors='replace') if self.binary else value
+
+
+TEXT_PATTERNS = PatternSet(binary=False)
+BYTES_PATTERNS = PatternSet(binary=True)
+
+
+def patterns_for(buffer):
+    """Pick the pattern set matching a str, bytes or mmap buffer."""
+    return TEXT_PATTERNS if isinstance(buffer, str) else BYTES_PATTERNS
+
+
+@dataclass(slots=True)
+class Fix:
+    """One parsed FIX block; `start`/`end` span its body in the response."""
+
+    path: str
+    language: str
+    start: int
+    end: int
+
+    def body(self, buffer):
+        """Return the block body from the buffer it was parsed from."""
+        return buffer[self.start:self.end]
+
+
+class FixScanner:
+    """Line-oriented state machine behind every parsing entry point.
+
+    `line(buffer, start, end)` consumes the line buffer[start:end] (without
+    its newline) and returns a `Fix` when that line closes a block. Lines are
+    matched in place, so no per-line copies are made. `Fix` spans are
+    offsets into the buffer plus `base`, the stream offset of buffer[0]
+    when the buffer is only a piece of the response.
+    """
+
+    def __init__(self, patterns=TEXT_PATTERNS):
+        self.patterns = patterns
+        self.base = 0
+        self.state = SEEK_HEADER
+        self.path = None
+        self.language = ''
+        self.body_start = 0
+        self.body_end = 0
+        self.no_fix_needed = False
+        self.commit_message = ''
+
+    def line(self, buffer, start, end):
+        patterns = self.patterns
+        if self.state != IN_BODY and buffer.find(patterns.no_fix_needed, start, end) != -1:
+            self.no_fix_needed = True
+
+        header = patterns.header.match(buffer, start, end)
+        if header:
+            # A new header always wins, which also abandons an unclosed fence
+            # instead of swallowing every block that follows it.
+            self.path = patterns.decode(header.group(1))
+            self.state = SEEK_FENCE if self.path else SEEK_HEADER
+            return None
+
+        if self.state == IN_BODY:
+            if patterns.fence_close.match(buffer, start, end):
+                self.state = SEEK_HEADER
+                return Fix(self.path, self.language, self.body_start, self.body_end)
+            text = patterns.text.match(buffer, start, end)
+            if text:
+                self.body_end = self.base + text.end()
+            return None
+
+        if self.state == SEEK_FENCE:
+            fence = patterns.fence_open.match(buffer, start, end)
+            if fence:
+                self.state = IN_BODY
+                self.language = patterns.decode(fence.group(1))
+                self.body_start = self.body_end = self.base + end + 1
+            elif patterns.text.match(buffer, start, end):
+                self.state = SEEK_HEADER
+            return None
+
+        if self.state == SEEK_COMMIT_MESSAGE:
+            if patterns.text.match(buffer, start, end):
+                self.commit_message = patterns.decode(buffer[start:end].strip())
+                self.state = SEEK_HEADER
+            return None
+
+        if not self.commit_message:
+            commit = patterns.commit_message.match(buffer, start, end)
+            if commit:
+                self.commit_message = patterns.decode(commit.group(1))
+                if not self.commit_message:
+                    self.state = SEEK_COMMIT_MESSAGE
+        return None
+
+
+def scan_fixes(buffer, scanner=None):
+    """Yield a `Fix` for each block in `buffer`, with spans into it.
+
+    `buffer` may be a str, bytes or a read-only mmap of the response.
+    """
+    scanner = scanner or FixScanner(patterns_for(buffer))
+    newline = scanner.patterns.newline
+    start = 0
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(newline, start)
+        if end == -1:
+            end = size
+        fix = scanner.line(buffer, start, end)
+        if fix is not None:
+            yield fix
+        start = end + 1
+
+
+class FixStream:
+    """Incremental front end to `FixScanner` for chunked input.
+
+    Chunks are kept until a newline completes their line, and only the
+    lines of the block currently being read are held after that; each is
+    scanned once and a body is joined once, when its block closes. `Fix`
+    spans are offsets into the whole stream.
+    """
+
+    def __init__(self, scanner=None):
+        self.scanner = scanner or FixScanner()
+        self.pending = []  # chunks of the partial trailing line
+        self.body = []  # lines of the open block's body
+        self.offset = 0  # stream offset of the next line
+
+    @property
+    def no_fix_needed(self):
+        return self.scanner.no_fix_needed
+
+    @property
+    def commit_message(self):
+        return self.scanner.commit_message
+
+    def feed(self, chunk):
+        """Consume a chunk and return (fix, body) for each block it closed."""
+        if '\n' not in chunk:
+            self.pending.append(chunk)
+            return []
+        lines = chunk.split('\n')
+        self.pending.append(lines[0])
+        lines[0] = ''.join(self.pending)
+        self.pending = [lines.pop()]
+        done = []
+        for line in lines:
+            self._line(line, done)
+        return done
+
+    def close(self):
+        """Flush the trailing partial line; unterminated blocks are dropped."""
+        done = []
+        tail = ''.join(self.pending)
+        if tail:
+            self._line(tail, done)
+        self.pending = []
+        self.body = []
+        self.scanner.state = SEEK_HEADER
+        return done
+
+    def _line(self, line, done):
+        scanner = self.scanner
+        scanner.base = self.offset
+        self.offset += len(line) + 1
+        in_body = scanner.state == IN_BODY
+        fix = scanner.line(line, 0, len(line))
+        if fix is not None:
+            done.append((fix, '\n'.join(self.body)[:fix.end - fix.start]))
+        if scanner.state != IN_BODY:
+            self.body = []
+        elif in_body:
+            self.body.append(line)
+
+
+def iter_chunks(source, size=READ_CHUNK_SIZE):
+    """Yield text chunks from a string, a file object or a chunk iterable."""
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
+
+def iter_fixes(source, stream=None):
+    """Yield (path, content) for each FIX block as soon as it closes.
+
+    `source` may be a string, a text file object or any iterable of string
+    chunks; the response is never loaded as a whole.
+    """
+    stream = stream or FixStream()
+    for chunk in iter_chunks(source):
+        for fix, body in stream.feed(chunk):
+            yield fix.path, body
+    for fix, body in stream.close():
+        yield fix.path, body
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Step outputs and step summary lines for GitHub Actions.
+
+Kept apart from the scripts that set outputs so that small utilities
+(failure_fingerprint.py, fix_loop.py, ...) can use it without importing
+the whole apply stack.
+"""
+
+import os
+
+
+def write_github_outputs(**values):
+    """Expose step outputs to later workflow steps when run in Actions."""
+    output_file = os.environ.get('GITHUB_OUTPUT')
+    if not output_file:
+        return
+    with open(output_file, 'a') as f:
+        for key, value in values.items():
+            f.write(f"{key}={value}\n")
+
+
+def write_step_summary(text):
+    """Append a line to the job's step summary; False when not run in Actions."""
+    summary_file = os.environ.get('GITHUB_STEP_SUMMARY')
+    if not summary_file:
+        return False
+    with open(summary_file, 'a') as f:
+        f.write(f"{text}\n\n")
+    return True
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Content-hash manifest used to skip rewriting files that would not change.
+
+The AI often echoes files back byte-for-byte. Rewriting them dirties mtimes
+(defeating bootsnap and Rails caches) and makes `git add` and test reruns
+slower, so both fix appliers compare a blake2b digest of the proposed
+content with the file on disk and leave identical files alone.
+
+Digests of files on disk are remembered in a JSON manifest together with
+their size and mtime, so a file that has not been touched since the last
+iteration is never read again. The manifest lives under .git/ by default,
+where `git add -A` will not pick it up.
+"""
+
+import hashlib
+import json
+import os
+
+from mmap_io import map_file
+
+DEFAULT_MANIFEST = os.path.join('.git', 'auto_fix_hashes.json')
+DIGEST_SIZE = 16
+
+
+def default_manifest_path():
+    """Return the manifest path for the current checkout, or None."""
+    return DEFAULT_MANIFEST if os.path.isdir('.git') else None
+
+
+def content_digest(buffer, start=0, end=None, trailer=b''):
+    """blake2b of buffer[start:end] + trailer, hashed without copying."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if isinstance(buffer, str):
+        h.update(buffer[start:end].encode('utf-8'))
+    else:
+        end = len(buffer) if end is None else end
+        with memoryview(buffer) as view, view[start:end] as span:
+            h.update(span)
+    if trailer:
+        h.update(trailer.encode('utf-8') if isinstance(trailer, str) else trailer)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    with map_file(path) as buffer:
+        return content_digest(buffer)
+
+
+class HashManifest:
+    """Persisted {path: digest, size, mtime} map of files the fixers wrote."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                # A corrupt manifest only costs us some re-hashing
+                self.entries = {}
+
+    @staticmethod
+    def _key(target):
+        return os.path.normpath(target)
+
+    def _remember(self, target, digest, st):
+        self.entries[self._key(target)] = {
+            'digest': digest,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+        }
+        self.dirty = True
+
+    def disk_digest(self, target):
+        """Digest of the file currently at `target`, or None if missing."""
+        try:
+            st = os.stat(target)
+        except FileNotFoundError:
+            return None
+        entry = self.entries.get(self._key(target))
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['digest']
+        digest = file_digest(target)
+        self._remember(target, digest, st)
+        return digest
+
+    def unchanged(self, target, digest, size=None):
+        """True when `target` already holds content with this digest."""
+        if size is not None:
+            try:
+                if os.stat(target).st_size != size:
+                    return False
+            except FileNotFoundError:
+                return False
+        return self.disk_digest(target) == digest
+
+    def record(self, target, digest):
+        """Remember the digest of a file that was just written."""
+        self._remember(target, digest, os.stat(target))
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(self.entries, f, sort_keys=True)
+        os.replace(temp, self.path)
+        self.dirty = False
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Small keep-alive HTTP client shared by the model-calling scripts.
+
+urllib opens a new TCP + TLS connection for every request. This client
+keeps one persistent http.client connection per (scheme, host, port) and
+reuses it for the next call, asks for gzip-compressed responses and
+decodes them, and applies separate connect and read timeouts. Streamed
+responses (server-sent events) can be read line by line as they arrive.
+Every response carries the size of the request body and the time from
+sending the request to receiving the response headers (`ttfb`).
+"""
+
+import gzip
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = float(os.environ.get("MODEL_TIMEOUT", "30"))
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+# Errors that mean a reused keep-alive connection went stale
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class HttpResponse:
+    """A fully read response."""
+
+    __slots__ = ('status', 'reason', 'headers', 'body', 'ttfb', 'request_bytes')
+
+    def __init__(self, status, reason, headers, body, ttfb=None, request_bytes=0):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.ttfb = ttfb
+        self.request_bytes = request_bytes
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class StreamResponse:
+    """A 2xx response whose body is read line by line as it arrives.
+
+    The connection goes back to the pool once the body is exhausted;
+    closing the response early discards the connection instead.
+    """
+
+    __slots__ = ('status', 'reason', 'headers', 'ttfb', 'request_bytes',
+                 '_client', '_key', '_conn', '_response')
+
+    def __init__(self, client, key, conn, response, ttfb=None, request_bytes=0):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.ttfb = ttfb
+        self.request_bytes = request_bytes
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._response = response
+
+    @property
+    def ok(self):
+        return True
+
+    def iter_lines(self):
+        """Yield raw body lines (bytes, newline included) until EOF."""
+        try:
+            while True:
+                line = self._response.readline()
+                if not line:
+                    break
+                yield line
+        except BaseException:
+            self.close()
+            raise
+        if self._conn is not None:
+            self._client._release(self._key, self._conn, self._response)
+            self._conn = None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def decode_body(body, encoding):
+    """Undo a gzip/deflate Content-Encoding."""
+    encoding = (encoding or "").lower()
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class HttpClient:
+    """Pool of persistent connections, one idle connection per origin."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def _connect(self, scheme, host, port):
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _checkout(self, key):
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                return conns.pop(), True
+        return self._connect(*key), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def _send(self, method, url, body, headers, timeout, stream):
+        """Send a request, returning (key, conn, response, data, ttfb).
+
+        `data` is the read body, or None when streaming; `ttfb` is the
+        seconds until the response headers arrived.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        send_headers = {"Accept-Encoding": "identity" if stream else "gzip",
+                        "Connection": "keep-alive"}
+        send_headers.update(headers or {})
+
+        while True:
+            conn, reused = self._checkout(key)
+            try:
+                conn.sock.settimeout(timeout or self.timeout)
+                sent = time.perf_counter()
+                conn.request(method, path, body=body, headers=send_headers)
+                response = conn.getresponse()
+                ttfb = time.perf_counter() - sent
+                data = None if stream else response.read()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused:
+                    # The server dropped an idle connection; retry on a new one
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        with self._lock:
+            self.requests_sent += 1
+        return key, conn, response, data, ttfb
+
+    def _release(self, key, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """Send a request and return the fully read HttpResponse.
+
+        Network failures raise OSError or http.client.HTTPException; HTTP
+        error statuses are returned, not raised.
+        """
+        key, conn, response, data, ttfb = self._send(method, url, body, headers, timeout, False)
+        self._release(key, conn, response)
+        data = decode_body(data, response.getheader("Content-Encoding"))
+        return HttpResponse(response.status, response.reason, response.headers, data,
+                            ttfb, len(body or b''))
+
+    def open(self, method, url, body=None, headers=None, timeout=None):
+        """Send a request and return a StreamResponse for a 2xx status.
+
+        Any other status is read in full and returned as an HttpResponse,
+        so callers (and retry.call_with_retry) handle errors the same way.
+        """
+        key, conn, response, _, ttfb = self._send(method, url, body, headers, timeout, True)
+        if not 200 <= response.status < 300:
+            try:
+                data = response.read()
+            except BaseException:
+                conn.close()
+                raise
+            self._release(key, conn, response)
+            data = decode_body(data, response.getheader("Content-Encoding"))
+            return HttpResponse(response.status, response.reason, response.headers, data,
+                                ttfb, len(body or b''))
+        return StreamResponse(self, key, conn, response, ttfb, len(body or b''))
+
+    def post_json(self, url, payload, headers=None, timeout=None, stream=False):
+        send_headers = {"Content-Type": "application/json"}
+        send_headers.update(headers or {})
+        body = json.dumps(payload).encode("utf-8")
+        send = self.open if stream else self.request
+        return send("POST", url, body=body, headers=send_headers, timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_shared = None
+
+
+def shared_client():
+    """Process-wide client, so successive model calls reuse connections."""
+    global _shared
+    if _shared is None:
+        _shared = HttpClient()
+    return _shared
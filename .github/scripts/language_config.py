@@ -1,8 +1,20 @@
 """
 Configuration for multi-language dependency upgrade detection and fixing.
 Maps languages to their specific settings, test commands, and breaking change patterns.
+
+LANGUAGE_CONFIG stays a plain dict. Code that reads it goes through
+REGISTRY, which turns a language's entry into a validated LanguageRecord
+the first time that language is asked for, so a script that only handles
+Ruby never builds or checks the others. Records are kept once built, so
+treat LANGUAGE_CONFIG as frozen after import; code that does change it
+must call REGISTRY.reload() afterwards. Run this file directly to
+validate every language (and catch duplicate keys, which a dict literal
+silently drops).
 """
 
+import os
+import sys
+
 LANGUAGE_CONFIG = {
     'ruby': {
         'name': 'Ruby/Rails',
@@ -21,9 +33,10 @@ LANGUAGE_CONFIG = {
             'bin/rails test'
         ],
         'test_framework': 'rails-test',
+        'import_keywords': ['require ', 'require_relative '],
+        'definition_keywords': ['def ', 'class ', 'module '],
         'major_version_indicators': {  # How to detect major version upgrades
             'rails': 7,
-            'sinatra': 2,
             'sinatra': 3,
         },
         'breaking_changes': {
@@ -57,6 +70,8 @@ LANGUAGE_CONFIG = {
             'npm run test:unit',
         ],
         'test_framework': 'jest|mocha|vitest',
+        'import_keywords': ['import ', 'require('],
+        'definition_keywords': ['function ', 'function(', 'async function', 'class '],
         'major_version_indicators': {
             'express': 5,
             'webpack': 5,
@@ -99,6 +114,8 @@ LANGUAGE_CONFIG = {
             'tsc --noEmit',  # Type check
         ],
         'test_framework': 'jest|vitest',
+        'import_keywords': ['import ', 'require('],
+        'definition_keywords': ['function ', 'function(', 'async function', 'class ', 'interface '],
         'major_version_indicators': {
             'typescript': 5,
         },
@@ -127,6 +144,8 @@ LANGUAGE_CONFIG = {
             'python -m unittest discover',
         ],
         'test_framework': 'pytest|unittest',
+        'import_keywords': ['import ', 'from '],
+        'definition_keywords': ['def ', 'class '],
         'major_version_indicators': {
             'django': 4,
             'flask': 2,
@@ -171,6 +190,8 @@ LANGUAGE_CONFIG = {
             './gradlew test',
         ],
         'test_framework': 'junit|testng',
+        'import_keywords': ['import '],
+        'definition_keywords': ['class ', 'interface ', 'enum ', 'record '],
         'major_version_indicators': {
             'java': 11,
             'spring-boot': 3,
@@ -207,6 +228,8 @@ LANGUAGE_CONFIG = {
             './vendor/bin/phpunit',  # PHPUnit
         ],
         'test_framework': 'phpunit|pest',
+        'import_keywords': ['use ', 'require ', 'require_once ', 'include '],
+        'definition_keywords': ['function ', 'class ', 'trait ', 'interface '],
         'major_version_indicators': {
             'php': 8,
             'laravel': 10,
@@ -242,6 +265,8 @@ LANGUAGE_CONFIG = {
             'dotnet test',
         ],
         'test_framework': 'xunit|nunit|mstest',
+        'import_keywords': ['using '],
+        'definition_keywords': ['class ', 'interface ', 'struct ', 'enum ', 'record '],
         'major_version_indicators': {
             'dotnet': 8,
         },
@@ -254,6 +279,10 @@ LANGUAGE_CONFIG = {
     }
 }
 
+# Keywords used to place inserted code when a language has none configured
+DEFAULT_IMPORT_KEYWORDS = ['import ', 'from ', 'require ', 'using ']
+DEFAULT_DEFINITION_KEYWORDS = ['def ', 'function ', 'function(', 'async function', 'class ']
+
 # Common development dependencies that often cause issues
 PROBLEMATIC_DEPENDENCIES = {
     'ruby': ['devise', 'pundit', 'cancan', 'carrierwave', 'paperclip'],
@@ -267,10 +296,12 @@ PROBLEMATIC_DEPENDENCIES = {
 # Common error patterns to look for
 ERROR_PATTERNS = {
     'ruby': {
-        'missing_method': r"undefined method `(\w+)' for",
+        'missing_method': r"undefined method [`'](\w+[?!=]?)' for",
         'wrong_number_args': r"wrong number of arguments \(given (\d+), expected (\d+)\)",
         'const_error': r"uninitialized constant (\S+)",
-        'load_error': r"cannot load such file",
+        'load_error': r"cannot load such file -- (\S+)",
+        'gem_activation': r"can't activate (\S+ \([^)]*\)), already activated (\S+?)\.(?: |$)",
+        'adapter_error': r"Error loading the '(\w+)' Active Record adapter",
     },
     'javascript': {
         'undefined': r"(\w+) is not defined",
@@ -291,31 +322,221 @@ ERROR_PATTERNS = {
     }
 }
 
+
+class ConfigError(ValueError):
+    """A LANGUAGE_CONFIG entry is missing a setting or has one of the wrong shape."""
+
+
+class LanguageRecord:
+    """One language's settings, validated, with defaults filled in."""
+
+    __slots__ = ('key', 'name', 'extensions', 'lockfile', 'manifest', 'dependency_manager',
+                 'setup_action', 'install_commands', 'test_commands', 'test_framework',
+                 'import_keywords', 'definition_keywords', 'major_versions',
+                 'breaking_changes', 'upgrade_resources', 'error_patterns',
+                 'problematic_dependencies', 'extra')
+
+    REQUIRED = ('name', 'extensions', 'manifest', 'dependency_manager', 'install_command', 'test_commands')
+
+    def __init__(self, key, config):
+        missing = [name for name in self.REQUIRED if not config.get(name)]
+        if missing:
+            raise ConfigError(f"{key}: missing {', '.join(missing)}")
+        self.key = key
+        self.name = config['name']
+        self.extensions = tuple(_strings(key, 'extensions', config['extensions']))
+        bad = [ext for ext in self.extensions if not ext.startswith('.') or ext != ext.lower()]
+        if bad:
+            raise ConfigError(f"{key}: extensions must be lower case and start with '.': {bad}")
+        self.lockfile = config.get('lockfile', '')
+        self.manifest = config['manifest']
+        self.dependency_manager = config['dependency_manager']
+        self.setup_action = config.get('setup_action', '')
+        self.install_commands = tuple(_strings(key, 'install_command', config['install_command']))
+        self.test_commands = tuple(_strings(key, 'test_commands', config['test_commands']))
+        self.test_framework = config.get('test_framework', '')
+        self.import_keywords = tuple(_strings(key, 'import_keywords',
+                                              config.get('import_keywords', DEFAULT_IMPORT_KEYWORDS)))
+        self.definition_keywords = tuple(_strings(key, 'definition_keywords',
+                                                  config.get('definition_keywords', DEFAULT_DEFINITION_KEYWORDS)))
+        self.major_versions = {}
+        for package, major in config.get('major_version_indicators', {}).items():
+            if not isinstance(major, int) or isinstance(major, bool):
+                raise ConfigError(f"{key}: major version of {package} must be an int, not {major!r}")
+            self.major_versions[package] = major
+        # (package, major) -> description
+        self.breaking_changes = {}
+        for package, majors in config.get('breaking_changes', {}).items():
+            if not isinstance(majors, dict):
+                raise ConfigError(f"{key}: breaking_changes[{package!r}] must map major versions to text")
+            for major, text in majors.items():
+                if not str(major).isdigit() or not isinstance(text, str):
+                    raise ConfigError(f"{key}: breaking_changes[{package!r}][{major!r}] must be text "
+                                      "under a major version number")
+                self.breaking_changes[(package, str(major))] = text
+        self.upgrade_resources = tuple(config.get('upgrade_resources', ()))
+        self.error_patterns = ERROR_PATTERNS.get(key, {})
+        self.problematic_dependencies = tuple(PROBLEMATIC_DEPENDENCIES.get(key, ()))
+        known = set(self.REQUIRED) | {'lockfile', 'setup_action', 'test_framework', 'import_keywords',
+                                      'definition_keywords', 'major_version_indicators',
+                                      'breaking_changes', 'upgrade_resources'}
+        # Tool versions (python_version, java_version, ...) and the like
+        self.extra = {name: value for name, value in config.items() if name not in known}
+
+    def __repr__(self):
+        return f"LanguageRecord({self.key!r})"
+
+
+def _strings(key, setting, value):
+    if isinstance(value, str) or not all(isinstance(item, str) for item in value):
+        raise ConfigError(f"{key}: {setting} must be a list of strings")
+    return value
+
+
+class LanguageRegistry:
+    """LANGUAGE_CONFIG compiled on demand, one language at a time.
+
+    The extension index only reads the `extensions` lists; a full record
+    (and its breaking-change entries) is built and validated the first
+    time its language is asked for. Both are cached: call reload() after
+    changing the config.
+    """
+
+    __slots__ = ('config', '_records', '_extensions', '_breaking')
+
+    def __init__(self, config):
+        self.config = config
+        self._records = {}
+        self._extensions = None
+        # (language, package, major) -> description, filled as records are built
+        self._breaking = {}
+
+    def reload(self):
+        """Forget the built records and index, e.g. after editing the config."""
+        self._records = {}
+        self._extensions = None
+        self._breaking = {}
+
+    def __contains__(self, language):
+        return language in self.config
+
+    def names(self):
+        return list(self.config)
+
+    def get(self, language):
+        """The LanguageRecord for `language`, or None if it is not configured."""
+        record = self._records.get(language)
+        if record is None and language in self.config:
+            record = LanguageRecord(language, self.config[language])
+            for (package, major), text in record.breaking_changes.items():
+                self._breaking[(language, package, major)] = text
+            self._records[language] = record
+        return record
+
+    def extension_index(self):
+        """{'.rb': 'ruby', ...}; an extension claimed twice is a ConfigError."""
+        if self._extensions is None:
+            index = {}
+            for language, config in self.config.items():
+                for ext in config.get('extensions', ()):
+                    ext = ext.lower()
+                    if index.get(ext, language) != language:
+                        raise ConfigError(f"extension {ext} is listed for both {index[ext]} and {language}")
+                    index[ext] = language
+            self._extensions = index
+        return self._extensions
+
+    def language_for_path(self, path):
+        """Language of a file by its extension, or None."""
+        return self.extension_index().get(os.path.splitext(path)[1].lower())
+
+    def breaking_changes(self, language, package, major_version):
+        """Description of a package's breaking changes at a major version.
+
+        None when the package has no entry at all, 'No known breaking
+        changes' when it has entries but not for this major version.
+        """
+        if self.get(language) is None:
+            return None
+        text = self._breaking.get((language, package, str(major_version)))
+        if text is not None:
+            return text
+        if any(key[0] == package for key in self._records[language].breaking_changes):
+            return 'No known breaking changes'
+        return None
+
+    def validate(self):
+        """Build every record and the extension index; returns the errors found."""
+        errors = []
+        for language in self.config:
+            try:
+                self.get(language)
+            except ConfigError as e:
+                errors.append(str(e))
+        try:
+            self.extension_index()
+        except ConfigError as e:
+            errors.append(str(e))
+        return errors
+
+
+REGISTRY = LanguageRegistry(LANGUAGE_CONFIG)
+
+
+def duplicate_keys(path=__file__):
+    """(line, key) for every key repeated within one dict literal of a source file."""
+    import ast
+
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    duplicates = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Dict):
+            seen = set()
+            for key in node.keys:
+                if isinstance(key, ast.Constant):
+                    if key.value in seen:
+                        duplicates.append((key.lineno, key.value))
+                    seen.add(key.value)
+    return sorted(duplicates)
+
+
 def get_language_config(language):
     """Get configuration for a specific language"""
     return LANGUAGE_CONFIG.get(language, {})
 
 def get_test_command(language, config=None):
     """Get the appropriate test command for a language"""
-    if config is None:
-        config = get_language_config(language)
-    
-    return config.get('test_commands', [''])[0] or ''
+    if config is not None:
+        return config.get('test_commands', [''])[0] or ''
+    record = REGISTRY.get(language)
+    return record.test_commands[0] if record else ''
 
 def get_install_command(language, config=None):
     """Get the appropriate install command for a language"""
-    if config is None:
-        config = get_language_config(language)
-    
-    return config.get('install_command', [''])[0] or ''
+    if config is not None:
+        return config.get('install_command', [''])[0] or ''
+    record = REGISTRY.get(language)
+    return record.install_commands[0] if record else ''
+
+def get_anchor_keywords(language):
+    """Get (import keywords, definition keywords) used to place code in a file"""
+    record = REGISTRY.get(language)
+    if record is None:
+        return DEFAULT_IMPORT_KEYWORDS, DEFAULT_DEFINITION_KEYWORDS
+    return record.import_keywords, record.definition_keywords
 
 def get_breaking_changes(language, package, major_version):
     """Get breaking changes description for a specific package upgrade"""
-    config = get_language_config(language)
-    breaking = config.get('breaking_changes', {})
-    
-    if package in breaking:
-        return breaking[package].get(str(major_version), 'No known breaking changes')
-    
-    return None
+    return REGISTRY.breaking_changes(language, package, major_version)
+
+
+if __name__ == '__main__':
+    problems = REGISTRY.validate()
+    problems += [f"line {line}: duplicate key {key!r}" for line, key in duplicate_keys()]
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"✅ {len(LANGUAGE_CONFIG)} languages, {len(REGISTRY.extension_index())} extensions")
 
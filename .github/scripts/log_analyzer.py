@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Summarise the errors in a test log using language_config.ERROR_PATTERNS.
+
+Usage: log_analyzer.py <log_file> [--language ruby] [--output summary.json]
+
+All patterns of a language (or of every language) are compiled once into a
+single alternation, one named group per error kind. Capturing groups stop
+the regex engine from skipping ahead to a literal prefix, so each line is
+first checked against a non-capturing version of the alternation (with
+leading `(\w+)`-style groups dropped) and only the rare lines that pass
+are matched with the named groups. The log is read line by line, so multi-MB
+test output is scanned in one pass without being held in memory. Each
+error is attributed to the first application frame of the backtrace that
+follows it, and identical errors are counted rather than repeated.
+
+The JSON summary looks like:
+
+  {"language": "ruby", "lines": 227, "bytes": 28817,
+   "kinds": {"gem_activation": 4, ...},
+   "errors": [{"kind": "gem_activation", "symbol": "sqlite3 (~> 1.4)",
+               "captures": [...], "location": "app/models/user.rb:1",
+               "count": 2, "first_line": 2, "message": "..."}]}
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+from backtrace import FRAME_RE, is_library_frame
+from language_config import ERROR_PATTERNS
+
+_COMPILED = {}
+# A leading "(\w+)" / "(\S+)" group: dropped from the prefilter, since a
+# pattern starting with one cannot be searched for by its literal text
+_LEADING_GROUP_RE = re.compile(r'^\((?:\\[wdsS]|\[[^\]]*\]|\.)[+*]\)')
+
+
+class PatternTable:
+    """ERROR_PATTERNS for some languages, compiled into one alternation."""
+
+    def __init__(self, languages):
+        parts = []
+        prefilter = []
+        self.kinds = {}  # group name -> (language, kind, first capture, capture count)
+        group = 0
+        for language in languages:
+            for kind, pattern in ERROR_PATTERNS.get(language, {}).items():
+                name = f"{language}__{kind}"
+                captures = re.compile(pattern).groups
+                group += 1
+                self.kinds[name] = (language, kind, group + 1, captures)
+                parts.append(f"(?P<{name}>{pattern})")
+                prefilter.append(f"(?:{_LEADING_GROUP_RE.sub('', pattern, count=1)})")
+                group += captures
+        self.regex = re.compile('|'.join(parts)) if parts else None
+        self.prefilter = re.compile('|'.join(prefilter)) if prefilter else None
+
+    def search(self, line):
+        """(language, kind, captures, match) for the first error in `line`, or None."""
+        if self.regex is None or self.prefilter.search(line) is None:
+            return None
+        match = self.regex.search(line)
+        if match is None:
+            return None
+        language, kind, first, count = self.kinds[match.lastgroup]
+        return language, kind, match.groups()[first - 1:first - 1 + count], match
+
+
+def compile_patterns(language=None):
+    """Cached PatternTable for one language, or for all when None."""
+    table = _COMPILED.get(language)
+    if table is None:
+        table = PatternTable([language] if language else list(ERROR_PATTERNS))
+        _COMPILED[language] = table
+    return table
+
+
+def _short_location(match, root):
+    path = match.group('path')
+    if root and path.startswith(root):
+        path = path[len(root):]
+    return f"{path}:{match.group('line')}"
+
+
+def analyze_lines(lines, language=None, root=None):
+    """Scan log lines once and return the summary dict (without sizes)."""
+    table = compile_patterns(language)
+    root = root if root is not None else os.getcwd().rstrip('/') + '/'
+    errors = {}
+    pending = []  # errors still waiting for an application frame
+    count = 0
+    for count, line in enumerate(lines, 1):
+        line = line.rstrip('\n')
+        found = table.search(line)
+        if found is not None:
+            found_language, kind, captures, match = found
+            entry = {
+                'language': found_language,
+                'kind': kind,
+                'symbol': next((c for c in captures if c), None),
+                'captures': list(captures),
+                'location': None,
+                'count': 0,
+                'first_line': count,
+                'message': line.strip()[:300],
+            }
+            pending.append(entry)
+            continue
+
+        frame = FRAME_RE.match(line)
+        if frame is not None:
+            if pending and not is_library_frame(frame.group('path')):
+                location = _short_location(frame, root)
+                for entry in pending:
+                    _record(errors, entry, location)
+                pending = []
+        elif not line.strip():
+            for entry in pending:
+                _record(errors, entry, None)
+            pending = []
+    for entry in pending:
+        _record(errors, entry, None)
+
+    ranked = sorted(errors.values(), key=lambda e: (-e['count'], e['first_line']))
+    kinds = {}
+    for entry in ranked:
+        kinds[entry['kind']] = kinds.get(entry['kind'], 0) + entry['count']
+    return {
+        'language': language or 'all',
+        'lines': count,
+        'kinds': kinds,
+        'errors': ranked,
+    }
+
+
+def _record(errors, entry, location):
+    key = (entry['language'], entry['kind'], tuple(entry['captures']), location)
+    existing = errors.get(key)
+    if existing is None:
+        entry['location'] = location
+        entry['count'] = 1
+        errors[key] = entry
+    else:
+        existing['count'] += 1
+
+
+def analyze_file(path, language=None, root=None):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        summary = analyze_lines(f, language, root)
+    summary['bytes'] = os.path.getsize(path)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise errors in a test log as JSON.")
+    parser.add_argument('log_file')
+    parser.add_argument('--language', default=None,
+                        help=f"one of {', '.join(ERROR_PATTERNS)} (default: all)")
+    parser.add_argument('--root', default=None,
+                        help="project path stripped from frame locations (default: cwd)")
+    parser.add_argument('--output', default=None, help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.language and args.language not in ERROR_PATTERNS:
+        print(f"Unknown language: {args.language}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        summary = analyze_file(args.log_file, args.language, args.root)
+    except OSError as e:
+        print(f"Error: could not read {args.log_file}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Zero-copy file helpers for large AI responses and test logs.
+
+A file is mapped read-only once and handed around as a bytes-like buffer;
+regexes from fix_parsing.BYTES_PATTERNS run directly over the mapping and
+atomic_writer writes spans of it out through a memoryview, so nothing is
+decoded or copied into intermediate `str` objects.
+"""
+
+import mmap
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def map_file(path):
+    """Map `path` read-only and yield the buffer (b'' for empty files)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses zero-length mappings
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def preview(buffer, size=500):
+    """Decode only the first `size` bytes of a buffer for display."""
+    return bytes(buffer[:size]).decode('utf-8', errors='replace')
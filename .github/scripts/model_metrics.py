@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Telemetry of model calls: token usage, latency and throughput.
+
+Usage:
+  model_metrics.py report [--metrics FILE] [--days N] [--markdown]
+
+call_github_models.py and call_ai.py append one JSON line per model call
+to a metrics file kept outside the checkout (MODEL_METRICS_PATH, default
+~/.cache/auto-fix/model-metrics.jsonl), so it accumulates across runs:
+
+  {"time": ..., "source": "call_github_models.py", "model": "openai/gpt-4o",
+   "stream": true, "status": 200, "attempts": 1, "request_bytes": 18234,
+   "ttfb_s": 0.84, "first_token_s": 0.91, "latency_s": 12.3,
+   "prompt_tokens": 4410, "completion_tokens": 812, "finish_reason": "stop"}
+
+`ttfb_s` is the time from sending the (last) request to its response
+headers, `first_token_s` the time from the start of the call to the first
+streamed token, and `latency_s` the whole call, retries included. Token
+counts are the server's `usage` block; streamed calls ask for it with
+`stream_options.include_usage`. A failed call has an `error` field.
+
+`report` prints, per model, the number of calls and errors, p50/p95
+latency and time to first byte, and the p50 output rate (completion
+tokens per second of latency).
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'auto-fix', 'model-metrics.jsonl')
+
+
+def metrics_path():
+    return os.environ.get('MODEL_METRICS_PATH') or DEFAULT_METRICS_PATH
+
+
+class CallMetrics:
+    """Measurements of one model call; record() appends them to the metrics file."""
+
+    def __init__(self, model, stream=False, source=None):
+        self.start = time.perf_counter()
+        self.entry = {
+            'time': round(time.time(), 3),
+            'source': source or os.path.basename(sys.argv[0]) or 'python',
+            'model': model,
+            'stream': stream,
+            'status': None,
+            'attempts': 0,
+            'request_bytes': 0,
+            'ttfb_s': None,
+            'first_token_s': None,
+            'latency_s': None,
+            'prompt_tokens': None,
+            'completion_tokens': None,
+            'finish_reason': None,
+        }
+
+    def response(self, response, stats):
+        """Note the HTTP response of the last attempt and the retry stats."""
+        self.entry['status'] = response.status
+        self.entry['attempts'] = stats.attempts
+        self.entry['request_bytes'] = getattr(response, 'request_bytes', 0)
+        ttfb = getattr(response, 'ttfb', None)
+        self.entry['ttfb_s'] = round(ttfb, 4) if ttfb is not None else None
+
+    def first_token(self):
+        if self.entry['first_token_s'] is None:
+            self.entry['first_token_s'] = round(time.perf_counter() - self.start, 4)
+
+    def finish(self, usage=None, finish_reason=None, response_model=None):
+        """Note the server's usage block, finish reason and reported model."""
+        usage = usage or {}
+        self.entry['prompt_tokens'] = usage.get('prompt_tokens')
+        self.entry['completion_tokens'] = usage.get('completion_tokens')
+        self.entry['finish_reason'] = finish_reason
+        if response_model and response_model != self.entry['model']:
+            self.entry['response_model'] = response_model
+
+    def fail(self, error, stats=None):
+        self.entry['error'] = str(error)[:200]
+        if stats is not None:
+            self.entry['attempts'] = stats.attempts
+
+    def record(self, path=None):
+        """Append the entry; a metrics file that cannot be written is only reported."""
+        self.entry['latency_s'] = round(time.perf_counter() - self.start, 4)
+        path = path or metrics_path()
+        line = json.dumps(self.entry, separators=(',', ':')) + '\n'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # One O_APPEND write per line keeps concurrent callers from interleaving
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Warning: could not record model metrics in {path}: {e}", file=sys.stderr)
+
+
+def read_metrics(path, since=None):
+    """Entries of a metrics file, skipping torn or malformed lines."""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and (since is None or entry.get('time', 0) >= since):
+                entries.append(entry)
+    return entries
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values`, or None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(max(math.ceil(fraction * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def aggregate(entries):
+    """[(model, row dict)] per model, most calls first."""
+    by_model = {}
+    for entry in entries:
+        by_model.setdefault(entry.get('model') or 'unknown', []).append(entry)
+    rows = []
+    for model, calls in by_model.items():
+        ok = [c for c in calls if 'error' not in c and 200 <= (c.get('status') or 0) < 300]
+        latencies = [c['latency_s'] for c in ok if c.get('latency_s') is not None]
+        ttfbs = [c['ttfb_s'] for c in ok if c.get('ttfb_s') is not None]
+        rates = [c['completion_tokens'] / c['latency_s'] for c in ok
+                 if c.get('completion_tokens') and c.get('latency_s')]
+        prompt_tokens = [c['prompt_tokens'] for c in ok if c.get('prompt_tokens') is not None]
+        completion_tokens = [c['completion_tokens'] for c in ok if c.get('completion_tokens') is not None]
+        rows.append((model, {
+            'calls': len(calls),
+            'errors': len(calls) - len(ok),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'ttfb_p50': percentile(ttfbs, 0.5),
+            'ttfb_p95': percentile(ttfbs, 0.95),
+            'tokens_per_s_p50': percentile(rates, 0.5),
+            'prompt_tokens': sum(prompt_tokens),
+            'completion_tokens': sum(completion_tokens),
+            'truncated': sum(1 for c in ok if c.get('finish_reason') == 'length'),
+        }))
+    return sorted(rows, key=lambda row: -row[1]['calls'])
+
+
+REPORT_COLUMNS = (
+    ('calls', 'calls', '{}'),
+    ('errors', 'errors', '{}'),
+    ('latency_p50', 'p50 s', '{:.2f}'),
+    ('latency_p95', 'p95 s', '{:.2f}'),
+    ('ttfb_p50', 'ttfb p50', '{:.2f}'),
+    ('ttfb_p95', 'ttfb p95', '{:.2f}'),
+    ('tokens_per_s_p50', 'tok/s', '{:.1f}'),
+    ('prompt_tokens', 'prompt tok', '{}'),
+    ('completion_tokens', 'output tok', '{}'),
+    ('truncated', 'truncated', '{}'),
+)
+
+
+def format_report(rows, markdown=False):
+    header = ['model'] + [title for _, title, _ in REPORT_COLUMNS]
+    body = [[model] + ['-' if row[key] is None else fmt.format(row[key]) for key, _, fmt in REPORT_COLUMNS]
+            for model, row in rows]
+    if markdown:
+        lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+        lines += ['| ' + ' | '.join(values) + ' |' for values in body]
+        return '\n'.join(lines)
+    width = max([len(header[0])] + [len(values[0]) for values in body])
+    lines = [f"{header[0]:<{width}} " + ' '.join(f"{h:>10}" for h in header[1:])]
+    lines += [f"{values[0]:<{width}} " + ' '.join(f"{v:>10}" for v in values[1:]) for values in body]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report model call latency and token throughput.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report', help="p50/p95 latency and tokens/s per model")
+    report.add_argument('--metrics', default=None,
+                        help=f"metrics file (default: $MODEL_METRICS_PATH or {DEFAULT_METRICS_PATH})")
+    report.add_argument('--days', type=float, default=None, help="only calls of the last N days")
+    report.add_argument('--markdown', action='store_true', help="print a Markdown table")
+    args = parser.parse_args()
+
+    path = args.metrics or metrics_path()
+    since = time.time() - args.days * 86400 if args.days else None
+    try:
+        entries = read_metrics(path, since)
+    except OSError as e:
+        print(f"Error: could not read {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not entries:
+        print("No model calls recorded")
+        return
+    print(format_report(aggregate(entries), args.markdown))
+
+
+if __name__ == '__main__':
+    main()
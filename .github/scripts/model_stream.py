@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Reader for streamed chat completions (`"stream": true`).
+
+The OpenAI-compatible endpoints answer a streaming request with
+server-sent events, one JSON chunk per `data:` line and a final
+`data: [DONE]`. CompletionStream turns those into content deltas, so the
+caller can write tokens to disk (and parse FIX blocks) while the model is
+still generating.
+"""
+
+import json
+
+
+class StreamError(Exception):
+    """The server reported an error in the middle of a stream."""
+
+
+def iter_sse_data(lines):
+    """Yield the data of each server-sent event from raw body lines."""
+    data = []
+    for raw in lines:
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        line = line.rstrip('\r\n')
+        if not line:
+            # A blank line ends the event
+            if data:
+                yield '\n'.join(data)
+                data = []
+            continue
+        if line.startswith(':'):
+            continue  # comment / keep-alive
+        field, _, value = line.partition(':')
+        if field == 'data':
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield '\n'.join(data)
+
+
+class CompletionStream:
+    """Iterate content deltas of a streamed chat completion.
+
+    After iteration `text` holds the whole message and `finish_reason`,
+    `model` and `usage` whatever the server reported.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.parts = []
+        self.finish_reason = None
+        self.model = None
+        self.usage = None
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+    def __iter__(self):
+        done = False
+        for data in iter_sse_data(self.lines):
+            # Read on to the end of the body after [DONE], so the
+            # connection can be reused
+            if done or data.strip() == '[DONE]':
+                done = True
+                continue
+            chunk = json.loads(data)
+            if 'error' in chunk:
+                error = chunk['error']
+                message = error.get('message', error) if isinstance(error, dict) else error
+                raise StreamError(message)
+            self.model = chunk.get('model') or self.model
+            if chunk.get('usage'):
+                self.usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                if choice.get('finish_reason'):
+                    self.finish_reason = choice['finish_reason']
+                content = (choice.get('delta') or {}).get('content')
+                if content:
+                    self.parts.append(content)
+                    yield content
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Patch engine for FIX blocks that carry edits instead of whole files.
+
+Two formats are understood inside a FIX block body:
+
+  Unified diff hunks (file headers are optional):
+
+    @@ -12,3 +12,3 @@
+     context
+    -old line
+    +new line
+
+  Hunk headers without line numbers (`@@ @@`, `@@ def name @@`) are
+  accepted too; such hunks are located like SEARCH/REPLACE blocks.
+
+  SEARCH/REPLACE blocks:
+
+    <<<<<<< SEARCH
+    exact existing lines
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+
+Both are turned into hunks of (old lines, new lines) and applied to a file
+in one pass. Each hunk is located exactly first (at its stated line,
+allowing an offset, for diffs; after the previous hunk for SEARCH/REPLACE)
+and then, if that fails, with whitespace-insensitive matching. A hunk that
+cannot be located raises PatchError and nothing is applied.
+"""
+
+import re
+
+HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+BARE_HUNK_HEADER_RE = re.compile(r'^@@(?:[ \t].*)?@@')
+SEARCH_RE = re.compile(r'^<{5,9} ?SEARCH\s*$')
+DIVIDER_RE = re.compile(r'^={5,9}\s*$')
+REPLACE_RE = re.compile(r'^>{5,9} ?REPLACE\s*$')
+# Cheap test used on every FIX body to tell patches from whole files
+PATCH_MARKER_RE = re.compile(r'^(?:@@(?:[ \t].*)?@@|<{5,9} ?SEARCH\s*$)', re.MULTILINE)
+PATCH_MARKER_BYTES_RE = re.compile(PATCH_MARKER_RE.pattern.encode(), re.MULTILINE)
+# Leftovers of a diff that must never be written out as file content
+DIFF_MARKER_RE = re.compile(r'^(?:@@[ \t]|@@$|--- \S.*\n\+\+\+ \S|>{5,9} ?REPLACE\s*$)', re.MULTILINE)
+DIFF_MARKER_BYTES_RE = re.compile(DIFF_MARKER_RE.pattern.encode(), re.MULTILINE)
+
+# How far (in lines) a diff hunk may have drifted from its stated position
+MAX_OFFSET = 1000
+
+
+class PatchError(Exception):
+    """A patch could not be parsed or one of its hunks could not be located."""
+
+
+class Hunk:
+    __slots__ = ('old', 'new', 'line')
+
+    def __init__(self, old, new, line=None):
+        self.old = old
+        self.new = new
+        self.line = line  # 0-based expected position, None when unknown
+
+
+class PatchResult:
+    __slots__ = ('content', 'hunks', 'offset', 'fuzzy')
+
+    def __init__(self, content, hunks, offset, fuzzy):
+        self.content = content
+        self.hunks = hunks
+        self.offset = offset  # hunks found away from their stated line
+        self.fuzzy = fuzzy  # hunks only found ignoring whitespace
+
+
+def is_patch(buffer, start=0, end=None):
+    """True when buffer[start:end] (str, bytes or mmap) holds a patch."""
+    end = len(buffer) if end is None else end
+    pattern = PATCH_MARKER_RE if isinstance(buffer, str) else PATCH_MARKER_BYTES_RE
+    return pattern.search(buffer, start, end) is not None
+
+
+def has_diff_markers(buffer, start=0, end=None):
+    """True when buffer[start:end] has hunk headers or diff file headers.
+
+    Used to refuse whole-file writes of bodies that are really (malformed)
+    patches.
+    """
+    end = len(buffer) if end is None else end
+    pattern = DIFF_MARKER_RE if isinstance(buffer, str) else DIFF_MARKER_BYTES_RE
+    return pattern.search(buffer, start, end) is not None
+
+
+def parse_patch(text):
+    """Parse unified diff hunks and/or SEARCH/REPLACE blocks into hunks."""
+    lines = text.split('\n')
+    hunks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            i = _parse_diff_hunk(lines, i + 1, header, hunks)
+        elif BARE_HUNK_HEADER_RE.match(line):
+            i = _parse_bare_hunk(lines, i + 1, hunks)
+        elif SEARCH_RE.match(line):
+            i = _parse_search_replace(lines, i + 1, hunks)
+        else:
+            # Diff file headers, prose, anything else between hunks
+            i += 1
+    if not hunks:
+        raise PatchError("no hunks found")
+    return hunks
+
+
+def _parse_diff_hunk(lines, i, header, hunks):
+    old_count = int(header.group(2)) if header.group(2) is not None else 1
+    new_count = int(header.group(4)) if header.group(4) is not None else 1
+    old, new = [], []
+    while i < len(lines) and (len(old) < old_count or len(new) < new_count):
+        line = lines[i]
+        if BARE_HUNK_HEADER_RE.match(line):
+            break
+        tag, text = line[:1], line[1:]
+        if tag == '-':
+            old.append(text)
+        elif tag == '+':
+            new.append(text)
+        elif tag == '\\':
+            pass  # "\ No newline at end of file"
+        elif tag in (' ', ''):
+            # An empty line is a blank context line whose space was trimmed
+            old.append(text)
+            new.append(text)
+        else:
+            break
+        i += 1
+    # Trailing blank context trimmed away with the block's whitespace
+    while len(old) < old_count and len(new) < new_count:
+        old.append('')
+        new.append('')
+    start = int(header.group(1))
+    hunks.append(Hunk(old, new, max(start - 1, 0) if old_count else start))
+    return i
+
+
+def _parse_bare_hunk(lines, i, hunks):
+    # No counts to go by: the hunk runs to the next header or non-diff line
+    old, new = [], []
+    context = 0  # trailing blank context lines, dropped at the end
+    while i < len(lines):
+        line = lines[i]
+        if BARE_HUNK_HEADER_RE.match(line):
+            break
+        tag, text = line[:1], line[1:]
+        if tag == '-':
+            old.append(text)
+        elif tag == '+':
+            new.append(text)
+        elif tag in (' ', ''):
+            old.append(text)
+            new.append(text)
+        elif tag != '\\':
+            break
+        context = context + 1 if tag in (' ', '') and not text.strip() else 0
+        i += 1
+    if context:
+        del old[-context:], new[-context:]
+    if old or new:
+        hunks.append(Hunk(old, new))
+    return i
+
+
+def _parse_search_replace(lines, i, hunks):
+    old, new = [], []
+    target = old
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if target is old and DIVIDER_RE.match(line):
+            target = new
+        elif target is new and REPLACE_RE.match(line):
+            hunks.append(Hunk(old, new))
+            return i
+        else:
+            target.append(line)
+    raise PatchError("unterminated SEARCH/REPLACE block")
+
+
+def _normalize(line):
+    return ' '.join(line.split())
+
+
+class _LineIndex:
+    """Positions of each distinct line, built once per file and mode."""
+
+    def __init__(self, lines, key=None):
+        self.key = key
+        self.positions = {}
+        for i, line in enumerate(lines):
+            self.positions.setdefault(key(line) if key else line, []).append(i)
+
+    def candidates(self, first):
+        return self.positions.get(self.key(first) if self.key else first, ())
+
+
+def _matches(lines, at, old, key):
+    if at < 0 or at + len(old) > len(lines):
+        return False
+    if key is None:
+        return lines[at:at + len(old)] == old
+    return all(key(a) == key(b) for a, b in zip(lines[at:at + len(old)], old))
+
+
+def _locate(lines, hunk, cursor, expected, index, key):
+    """First matching position >= cursor, nearest to `expected` if given."""
+    anchor = hunk.old[0]
+    found = [at for at in index.candidates(anchor)
+             if at >= cursor and _matches(lines, at, hunk.old, key)]
+    if not found:
+        return None
+    if expected is None:
+        return found[0]
+    best = min(found, key=lambda at: abs(at - expected))
+    return best if abs(best - expected) <= MAX_OFFSET else None
+
+
+def apply_patch(content, patch):
+    """Apply `patch` (text or a list of Hunk) to `content` in one pass.
+
+    Returns a PatchResult; raises PatchError if any hunk cannot be placed.
+    """
+    hunks = parse_patch(patch) if isinstance(patch, str) else patch
+    lines = content.split('\n')
+    exact = _LineIndex(lines)
+    loose = None
+
+    placed = []  # (start, end, new lines)
+    cursor = 0
+    drift = 0  # how far the previous hunk was from its stated line
+    offset = fuzzy = 0
+    for number, hunk in enumerate(hunks, 1):
+        expected = None if hunk.line is None else hunk.line + drift
+        if not hunk.old:
+            # Pure insertion: stated line for diffs, end of file otherwise
+            at = len(lines) if expected is None else min(max(expected, cursor), len(lines))
+            if at == len(lines) and lines and lines[-1] == '':
+                at -= 1  # keep the file's trailing newline last
+        else:
+            at = _locate(lines, hunk, cursor, expected, exact, None)
+            if at is None:
+                if loose is None:
+                    loose = _LineIndex(lines, _normalize)
+                at = _locate(lines, hunk, cursor, expected, loose, _normalize)
+                if at is None:
+                    preview = hunk.old[0].strip()[:60]
+                    raise PatchError(f"hunk {number} not found (starting {preview!r})")
+                fuzzy += 1
+            if expected is not None and at != expected:
+                offset += 1
+        placed.append((at, at + len(hunk.old), hunk.new))
+        cursor = at + len(hunk.old)
+        if hunk.line is not None:
+            drift = at - hunk.line
+
+    out = []
+    previous = 0
+    for start, end, new in placed:
+        out.extend(lines[previous:start])
+        out.extend(new)
+        previous = end
+    out.extend(lines[previous:])
+    return PatchResult('\n'.join(out), len(placed), offset, fuzzy)
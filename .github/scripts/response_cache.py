@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of model responses.
+
+Re-running a workflow (or an iteration that ends up with the same prompt)
+would otherwise pay for an identical model call again. Responses are
+stored one JSON file per request under a blake2b key of everything that
+determines the answer: model, sampling parameters and the messages.
+
+Entries expire after a TTL, and the directory is kept under a size limit
+by evicting the least recently used entries (a hit refreshes the entry's
+mtime). The directory lives outside the checkout so `git add -A` never
+picks it up, and can be carried between runs with actions/cache.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'auto-fix', 'model-responses')
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(payload):
+    """Key of a chat completion request: model, sampling params and messages."""
+    relevant = {
+        'model': payload.get('model'),
+        'temperature': payload.get('temperature'),
+        'top_p': payload.get('top_p'),
+        'max_tokens': payload.get('max_tokens'),
+        'messages': [(m.get('role'), m.get('content')) for m in payload.get('messages', [])],
+    }
+    encoded = json.dumps(relevant, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Directory of {key}.json entries with TTL and LRU size bound."""
+
+    def __init__(self, directory=None, ttl=None, max_bytes=None, clock=time.time):
+        self.directory = directory or os.environ.get("MODEL_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.ttl = ttl if ttl is not None else float(os.environ.get("MODEL_CACHE_TTL", DEFAULT_TTL))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get("MODEL_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # Counters are shared by batch_models.py worker threads
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Cached response text for `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        if self.clock() - entry.get('created', 0) > self.ttl:
+            self._remove(path)
+            self._count('misses')
+            return None
+        try:
+            # mtime is the last-use time the eviction goes by
+            now = self.clock()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self._count('hits')
+        return entry.get('response')
+
+    def put(self, key, response, model=None):
+        """Store a response atomically, then trim the cache to its size."""
+        entry = {'created': self.clock(), 'model': model, 'response': response}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp, self._path(key))
+        except OSError:
+            # A cache that cannot be written is just a cache miss next time
+            return
+        self.evict()
+
+    def discard(self, key):
+        """Drop the entry for `key`, e.g. a response whose fixes did not work."""
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            return False
+        self._count('evicted')
+        return True
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return
+        self._count('evicted')
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over the limit."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        now = self.clock()
+        entries = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = 0
+        live = []
+        for mtime, size, path in entries:
+            # An entry unused for longer than the TTL is expired as well
+            if now - mtime > self.ttl:
+                self._remove(path)
+            else:
+                live.append((mtime, size, path))
+                total += size
+
+        live.sort()
+        for mtime, size, path in live:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"{self.hits} hit(s), {self.misses} miss(es) ({rate:.0f}% hit rate), "
+                f"{self.evicted} evicted")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Retry layer for model API calls.
+
+Throttling (429) and transient server errors (5xx) are retried instead of
+failing the whole workflow iteration. The wait before each retry honours,
+in order: a `Retry-After` header, the `x-ratelimit-reset*` headers when the
+matching `x-ratelimit-remaining*` counter is exhausted, and otherwise a
+jittered exponential backoff. All retries share one total deadline.
+"""
+
+import email.utils
+import http.client
+import os
+import random
+import re
+import time
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# OpenAI-style reset durations: "1s", "6m0s", "250ms", "1h2m3.5s"
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class RetryPolicy:
+    """How often and how long to retry; defaults can be set from the env."""
+
+    def __init__(self, max_attempts=None, base_delay=1.0, max_delay=60.0, deadline=None):
+        self.max_attempts = max_attempts or int(os.environ.get("MODEL_MAX_ATTEMPTS", "5"))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline or float(os.environ.get("MODEL_RETRY_DEADLINE", "300"))
+
+
+class RetryStats:
+    __slots__ = ('attempts', 'waited', 'statuses')
+
+    def __init__(self):
+        self.attempts = 0
+        self.waited = 0.0
+        self.statuses = []
+
+    def summary(self):
+        history = ", ".join(str(s) for s in self.statuses)
+        return f"{self.attempts} attempt(s), waited {self.waited:.1f}s ({history})"
+
+
+def parse_duration(value):
+    """Seconds in a header value: "12", "1.5", "6m0s", "250ms" or an HTTP date."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if parts and ''.join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def server_delay(headers):
+    """Delay the server asked for, or None if it gave no hint."""
+    if headers is None:
+        return None
+    retry_after = parse_duration(headers.get("Retry-After"))
+    if retry_after is not None:
+        return retry_after
+
+    waits = []
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        if remaining is not None and remaining.strip() == "0":
+            wait = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if wait is not None:
+                waits.append(wait)
+    if headers.get("x-ratelimit-remaining") == "0":
+        reset = parse_duration(headers.get("x-ratelimit-reset"))
+        if reset is not None:
+            # Either seconds to wait or an epoch timestamp
+            waits.append(reset - time.time() if reset > 1e9 else reset)
+    return max(waits) if waits else None
+
+
+def backoff_delay(attempt, policy, rng=random):
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    cap = min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1))
+    return rng.uniform(0, cap)
+
+
+def call_with_retry(send, policy=None, sleep=time.sleep, clock=time.monotonic, rng=random):
+    """Call `send()` until it returns a non-retryable response.
+
+    `send` returns an object with `.status` and `.headers` (e.g.
+    http_client.HttpResponse) or raises OSError/HTTPException on network
+    failure. Returns (response, RetryStats); once attempts or the deadline
+    run out the last response is returned, or the last error re-raised
+    with the stats attached as `retry_stats`.
+    """
+    policy = policy or RetryPolicy()
+    stats = RetryStats()
+    started = clock()
+    while True:
+        stats.attempts += 1
+        error = response = None
+        try:
+            response = send()
+        except (OSError, http.client.HTTPException) as e:
+            error = e
+            stats.statuses.append(type(e).__name__)
+        else:
+            stats.statuses.append(response.status)
+            if response.status not in RETRY_STATUSES:
+                return response, stats
+
+        hinted = server_delay(response.headers) if response is not None else None
+        delay = backoff_delay(stats.attempts, policy, rng)
+        if hinted is not None:
+            # Never retry before the server allows it; jitter on top keeps
+            # parallel callers from waking up together
+            delay = hinted + rng.uniform(0, policy.base_delay)
+
+        out_of_time = clock() - started + delay > policy.deadline
+        if stats.attempts >= policy.max_attempts or out_of_time:
+            if error is not None:
+                error.retry_stats = stats
+                raise error
+            return response, stats
+
+        sleep(delay)
+        stats.waited += delay
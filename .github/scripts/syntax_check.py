@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Syntax checks of files the fixers wrote.
+
+Usage: syntax_check.py [files...] [--jobs N] [--fail-fast] [--report FILE]
+
+Which checker a file gets follows its language in
+language_config.LANGUAGE_CONFIG (by extension): Ruby files go through
+`ruby -c`, Python files through `py_compile`, JavaScript through
+`node --check`. JSON, and YAML when PyYAML is installed, are parsed
+in-process. Files with no known checker, or whose interpreter is not
+installed, are skipped.
+
+SyntaxChecker starts one check per file as soon as it lands, so checking
+overlaps with whatever the caller does next (e.g. reading the rest of a
+streamed model response). The command line is the gate between applying
+fixes and committing them: with no files given it checks every file
+changed since HEAD, on a pool of workers that each drive one checker
+process at a time, prints each file's result and time, and exits 1 when
+any file is broken. With --fail-fast the first broken file stops the
+rest.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from language_config import REGISTRY
+from tracing import span
+
+try:
+    import yaml
+except ImportError:  # YAML files are then skipped
+    yaml = None
+
+# Checker per LANGUAGE_CONFIG language
+LANGUAGE_COMMANDS = {
+    'ruby': ['ruby', '-c'],
+    'python': [sys.executable, '-m', 'py_compile'],
+    'javascript': ['node', '--check'],
+}
+# Files LANGUAGE_CONFIG's extensions do not cover
+EXTRA_EXTENSIONS = {'.rake': 'ruby', '.gemspec': 'ruby', '.ru': 'ruby', '.cjs': 'javascript'}
+EXTRA_FILENAMES = {'Gemfile': 'ruby', 'Rakefile': 'ruby'}
+# JSX, which node cannot check
+UNCHECKED_EXTENSIONS = {'.jsx'}
+SKIP_DIRS = ('vendor/', 'node_modules/', 'tmp/', 'log/')
+CHECK_TIMEOUT = 60
+
+# Lines that are a single ERB tag, and ERB tags inside a line
+_ERB_LINE_RE = re.compile(r'^[ \t]*<%(?!=).*?%>[ \t]*$', re.MULTILINE)
+_ERB_TAG_RE = re.compile(r'<%=?.*?%>', re.DOTALL)
+
+
+def _syntax_commands():
+    commands = {}
+    for language, command in LANGUAGE_COMMANDS.items():
+        record = REGISTRY.get(language)
+        for ext in record.extensions if record else ():
+            if ext not in UNCHECKED_EXTENSIONS:
+                commands[ext] = command
+    for name, language in {**EXTRA_EXTENSIONS, **EXTRA_FILENAMES}.items():
+        commands[name] = LANGUAGE_COMMANDS[language]
+    return commands
+
+
+SYNTAX_COMMANDS = _syntax_commands()
+
+
+def syntax_command(path):
+    """Command that checks `path`, or None when there is none."""
+    command = (SYNTAX_COMMANDS.get(os.path.splitext(path)[1].lower())
+               or SYNTAX_COMMANDS.get(os.path.basename(path)))
+    return command + [path] if command else None
+
+
+def parse_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        json.load(f)
+
+
+def parse_yaml(path):
+    # Rails YAML is run through ERB first: drop the tags before parsing.
+    # Composing (not constructing) accepts application-specific tags.
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    text = _ERB_TAG_RE.sub('erb', _ERB_LINE_RE.sub('', text))
+    for _ in yaml.compose_all(text):
+        pass
+
+
+IN_PROCESS_PARSERS = {'.json': parse_json}
+if yaml is not None:
+    IN_PROCESS_PARSERS.update({'.yml': parse_yaml, '.yaml': parse_yaml})
+PARSE_ERRORS = (ValueError,) + ((yaml.YAMLError,) if yaml is not None else ())
+
+
+def can_check(path):
+    return (os.path.splitext(path)[1].lower() in IN_PROCESS_PARSERS
+            or syntax_command(path) is not None)
+
+
+class SyntaxChecker:
+    """Run syntax checks concurrently and collect their results."""
+
+    def __init__(self):
+        self.running = []
+
+    def submit(self, path):
+        """Start checking `path`; returns False when it cannot be checked."""
+        command = syntax_command(path)
+        if command is None:
+            return False
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True)
+        except OSError:
+            return False
+        self.running.append((path, process))
+        return True
+
+    def results(self):
+        """Wait for every check; returns [(path, ok, error output)]."""
+        done = []
+        for path, process in self.running:
+            _, stderr = process.communicate()
+            done.append((path, process.returncode == 0, stderr.strip()))
+        self.running = []
+        return done
+
+
+class SyntaxGate:
+    """Check a set of files on a pool of workers, optionally stopping at the first error."""
+
+    def __init__(self, jobs=None, fail_fast=False, timeout=CHECK_TIMEOUT):
+        self.jobs = jobs or os.cpu_count() or 2
+        self.fail_fast = fail_fast
+        self.timeout = timeout
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.processes = set()
+
+    def check(self, path):
+        """(path, ok, error output, seconds); ok is None when the file was not checked."""
+        start = time.perf_counter()
+        if self.stopped.is_set():
+            return path, None, 'not checked (stopped at an earlier error)', 0.0
+        parser = IN_PROCESS_PARSERS.get(os.path.splitext(path)[1].lower())
+        if parser is not None:
+            try:
+                parser(path)
+                ok, error = True, ''
+            except PARSE_ERRORS as e:
+                ok, error = False, str(e)
+            except OSError as e:
+                ok, error = None, str(e)
+            return path, ok, error, time.perf_counter() - start
+
+        try:
+            process = subprocess.Popen(syntax_command(path), stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            return path, None, f"checker not available: {e}", time.perf_counter() - start
+        with self.lock:
+            self.processes.add(process)
+        try:
+            _, stderr = process.communicate(timeout=self.timeout)
+            ok = None if self.stopped.is_set() and process.returncode < 0 else process.returncode == 0
+            error = stderr.strip()
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            ok, error = False, f"syntax check timed out after {self.timeout}s"
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        return path, ok, error, time.perf_counter() - start
+
+    def stop(self):
+        """Skip pending checks and end the running ones."""
+        self.stopped.set()
+        with self.lock:
+            for process in self.processes:
+                process.terminate()
+
+    def run(self, paths, on_result=None):
+        """Check `paths`; returns results in completion order."""
+        results = []
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(self.check, path) for path in paths]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+                if result[1] is False and self.fail_fast and not self.stopped.is_set():
+                    self.stop()
+        return results
+
+
+def changed_files():
+    """Files changed since HEAD, staged or not, plus untracked ones."""
+    paths = []
+    for command in (['git', 'diff', '--name-only', '--diff-filter=ACMR', 'HEAD'],
+                    ['git', 'ls-files', '--others', '--exclude-standard']):
+        result = subprocess.run(command, capture_output=True, text=True)
+        paths.extend(line for line in result.stdout.splitlines() if line)
+    return [path for path in dict.fromkeys(paths)
+            if not path.startswith(SKIP_DIRS) and os.path.isfile(path)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Syntax-check changed files before committing them.")
+    parser.add_argument('files', nargs='*', help="files to check (default: files changed since HEAD)")
+    parser.add_argument('--jobs', type=int, default=None, help="parallel checks (default: CPU count)")
+    parser.add_argument('--fail-fast', action='store_true', help="stop at the first broken file")
+    parser.add_argument('--report', default=None, help="also write the errors found to this file")
+    args = parser.parse_args()
+
+    paths = [path for path in (args.files or changed_files()) if can_check(path)]
+    if not paths:
+        print("No changed files to syntax-check")
+        return
+
+    gate = SyntaxGate(args.jobs, args.fail_fast)
+
+    def show(result):
+        path, ok, _, seconds = result
+        status = {True: 'ok', False: 'FAIL', None: 'skip'}[ok]
+        print(f"{status:<5} {seconds:>7.3f}s  {path}", flush=True)
+
+    start = time.perf_counter()
+    with span('syntax.gate', files=len(paths), jobs=gate.jobs):
+        results = gate.run(paths, show)
+    elapsed = time.perf_counter() - start
+
+    broken = [(path, error) for path, ok, error, _ in results if ok is False]
+    checked = sum(1 for _, ok, _, _ in results if ok is not None)
+    print(f"\nChecked {checked} of {len(paths)} file(s) in {elapsed:.2f}s with {gate.jobs} worker(s): "
+          f"{len(broken)} syntax error(s)"
+          + (f", {sum(seconds for *_, seconds in results):.2f}s of checks" if results else ""))
+    report = []
+    for path, error in broken:
+        report.append(f"Syntax error in {path}:")
+        report.extend(f"  {line}" for line in error.splitlines())
+        report.append('')
+    if report:
+        print('\n' + '\n'.join(report))
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write('\n'.join(report))
+    if broken:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+Unit tests for the auto-fix helper scripts.
+
+Run from .github/scripts: python3 -m unittest discover tests
+(or python3 -m pytest tests). Network tests talk to
+benchmarks.stub_server on 127.0.0.1 only.
+"""
+
+import os
+import sys
+
+# The scripts import each other as top-level modules
+SCRIPTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS not in sys.path:
+    sys.path.insert(0, SCRIPTS)
@@ -0,0 +1,93 @@
+"""Commit and rollback of atomic_writer.WriteTransaction."""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+import atomic_writer
+from atomic_writer import WriteError, WriteTransaction
+
+
+class WriteTransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="atomic-writer-")
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write(self, name, text):
+        with open(self.path(name), "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def listing(self):
+        return sorted(os.listdir(self.dir))
+
+    def test_writes_every_entry(self):
+        self.write("old.rb", "old\n")
+        os.chmod(self.path("old.rb"), 0o750)
+        response = b"### FIX: new.rb\n```\nbody\n```\n"
+        start = response.index(b"body")
+        transaction = WriteTransaction(workers=2)
+        transaction.add(self.path("old.rb"), "new\n")
+        transaction.add(self.path("sub/new.rb"), response, start, start + 4, b"\n")
+        written = transaction.commit()
+
+        self.assertEqual([(path, size) for path, _, size in written],
+                         [(self.path("old.rb"), 4), (self.path("sub/new.rb"), 5)])
+        self.assertEqual(self.read("old.rb"), "new\n")
+        self.assertEqual(self.read("sub/new.rb"), "body\n")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path("old.rb")).st_mode), 0o750)
+        self.assertEqual(self.listing(), ["old.rb", "sub"])
+
+    def test_empty_transaction(self):
+        self.assertEqual(WriteTransaction().commit(), [])
+
+    def test_failed_write_changes_nothing(self):
+        self.write("a.rb", "a\n")
+        self.write("blocker", "a file, not a directory\n")
+        transaction = WriteTransaction()
+        transaction.add(self.path("a.rb"), "changed\n")
+        transaction.add(self.path("blocker/b.rb"), "b\n")
+        with self.assertRaises(WriteError) as raised:
+            transaction.commit()
+
+        self.assertIn("blocker/b.rb", str(raised.exception))
+        self.assertEqual(self.read("a.rb"), "a\n")
+        self.assertEqual(self.listing(), ["a.rb", "blocker"])
+
+    def test_failed_rename_rolls_back_replaced_files(self):
+        self.write("a.rb", "a\n")
+        self.write("c.rb", "c\n")
+        transaction = WriteTransaction()
+        transaction.add(self.path("a.rb"), "changed a\n")
+        transaction.add(self.path("b.rb"), "new b\n")
+        transaction.add(self.path("c.rb"), "changed c\n")
+        replace = os.replace
+
+        def failing_replace(src, dst):
+            if dst == self.path("c.rb") and src.endswith(".tmp"):
+                raise OSError("disk full")
+            return replace(src, dst)
+
+        with mock.patch.object(atomic_writer.os, "replace", failing_replace):
+            with self.assertRaises(WriteError) as raised:
+                transaction.commit()
+
+        self.assertIn("disk full", str(raised.exception))
+        self.assertEqual(self.read("a.rb"), "a\n")
+        self.assertEqual(self.read("c.rb"), "c\n")
+        # b.rb did not exist before, so the rollback removes it again
+        self.assertEqual(self.listing(), ["a.rb", "c.rb"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""The FIX block state machine of fix_parsing, on str, bytes, mmap and chunks."""
+
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+from apply_fixes import parse_fixes
+from fix_parsing import BYTES_PATTERNS, FixScanner, FixStream, iter_fixes, patterns_for, scan_fixes
+from mmap_io import map_file
+
+RESPONSE = """\
+ANALYSIS: sqlite3 2.x needs a newer adapter.
+
+### FIX: app/models/user.rb
+```ruby
+class User < ApplicationRecord
+  # COMMIT_MESSAGE: not this one
+  # NO_FIX_NEEDED is only text in here
+
+end
+```
+
+FIX_FILE: Gemfile
+this line is not a fence, so the block is dropped
+
+### FIX: config/database.yml
+```yaml
+never closed
+### FIX: lib/tasks/db.rake
+```
+task :noop
+```
+
+### COMMIT_MESSAGE:
+
+fix: upgrade sqlite3
+"""
+
+EXPECTED = [
+    ("app/models/user.rb", "ruby",
+     "class User < ApplicationRecord\n  # COMMIT_MESSAGE: not this one\n"
+     "  # NO_FIX_NEEDED is only text in here\n\nend"),
+    ("lib/tasks/db.rake", "", "task :noop"),
+]
+
+
+def parsed(buffer):
+    """([(path, language, body as str)], scanner) for a str, bytes or mmap buffer."""
+    scanner = FixScanner(patterns_for(buffer))
+    fixes = []
+    for fix in scan_fixes(buffer, scanner):
+        body = fix.body(buffer)
+        fixes.append((fix.path, fix.language, body if isinstance(body, str) else body.decode()))
+    return fixes, scanner
+
+
+def streamed(text, size):
+    """([(path, language, body)], stream) of `text` fed in chunks of `size`."""
+    stream = FixStream()
+    done = []
+    for start in range(0, len(text), size):
+        done += stream.feed(text[start:start + size])
+    done += stream.close()
+    return [(fix.path, fix.language, body) for fix, body in done], stream
+
+
+class FixScannerTest(unittest.TestCase):
+    def test_blocks_commit_message_and_dropped_blocks(self):
+        fixes, scanner = parsed(RESPONSE)
+        self.assertEqual(fixes, EXPECTED)
+        self.assertEqual(scanner.commit_message, "fix: upgrade sqlite3")
+        self.assertFalse(scanner.no_fix_needed)
+
+    def test_inline_commit_message_is_taken_once(self):
+        _, scanner = parsed("COMMIT_MESSAGE: first\nCOMMIT_MESSAGE: second\n")
+        self.assertEqual(scanner.commit_message, "first")
+
+    def test_no_fix_needed_outside_blocks(self):
+        _, scanner = parsed("The tests fail for an unrelated reason.\nNO_FIX_NEEDED\n")
+        self.assertTrue(scanner.no_fix_needed)
+
+    def test_spans_point_into_the_buffer(self):
+        fix = next(scan_fixes(RESPONSE))
+        self.assertEqual(RESPONSE[fix.start:fix.end], EXPECTED[0][2])
+
+    def test_crlf_lines(self):
+        fixes, scanner = parsed(RESPONSE.replace("\n", "\r\n"))
+        self.assertEqual([(path, language) for path, language, _ in fixes],
+                         [(path, language) for path, language, _ in EXPECTED])
+        self.assertEqual(fixes[1][2], "task :noop")
+        self.assertEqual(scanner.commit_message, "fix: upgrade sqlite3")
+
+    def test_bytes_and_mmap_parse_like_str(self):
+        data = RESPONSE.encode()
+        fixes, scanner = parsed(data)
+        self.assertIs(scanner.patterns, BYTES_PATTERNS)
+        self.assertEqual(fixes, EXPECTED)
+        self.assertEqual(scanner.commit_message, "fix: upgrade sqlite3")
+
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.unlink, f.name)
+        with map_file(f.name) as mapped:
+            self.assertIsInstance(mapped, mmap.mmap)
+            fixes, scanner = parsed(mapped)
+        self.assertEqual(fixes, EXPECTED)
+        self.assertEqual(scanner.commit_message, "fix: upgrade sqlite3")
+
+    def test_empty_file_maps_to_empty_bytes(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            pass
+        self.addCleanup(os.unlink, f.name)
+        with map_file(f.name) as mapped:
+            self.assertEqual(parsed(mapped)[0], [])
+
+    def test_parse_fixes_returns_paths_and_bodies(self):
+        self.assertEqual(parse_fixes(RESPONSE), [(path, body) for path, _, body in EXPECTED])
+
+
+class FixStreamTest(unittest.TestCase):
+    def test_every_split_point(self):
+        for split in range(len(RESPONSE) + 1):
+            stream = FixStream()
+            done = stream.feed(RESPONSE[:split]) + stream.feed(RESPONSE[split:]) + stream.close()
+            self.assertEqual([(fix.path, fix.language, body) for fix, body in done], EXPECTED,
+                             f"split at {split}")
+            self.assertEqual(stream.commit_message, "fix: upgrade sqlite3")
+
+    def test_small_chunks(self):
+        for size in (1, 2, 3, 7, 64):
+            fixes, stream = streamed(RESPONSE, size)
+            self.assertEqual(fixes, EXPECTED, f"chunks of {size}")
+            self.assertEqual(stream.commit_message, "fix: upgrade sqlite3")
+
+    def test_spans_are_stream_offsets(self):
+        stream = FixStream()
+        done = []
+        for char in RESPONSE:
+            done += stream.feed(char)
+        for fix, body in done:
+            self.assertEqual(RESPONSE[fix.start:fix.end], body)
+
+    def test_blocks_are_returned_as_they_close(self):
+        stream = FixStream()
+        end = RESPONSE.index("```\n\nFIX_FILE") + 3
+        self.assertEqual(stream.feed(RESPONSE[:end]), [])
+        done = stream.feed("\n")
+        self.assertEqual([fix.path for fix, _ in done], ["app/models/user.rb"])
+
+    def test_close_drops_an_unterminated_block(self):
+        stream = FixStream()
+        self.assertEqual(stream.feed("### FIX: a.rb\n```ruby\nx = 1\n"), [])
+        self.assertEqual(stream.close(), [])
+
+    def test_close_scans_the_last_line(self):
+        fixes, stream = streamed("### FIX: a.rb\n```\nx\n```", 4)
+        self.assertEqual(fixes, [("a.rb", "", "x")])
+        _, stream = streamed("NO_FIX_NEEDED", 5)
+        self.assertTrue(stream.no_fix_needed)
+
+    def test_iter_fixes_reads_a_file_object(self):
+        self.assertEqual(list(iter_fixes(io.StringIO(RESPONSE))), [(path, body) for path, _, body in EXPECTED])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Connection reuse and reconnects of http_client.HttpClient."""
+
+import socket
+import unittest
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+from benchmarks.stub_server import StubHandler, StubServer
+from http_client import HttpClient
+
+
+class DroppingHandler(StubHandler):
+    """Answers with keep-alive, then closes the connection anyway."""
+
+    def do_POST(self):
+        super().do_POST()
+        self.close_connection = True
+
+
+def payload(text="hi"):
+    return {"model": "stub", "messages": [{"role": "user", "content": text}]}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.client = HttpClient(timeout=5, connect_timeout=5)
+        self.addCleanup(self.client.close)
+
+    def test_reuses_one_connection_across_calls(self):
+        with StubServer(reply="pong") as server:
+            for _ in range(3):
+                response = self.client.post_json(server.url, payload())
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.json()["choices"][0]["message"]["content"], "pong")
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(self.client.connections_opened, 1)
+        self.assertEqual(self.client.requests_sent, 3)
+
+    def test_error_responses_keep_the_connection(self):
+        with StubServer(reply="pong", failures=[(503, {})]) as server:
+            self.assertEqual(self.client.post_json(server.url, payload()).status, 503)
+            self.assertEqual(self.client.post_json(server.url, payload()).status, 200)
+        self.assertEqual(server.connections, 1)
+
+    def test_streamed_response_returns_its_connection(self):
+        with StubServer(reply="x" * 100, token_size=10) as server:
+            response = self.client.post_json(server.url, {**payload(), "stream": True}, stream=True)
+            lines = [line for line in response.iter_lines() if line.startswith(b"data: ")]
+            self.assertEqual(len(lines), 11)  # ten pieces and [DONE]
+            self.assertEqual(self.client.post_json(server.url, payload()).status, 200)
+        self.assertEqual(server.connections, 1)
+
+    def test_closed_stream_discards_its_connection(self):
+        with StubServer(reply="x" * 100, token_size=10) as server:
+            response = self.client.post_json(server.url, {**payload(), "stream": True}, stream=True)
+            next(response.iter_lines())
+            response.close()
+            self.assertEqual(self.client.post_json(server.url, payload()).status, 200)
+        self.assertEqual(server.connections, 2)
+
+    def test_reconnects_when_the_server_dropped_the_connection(self):
+        with StubServer(reply="pong", handler=DroppingHandler) as server:
+            first = self.client.post_json(server.url, payload())
+            second = self.client.post_json(server.url, payload())
+        self.assertEqual((first.status, second.status), (200, 200))
+        self.assertEqual(second.json()["choices"][0]["message"]["content"], "pong")
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(self.client.connections_opened, 2)
+        self.assertEqual(self.client.requests_sent, 2)
+
+    def test_reconnects_after_a_broken_socket(self):
+        with StubServer(reply="pong") as server:
+            self.client.post_json(server.url, payload())
+            (conn,), = self.client._idle.values()
+            conn.sock.shutdown(socket.SHUT_RDWR)
+            response = self.client.post_json(server.url, payload())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.client.connections_opened, 2)
+
+    def test_failure_on_a_new_connection_is_raised(self):
+        with self.assertRaises(OSError):
+            self.client.post_json(f"http://127.0.0.1:{free_port()}/chat/completions", payload())
+        self.assertEqual(self.client.requests_sent, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Unified diff, bare @@ and SEARCH/REPLACE hunks of patch_engine."""
+
+import unittest
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+from patch_engine import Hunk, PatchError, apply_patch, has_diff_markers, is_patch, parse_patch
+
+SOURCE = """\
+class User < ApplicationRecord
+  def name
+    first_name
+  end
+
+  def email
+    address
+  end
+end
+"""
+
+
+class ParsePatchTest(unittest.TestCase):
+    def test_unified_diff_hunk(self):
+        hunks = parse_patch("--- a/user.rb\n+++ b/user.rb\n@@ -2,3 +2,3 @@\n   def name\n"
+                            "-    first_name\n+    full_name\n   end\n")
+        self.assertEqual(len(hunks), 1)
+        self.assertEqual(hunks[0].old, ["  def name", "    first_name", "  end"])
+        self.assertEqual(hunks[0].new, ["  def name", "    full_name", "  end"])
+        self.assertEqual(hunks[0].line, 1)
+
+    def test_bare_hunk_headers(self):
+        for header in ("@@ @@", "@@ def name @@"):
+            hunks = parse_patch(f"{header}\n   def name\n-    first_name\n+    full_name\n\n")
+            self.assertEqual([(h.old, h.new, h.line) for h in hunks],
+                             [(["  def name", "    first_name"], ["  def name", "    full_name"], None)],
+                             header)
+
+    def test_search_replace_blocks(self):
+        hunks = parse_patch("<<<<<<< SEARCH\n    address\n=======\n    email_address\n>>>>>>> REPLACE\n"
+                            "text between\n<<<<<<< SEARCH\nend\n=======\nend # User\n>>>>>>> REPLACE\n")
+        self.assertEqual([(h.old, h.new) for h in hunks],
+                         [(["    address"], ["    email_address"]), (["end"], ["end # User"])])
+
+    def test_unterminated_search_replace(self):
+        with self.assertRaises(PatchError):
+            parse_patch("<<<<<<< SEARCH\nold\n=======\nnew\n")
+
+    def test_no_hunks(self):
+        with self.assertRaises(PatchError):
+            parse_patch("just some text\n")
+
+    def test_markers(self):
+        self.assertTrue(is_patch("@@ @@\n-a\n+b\n"))
+        self.assertTrue(is_patch(b"<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE\n"))
+        self.assertFalse(is_patch(SOURCE))
+        self.assertTrue(has_diff_markers("class A\n@@ -1 +1 @@\nend\n"))
+        self.assertTrue(has_diff_markers("--- a/x.rb\n+++ b/x.rb\n"))
+        self.assertFalse(has_diff_markers(SOURCE))
+
+
+class ApplyPatchTest(unittest.TestCase):
+    def test_exact_hunk_at_its_line(self):
+        result = apply_patch(SOURCE, "@@ -3,1 +3,1 @@\n-    first_name\n+    full_name\n")
+        self.assertEqual(result.content, SOURCE.replace("first_name", "full_name"))
+        self.assertEqual((result.offset, result.fuzzy), (0, 0))
+
+    def test_hunk_away_from_its_line_is_offset(self):
+        result = apply_patch(SOURCE, "@@ -20,1 +20,1 @@\n-    address\n+    email_address\n")
+        self.assertEqual(result.content, SOURCE.replace("    address", "    email_address"))
+        self.assertEqual(result.offset, 1)
+
+    def test_reindented_text_matches_ignoring_whitespace(self):
+        patch = "<<<<<<< SEARCH\ndef email\n  address\nend\n=======\n  def email\n    email_address\n  end\n" \
+                ">>>>>>> REPLACE\n"
+        result = apply_patch(SOURCE, patch)
+        self.assertEqual(result.content, SOURCE.replace("    address", "    email_address"))
+        self.assertEqual(result.fuzzy, 1)
+
+    def test_bare_hunk_is_located_by_its_text(self):
+        result = apply_patch(SOURCE, "@@ @@\n   def email\n-    address\n+    email_address\n")
+        self.assertEqual(result.content, SOURCE.replace("    address", "    email_address"))
+
+    def test_search_replace_hunks_apply_in_order(self):
+        source = "a\nx\nb\nx\n"
+        patch = "<<<<<<< SEARCH\nx\n=======\nfirst\n>>>>>>> REPLACE\n" \
+                "<<<<<<< SEARCH\nx\n=======\nsecond\n>>>>>>> REPLACE\n"
+        self.assertEqual(apply_patch(source, patch).content, "a\nfirst\nb\nsecond\n")
+
+    def test_insertion_keeps_the_trailing_newline(self):
+        result = apply_patch("a\nb\n", [Hunk([], ["c"])])
+        self.assertEqual(result.content, "a\nb\nc\n")
+
+    def test_missing_hunk_applies_nothing(self):
+        patch = "<<<<<<< SEARCH\n    first_name\n=======\n    full_name\n>>>>>>> REPLACE\n" \
+                "<<<<<<< SEARCH\n    phone\n=======\n    mobile\n>>>>>>> REPLACE\n"
+        with self.assertRaises(PatchError) as raised:
+            apply_patch(SOURCE, patch)
+        self.assertIn("hunk 2", str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""retry.call_with_retry against a local fake endpoint."""
+
+import socket
+import unittest
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+from benchmarks.stub_server import StubServer
+from http_client import HttpClient
+from retry import RetryPolicy, call_with_retry, parse_duration, server_delay
+
+
+class NoJitter:
+    """rng whose uniform(a, b) always picks `a` (or `b` with high=True)."""
+
+    def __init__(self, high=False):
+        self.high = high
+
+    def uniform(self, a, b):
+        return b if self.high else a
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def payload():
+    return {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.client = HttpClient(timeout=5, connect_timeout=5)
+        self.addCleanup(self.client.close)
+        self.clock = FakeClock()
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.clock.sleep(seconds)
+
+    def call(self, url, policy=None, rng=None):
+        return call_with_retry(lambda: self.client.post_json(url, payload()),
+                               policy or RetryPolicy(max_attempts=5, deadline=300),
+                               sleep=self.sleep, clock=self.clock, rng=rng or NoJitter())
+
+    def test_429_waits_as_long_as_retry_after_says(self):
+        with StubServer(reply="ok", failures=[(429, {"Retry-After": "7"})]) as server:
+            response, stats = self.call(server.url)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.sleeps, [7.0])
+        self.assertEqual((stats.attempts, stats.waited, stats.statuses), (2, 7.0, [429, 200]))
+        self.assertEqual(server.requests, 2)
+
+    def test_429_waits_for_an_exhausted_rate_limit_to_reset(self):
+        headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m30s"}
+        with StubServer(reply="ok", failures=[(429, headers)]) as server:
+            response, _ = self.call(server.url)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.sleeps, [90.0])
+
+    def test_5xx_backs_off_exponentially_then_gives_up(self):
+        policy = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=60.0, deadline=300)
+        failures = [(503, {}), (502, {}), (500, {}), (504, {}), (503, {})]
+        with StubServer(reply="ok", failures=failures) as server:
+            response, stats = self.call(server.url, policy, NoJitter(high=True))
+        self.assertEqual(response.status, 504)
+        self.assertEqual(self.sleeps, [1.0, 2.0, 4.0])
+        self.assertEqual(stats.attempts, 4)
+        self.assertEqual(server.requests, 4)
+
+    def test_5xx_gives_up_before_the_deadline(self):
+        policy = RetryPolicy(max_attempts=10, base_delay=10.0, max_delay=60.0, deadline=25)
+        with StubServer(reply="ok", failures=[(503, {})] * 10) as server:
+            response, stats = self.call(server.url, policy, NoJitter(high=True))
+        self.assertEqual(response.status, 503)
+        self.assertEqual(self.sleeps, [10.0])  # waiting 20s more would pass 25s
+        self.assertEqual(stats.attempts, 2)
+
+    def test_4xx_is_not_retried(self):
+        for status in (400, 401, 403, 404, 422):
+            with self.subTest(status=status), StubServer(reply="ok", failures=[(status, {})]) as server:
+                response, stats = self.call(server.url)
+                self.assertEqual(response.status, status)
+                self.assertEqual(stats.attempts, 1)
+                self.assertEqual(server.requests, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_network_errors_are_retried_then_raised(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            url = f"http://127.0.0.1:{sock.getsockname()[1]}/chat/completions"
+        with self.assertRaises(OSError) as raised:
+            self.call(url, RetryPolicy(max_attempts=3, deadline=300), NoJitter(high=True))
+        self.assertEqual(raised.exception.retry_stats.attempts, 3)
+        self.assertEqual(self.sleeps, [1.0, 2.0])
+
+
+class ServerDelayTest(unittest.TestCase):
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("12"), 12.0)
+        self.assertEqual(parse_duration("6m0s"), 360.0)
+        self.assertEqual(parse_duration("250ms"), 0.25)
+        self.assertEqual(parse_duration("1h2m3.5s"), 3723.5)
+        self.assertIsNone(parse_duration("soon"))
+        self.assertEqual(parse_duration("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_server_delay(self):
+        self.assertEqual(server_delay({"Retry-After": "3"}), 3.0)
+        self.assertIsNone(server_delay({"x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "5s"}))
+        self.assertEqual(server_delay({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "5s",
+                                       "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"}),
+                         5.0)
+        self.assertIsNone(server_delay({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Written, unchanged and failed fixes of universal_apply_fixes."""
+
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import tests  # noqa: F401  (puts the scripts on sys.path)
+from universal_apply_fixes import UniversalFixApplier
+
+SCRIPT = os.path.join(tests.SCRIPTS, "universal_apply_fixes.py")
+
+FIXES = """\
+FIX_FILE: Gemfile
+```ruby
+gem 'sqlite3', '~> 1.4'
+---
+gem 'sqlite3', '~> 2.1'
+```
+
+FIX_FILE: app.rb
+```ruby
+<<<<<<< SEARCH
+    1
+=======
+    2
+>>>>>>> REPLACE
+```
+
+FIX_FILE: tool.py
+```python
+import os
+```
+"""
+
+
+class UniversalApplyFixesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="universal-apply-")
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.write("Gemfile", "source 'https://rubygems.org'\ngem 'sqlite3', '~> 1.4'\n")
+        self.write("app.rb", "class App\n  def x\n    1\n  end\nend\n")
+        self.write("tool.py", "def f():\n    return 1\n")
+
+    def write(self, name, text):
+        with open(os.path.join(self.dir, name), "w") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return f.read()
+
+    def run_script(self, fixes):
+        self.write("fixes.txt", fixes)
+        return subprocess.run([sys.executable, SCRIPT, "fixes.txt"], cwd=self.dir,
+                              capture_output=True, text=True)
+
+    def apply(self, fixes):
+        """(apply_fixes() result, applier) for `fixes`, run in the scratch dir."""
+        self.write("fixes.txt", fixes)
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                applier = UniversalFixApplier("fixes.txt")
+                return applier.apply_fixes(), applier
+        finally:
+            os.chdir(cwd)
+
+    def test_applying_the_same_fixes_twice_exits_0(self):
+        first = self.run_script(FIXES)
+        self.assertEqual(first.returncode, 0, first.stdout)
+        self.assertIn("3 written / 0 unchanged", first.stdout)
+        contents = {name: self.read(name) for name in ("Gemfile", "app.rb", "tool.py")}
+        self.assertIn("'~> 2.1'", contents["Gemfile"])
+        self.assertIn("    2\n", contents["app.rb"])
+        self.assertIn("import os", contents["tool.py"])
+
+        second = self.run_script(FIXES)
+        self.assertEqual(second.returncode, 0, second.stdout)
+        self.assertIn("0 written / 3 unchanged", second.stdout)
+        self.assertNotIn("Failed", second.stdout)
+        self.assertEqual({name: self.read(name) for name in contents}, contents)
+
+    def test_fix_that_changes_nothing_is_unchanged_not_failed(self):
+        ok, applier = self.apply("FIX_FILE: app.rb\n```ruby\n<<<<<<< SEARCH\n    1\n=======\n    1\n"
+                                 ">>>>>>> REPLACE\n```\n")
+        self.assertTrue(ok)
+        self.assertEqual(applier.written, [])
+        self.assertEqual(applier.unchanged, ["app.rb"])
+
+    def test_patch_that_does_not_apply_fails(self):
+        ok, applier = self.apply("FIX_FILE: app.rb\n```ruby\n<<<<<<< SEARCH\n    3\n=======\n    4\n"
+                                 ">>>>>>> REPLACE\n```\n")
+        self.assertFalse(ok)
+        self.assertEqual(applier.unchanged, [])
+        self.assertEqual(self.read("app.rb"), "class App\n  def x\n    1\n  end\nend\n")
+
+    def test_missing_file_fails(self):
+        result = self.run_script("FIX_FILE: missing.rb\n```ruby\nclass Missing; end\n```\n")
+        self.assertEqual(result.returncode, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
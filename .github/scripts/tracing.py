@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Stage tracing for the auto-fix scripts, in Chrome trace-event format.
+
+Usage:
+  tracing.py summary <trace.json> [--markdown]
+  tracing.py run <name> -- <command...>
+
+Tracing is on when AUTO_FIX_TRACE names a trace file, or after enable()
+(the benchmarks trace in memory that way). Code marks stages with
+`with span('model.request', model=...):`; when tracing is off span()
+returns a shared no-op context manager, so the cost is one function call.
+
+Spans use the monotonic clock, which is system-wide, so spans from the
+separate script processes of a workflow job line up on one timeline. Each
+process appends its events to the trace file when it exits, as a JSON
+array whose closing bracket is left off; chrome://tracing and Perfetto
+accept that form, and the `summary` command reads it too.
+
+`summary` prints the total, mean and maximum time per span name; `run`
+traces a command such as the test suite and exits with its status.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+TRACE_ENV = 'AUTO_FIX_TRACE'
+
+
+class _NullSpan:
+    """Stands in for Span when tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage; becomes a complete ('X') trace event on exit."""
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.monotonic_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.add({
+            'name': self.name,
+            'cat': self.name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': self.start // 1000,
+            'dur': (end - self.start) // 1000,
+            'pid': self.tracer.pid,
+            'tid': threading.get_native_id(),
+            'args': self.args,
+        })
+        return False
+
+    def set(self, **args):
+        """Attach values learned inside the span (sizes, counts, status)."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects events in memory and appends them to the trace file at exit."""
+
+    def __init__(self, path, process_name=None):
+        self.path = path
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.events = [{
+            'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+            'args': {'name': process_name or os.path.basename(sys.argv[0]) or 'python'},
+        }]
+        atexit.register(self.flush)
+
+    def add(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def flush(self):
+        with self.lock:
+            events, self.events = self.events, []
+        if not events or not self.path:
+            return
+        data = ''.join(json.dumps(event, separators=(',', ':')) + ',\n' for event in events)
+        # One O_APPEND write per flush keeps processes from interleaving
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            if os.fstat(fd).st_size == 0:
+                data = '[\n' + data
+            os.write(fd, data.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+
+_tracer = None
+_checked = False
+
+
+def tracer():
+    """The process's Tracer, or None when AUTO_FIX_TRACE is not set."""
+    global _tracer, _checked
+    if not _checked:
+        _checked = True
+        path = os.environ.get(TRACE_ENV)
+        if path:
+            _tracer = Tracer(path)
+    return _tracer
+
+
+def enable(path=None, process_name=None):
+    """Start tracing in this process whatever AUTO_FIX_TRACE says.
+
+    With no `path` the events stay in the returned Tracer's `events` list.
+    """
+    global _tracer, _checked
+    _checked = True
+    _tracer = Tracer(path, process_name)
+    return _tracer
+
+
+def span(name, **args):
+    """Context manager timing the stage `name`; a no-op when tracing is off."""
+    current = _tracer if _checked else tracer()
+    if current is None:
+        return _NULL_SPAN
+    return Span(current, name, args)
+
+
+def read_events(path):
+    """Events of a trace file, with or without its closing bracket."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if not text:
+        return []
+    if text.startswith('{'):
+        return json.loads(text).get('traceEvents', [])
+    text = text.rstrip(',')
+    if not text.endswith(']'):
+        text = text.rstrip().rstrip(',') + ']'
+    return json.loads(text)
+
+
+def summarize(events):
+    """[(name, count, total ms, mean ms, max ms)] of complete events, longest total first."""
+    stats = {}
+    for event in events:
+        if event.get('ph') != 'X':
+            continue
+        entry = stats.setdefault(event['name'], [0, 0, 0])
+        duration = event.get('dur', 0)
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+    rows = [(name, count, total / 1000, total / count / 1000, longest / 1000)
+            for name, (count, total, longest) in stats.items()]
+    return sorted(rows, key=lambda row: -row[2])
+
+
+def format_summary(rows, markdown=False):
+    header = ('stage', 'count', 'total ms', 'mean ms', 'max ms')
+    body = [(name, str(count), f"{total:.1f}", f"{mean:.1f}", f"{longest:.1f}")
+            for name, count, total, mean, longest in rows]
+    if markdown:
+        lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+        lines += ['| ' + ' | '.join(row) + ' |' for row in body]
+        return '\n'.join(lines)
+    width = max([len(header[0])] + [len(row[0]) for row in body])
+    lines = [f"{header[0]:<{width}} " + ' '.join(f"{h:>9}" for h in header[1:])]
+    lines += [f"{row[0]:<{width}} " + ' '.join(f"{value:>9}" for value in row[1:]) for row in body]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise or record auto-fix traces.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    summary = commands.add_parser('summary', help="per-stage time table of a trace file")
+    summary.add_argument('trace_file')
+    summary.add_argument('--markdown', action='store_true', help="print a Markdown table")
+    run = commands.add_parser('run', help="trace a command as one span")
+    run.add_argument('name')
+    run.add_argument('argv', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == 'summary':
+        try:
+            events = read_events(args.trace_file)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not read {args.trace_file}: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(format_summary(summarize(events), args.markdown))
+        return
+
+    argv = args.argv[1:] if args.argv[:1] == ['--'] else args.argv
+    if not argv:
+        parser.error("run needs a command after --")
+    if tracer() is not None:
+        _tracer.events[0]['args']['name'] = args.name
+    with span(args.name, command=' '.join(argv)) as current:
+        try:
+            status = subprocess.call(argv)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            status = 127
+        current.set(exit_code=status)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
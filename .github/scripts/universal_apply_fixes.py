@@ -2,13 +2,23 @@
 """
 Universal fix application script - handles Ruby, JavaScript, Python, Java, PHP, .NET
 Parses AI-generated fixes and applies them to source files
+
+Each fix is assigned a language from its file's extension, and the fixes
+are applied one language at a time, each batch by that language's applier
+(see get_applier) so its anchor rules decide where inserted code goes.
 """
 
 import sys
-import re
 import os
 from pathlib import Path
 
+from file_index import FileIndexCache, language_for_path
+from fix_parsing import FixScanner, patterns_for, scan_fixes
+from hash_manifest import HashManifest, content_digest, default_manifest_path
+from mmap_io import map_file
+from patch_engine import Hunk, PatchError, apply_patch, has_diff_markers, is_patch, parse_patch
+from tracing import span
+
 class UniversalFixApplier:
     """Apply fixes from AI model to various file types"""
     
@@ -26,37 +36,73 @@ class UniversalFixApplier:
         'rs': 'rust',
         'yml': 'yaml',
         'yaml': 'yaml',
-        'json': 'json'
+        'json': 'json',
+        'rake': 'ruby',
+        'gemspec': 'ruby',
+        'ru': 'ruby',
+        'mjs': 'javascript',
+        'cjs': 'javascript',
+    }
+    
+    # Files without an extension that still belong to a language
+    SUPPORTED_FILENAMES = {
+        'Gemfile': 'ruby',
+        'Rakefile': 'ruby',
     }
     
-    def __init__(self, fix_file):
+    def __init__(self, fix_file, manifest=None, default_language='unknown', parent=None):
         self.fix_file = fix_file
+        self.default_language = default_language
+        if parent is not None:
+            # A per-language applier shares its parent's parsed batch state
+            self.fixes = []
+            self.commit_message = parent.commit_message
+            self.manifest = parent.manifest
+            self.written = parent.written
+            self.unchanged = parent.unchanged
+            self.index_cache = parent.index_cache
+            return
         self.fixes = []
         self.commit_message = ""
+        self.manifest = manifest or HashManifest(default_manifest_path())
+        self.written = []
+        self.unchanged = []
+        self.index_cache = FileIndexCache()
         self.parse_fixes()
     
+    @classmethod
+    def language_for_file(cls, file_path, default='unknown'):
+        """Language of a file from SUPPORTED_LANGUAGES by extension"""
+        name = os.path.basename(file_path)
+        if name in cls.SUPPORTED_FILENAMES:
+            return cls.SUPPORTED_FILENAMES[name]
+        extension = os.path.splitext(name)[1][1:].lower()
+        return cls.SUPPORTED_LANGUAGES.get(extension, default)
+    
     def parse_fixes(self):
         """Parse AI output to extract FIX blocks"""
-        with open(self.fix_file, 'r') as f:
-            content = f.read()
+        with map_file(self.fix_file) as content, span('universal.parse', size=len(content)) as parsing:
+            self.parse_buffer(content)
+            parsing.set(fixes=len(self.fixes))
+    
+    def parse_buffer(self, content):
+        """Parse FIX blocks out of a str, bytes or mmap response buffer"""
+        scanner = FixScanner(patterns_for(content))
+        fixes = list(scan_fixes(content, scanner))
         
         # Extract commit message
-        commit_match = re.search(r'COMMIT_MESSAGE:\s*(.+?)(?:\n|$)', content)
-        if commit_match:
-            self.commit_message = commit_match.group(1).strip()
+        self.commit_message = scanner.commit_message
         
         # Extract ANALYSIS section
-        analysis_match = re.search(r'### ANALYSIS:\s*(.+?)(?=###|$)', content, re.DOTALL)
+        analysis_match = scanner.patterns.analysis.search(content)
         if analysis_match:
-            print(f"📋 Analysis: {analysis_match.group(1).strip()[:200]}...")
-        
-        # Extract FIX blocks
-        fix_pattern = r'### FIX:\s*(.+?)\n```(?:ruby|python|javascript|typescript|java|php|csharp|go|rust|yaml|json)?\n(.*?)\n```'
-        matches = re.finditer(fix_pattern, content, re.DOTALL)
+            analysis = scanner.patterns.decode(analysis_match.group(1).strip())
+            print(f"📋 Analysis: {analysis[:200]}...")
         
-        for match in matches:
-            file_path = match.group(1).strip()
-            code = match.group(2).strip()
+        # Extract FIX blocks; only the bodies themselves are decoded
+        for fix in fixes:
+            file_path = fix.path
+            code = scanner.patterns.decode(fix.body(content)).strip()
             
             # Skip if file path or code looks incomplete
             if not file_path or len(code) < 5:
@@ -65,13 +111,17 @@ class UniversalFixApplier:
             self.fixes.append({
                 'file': file_path,
                 'code': code,
+                'language': self.language_for_file(file_path, self.default_language),
+                'fence': fix.language,
                 'type': self.detect_change_type(code)
             })
             print(f"📝 Parsed fix for: {file_path}")
     
     def detect_change_type(self, code):
         """Detect if this is a replacement, addition, or deletion"""
-        if '---' in code or '!!!' in code:
+        if is_patch(code):
+            return 'patch'
+        elif '---' in code or '!!!' in code:
             return 'replacement'
         elif code.startswith('-'):
             return 'deletion'
@@ -80,12 +130,40 @@ class UniversalFixApplier:
         else:
             return 'block_replacement'
     
+    def group_by_language(self):
+        """Fixes per language, in the order each language first appears"""
+        groups = {}
+        for fix in self.fixes:
+            groups.setdefault(fix['language'], []).append(fix)
+        return groups
+    
+    def applier_for(self, language):
+        """The applier for one language's batch, sharing this one's state"""
+        applier_class = get_applier(language)
+        if type(self) is applier_class:
+            return self
+        return applier_class(self.fix_file, default_language=self.default_language, parent=self)
+    
     def apply_fixes(self):
-        """Apply all parsed fixes to their respective files"""
+        """Apply all parsed fixes, one language batch at a time"""
         successful = []
         failed = []
         
-        for fix in self.fixes:
+        for language, batch in self.group_by_language().items():
+            applier = self.applier_for(language)
+            print(f"🗂️ {language}: {len(batch)} fix(es) via {type(applier).__name__}")
+            with span('universal.batch', language=language, fixes=len(batch)):
+                applier.apply_batch(batch, successful, failed)
+        
+        with span('universal.manifest'):
+            self.manifest.save()
+        print(f"\n📊 Summary: {len(successful)} successful, {len(failed)} failed")
+        print(f"💾 {len(self.written)} written / {len(self.unchanged)} unchanged")
+        return len(failed) == 0
+    
+    def apply_batch(self, fixes, successful, failed):
+        """Apply one language's fixes, appending file paths to the result lists"""
+        for fix in fixes:
             file_path = fix['file']
             code = fix['code']
             
@@ -93,18 +171,20 @@ class UniversalFixApplier:
             file_path = file_path.lstrip('./')
             
             try:
-                if self.apply_fix(file_path, code, fix['type']):
+                written = len(self.written)
+                with span('universal.fix', path=file_path, type=fix['type']):
+                    applied = self.apply_fix(file_path, code, fix['type'])
+                if applied:
+                    # A fix that leaves the file as it is succeeded too
                     successful.append(file_path)
-                    print(f"✅ Applied fix to {file_path}")
+                    if len(self.written) > written:
+                        print(f"✅ Applied fix to {file_path}")
                 else:
                     failed.append(file_path)
                     print(f"❌ Failed to apply fix to {file_path}")
             except Exception as e:
                 failed.append(file_path)
                 print(f"❌ Error applying fix to {file_path}: {str(e)}")
-        
-        print(f"\n📊 Summary: {len(successful)} successful, {len(failed)} failed")
-        return len(failed) == 0
     
     def apply_fix(self, file_path, code, fix_type):
         """Apply fix to a specific file"""
@@ -117,7 +197,12 @@ class UniversalFixApplier:
             content = f.read()
         
         # Different strategies based on fix type
-        if fix_type == 'replacement':
+        if fix_type != 'patch' and has_diff_markers(code):
+            print(f"⚠️ Fix for {file_path} contains diff markers but is not a patch")
+            return False
+        if fix_type == 'patch':
+            return self.apply_patch_fix(file_path, content, code)
+        elif fix_type == 'replacement':
             return self.apply_replacement_fix(file_path, content, code)
         elif fix_type == 'block_replacement':
             return self.apply_block_fix(file_path, content, code)
@@ -134,87 +219,129 @@ class UniversalFixApplier:
         before = parts[0].strip()
         after = parts[1].strip()
         
+        # Replace only the first occurrence; fall back to a whitespace
+        # insensitive line match when the text was reindented
         if before in content:
-            new_content = content.replace(before, after)
-            with open(file_path, 'w') as f:
-                f.write(new_content)
-            return True
-        
-        return False
+            new_content = content.replace(before, after, 1)
+        elif after in content:
+            return self.already_applied(file_path)
+        else:
+            try:
+                hunk = Hunk(before.split('\n'), after.split('\n'))
+                new_content = apply_patch(content, [hunk]).content
+            except PatchError:
+                return False
+        self.write_file(file_path, new_content)
+        return True
+    
+    def apply_patch_fix(self, file_path, content, code):
+        """Apply unified diff hunks or SEARCH/REPLACE blocks in one pass"""
+        try:
+            hunks = parse_patch(code)
+            result = apply_patch(content, hunks)
+        except PatchError as e:
+            if self.patch_applied(content, code):
+                return self.already_applied(file_path)
+            print(f"⚠️ Patch does not apply to {file_path}: {e}")
+            return False
+        if result.offset or result.fuzzy:
+            print(f"🔍 {file_path}: {result.offset} hunks offset, {result.fuzzy} matched ignoring whitespace")
+        self.write_file(file_path, result.content)
+        return True
     
     def apply_block_fix(self, file_path, content, code):
         """Apply fixes by inserting/replacing code blocks"""
-        lines = content.split('\n')
-        code_lines = code.split('\n')
-        
-        # Find best matching location
-        # This is a simplified approach - production would need better heuristics
+        if code in content:
+            return self.already_applied(file_path)
         
-        # Try to find import statements or function definitions
-        insertion_point = len(lines)
+        # Imports go after the first import line, other code before the
+        # first definition; the per-file index makes this a lookup
+        index = self.index_cache.get(file_path, content, self.anchor_language(file_path))
+        insertion_point = index.insertion_point(code)
         
-        for i, line in enumerate(lines):
-            # Find imports section for import fixes
-            if any(keyword in code for keyword in ['import ', 'from ', 'require ', 'using ']):
-                if any(keyword in line for keyword in ['import ', 'from ', 'require ', 'using ']):
-                    insertion_point = i + 1
-                    break
-            
-            # Find function/method for code changes
-            elif any(keyword in line for keyword in ['def ', 'function ', 'function(', 'async function', 'class ']):
-                if insertion_point == len(lines):
-                    insertion_point = i
-        
-        # Insert code
-        lines.insert(insertion_point, "")
-        lines.insert(insertion_point + 1, code)
+        # Insert code after a blank separator line
+        inserted = '\n' + code
+        lines = content.split('\n')
+        lines.insert(insertion_point, inserted)
+        new_content = '\n'.join(lines)
         
         try:
-            with open(file_path, 'w') as f:
-                f.write('\n'.join(lines))
-            return True
+            written = self.write_file(file_path, new_content)
         except:
+            self.index_cache.discard(file_path)
+            return False
+        if written:
+            index.insert(insertion_point, inserted, new_content)
+        return True
+    
+    def anchor_language(self, file_path):
+        """LANGUAGE_CONFIG language whose keywords place inserted code"""
+        return language_for_path(file_path)
+    
+    def patch_applied(self, content, code):
+        """True when every hunk's new lines are already in the content"""
+        try:
+            hunks = parse_patch(code)
+            if not hunks or not all(hunk.new for hunk in hunks):
+                return False
+            apply_patch(content, [Hunk(hunk.new, hunk.old, hunk.line) for hunk in hunks])
+        except PatchError:
+            return False
+        return True
+    
+    def already_applied(self, file_path):
+        """Count a fix whose change the file already has as unchanged"""
+        self.unchanged.append(file_path)
+        print(f"⏭️ Unchanged: {file_path} (fix already applied)")
+        return True
+    
+    def write_file(self, file_path, new_content):
+        """Write new content unless the file already holds exactly that; True if written"""
+        data = new_content.encode('utf-8')
+        digest = content_digest(data)
+        if self.manifest.unchanged(file_path, digest, len(data)):
+            self.unchanged.append(file_path)
+            print(f"⏭️ Unchanged: {file_path}")
             return False
+        
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        self.manifest.record(file_path, digest)
+        self.written.append(file_path)
+        return True
 
 
 class RubyFixApplier(UniversalFixApplier):
     """Specialized applier for Ruby/Rails files"""
     
-    def apply_fix(self, file_path, code, fix_type):
-        """Ruby-specific fix application"""
-        if not file_path.endswith('.rb'):
-            return super().apply_fix(file_path, code, fix_type)
-        
-        return super().apply_fix(file_path, code, fix_type)
+    def anchor_language(self, file_path):
+        """Gemfile, Rakefile and .gemspec files use Ruby's require/def anchors too"""
+        return 'ruby'
 
 
 class JavaScriptFixApplier(UniversalFixApplier):
     """Specialized applier for JavaScript/TypeScript files"""
     
-    def apply_fix(self, file_path, code, fix_type):
-        """JavaScript-specific fix application"""
-        if file_path.endswith(('.js', '.ts', '.jsx', '.tsx')):
-            return super().apply_fix(file_path, code, fix_type)
-        
-        return super().apply_fix(file_path, code, fix_type)
+    def anchor_language(self, file_path):
+        """TypeScript files also anchor on interfaces"""
+        if file_path.endswith(('.ts', '.tsx')):
+            return 'typescript'
+        return 'javascript'
 
 
 class PythonFixApplier(UniversalFixApplier):
     """Specialized applier for Python files"""
     
-    def apply_fix(self, file_path, code, fix_type):
-        """Python-specific fix application"""
-        if not file_path.endswith('.py'):
-            return super().apply_fix(file_path, code, fix_type)
-        
-        return super().apply_fix(file_path, code, fix_type)
+    def anchor_language(self, file_path):
+        """Python-specific anchors (import/from, def/class)"""
+        return 'python'
 
 
 def get_applier(language):
     """Get appropriate applier based on language"""
     if language == 'ruby':
         return RubyFixApplier
-    elif language in ['javascript', 'typescript']:
+    elif language in ['javascript', 'typescript', 'jsx', 'tsx']:
         return JavaScriptFixApplier
     elif language == 'python':
         return PythonFixApplier
@@ -228,6 +355,7 @@ def main():
         sys.exit(1)
     
     fix_file = sys.argv[1]
+    # Only used for files whose extension does not name a language
     language = sys.argv[2] if len(sys.argv) > 2 else 'unknown'
     
     if not os.path.exists(fix_file):
@@ -235,10 +363,10 @@ def main():
         sys.exit(1)
     
     print(f"🔧 Applying fixes from {fix_file}")
-    print(f"📝 Language: {language}")
     
-    applier_class = get_applier(language)
-    applier = applier_class(fix_file)
+    applier = UniversalFixApplier(fix_file, default_language=language)
+    languages = applier.group_by_language()
+    print(f"📝 Languages: {', '.join(f'{name} ({len(batch)})' for name, batch in languages.items()) or 'none'}")
     
     if applier.apply_fixes():
         print("✅ All fixes applied successfully")